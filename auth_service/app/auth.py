@@ -1,63 +1,96 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
-from .database import SessionLocal
-from .schemas import UserCreate, UserLogin, UserUpdate
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
+from . import blobs, hashing, ratelimit, tokens
+from .schemas import RefreshRequest, UserCreate, UserLogin, UserUpdate
 from .models import User
-from .utils import hash_password, verify_password, create_access_token
-from .utils import get_current_user
+from .hashing import hash_password, verify_and_update_password
+from .utils import ACCESS_TOKEN_EXPIRE_MINUTES, create_access_token, get_db
+from .utils import get_current_profile, get_current_user, get_current_user_id, invalidate_profile, user_profile
 from fastapi import Depends
 router = APIRouter()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+def _token_response(user_id: int, refresh_token: str) -> dict:
+    return {
+        "access_token": create_access_token(data={"sub": str(user_id)}),
+        "token_type": "bearer",
+        "expires_in": int(ACCESS_TOKEN_EXPIRE_MINUTES * 60),
+        "refresh_token": refresh_token,
+    }
 
+def _start_session(db: Session, user_id: int) -> dict:
+    """Tokens for a new login session; commits, together with any pending rehash"""
+    refresh_token = tokens.issue(db, user_id)
+    db.commit()
+    return _token_response(user_id, refresh_token)
+
+# signup and login are async so that waiting for a bcrypt worker doesn't hold
+# a threadpool slot; their (short) blocking DB calls go to the threadpool instead
 @router.post("/signup")
-def signup(user: UserCreate, db: Session = Depends(get_db)):
+async def signup(user: UserCreate, request: Request, db: Session = Depends(get_db)):
+    await ratelimit.limit("signup", request, user.email)
+    hashing.admit()
     if user.password != user.confirm_password:
         raise HTTPException(status_code=400, detail="Passwords do not match.")
 
-    existing_user = db.query(User).filter(User.email == user.email).first()
+    existing_user = await run_in_threadpool(db.query(User).filter(User.email == user.email).first)
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered.")
 
-    hashed = hash_password(user.password)
+    # Inline images go to the blob store; the row keeps only the digest
+    profile_image = await run_in_threadpool(blobs.profile_image_ref, user.profile_image)
+    hashed = await hash_password(user.password)
     new_user = User(
         first_name=user.first_name,
         last_name=user.last_name,
         email=user.email,
         phone=user.phone,
         hashed_password=hashed,
-        profile_image=user.profile_image
+        profile_image=profile_image
     )
 
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await run_in_threadpool(db.commit)
     return {"msg": "User created successfully."}
 
 @router.post("/login")
-def login(user: UserLogin, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.email == user.email).first()
-    if not db_user or not verify_password(user.password, db_user.hashed_password):
+async def login(user: UserLogin, request: Request, db: Session = Depends(get_db)):
+    # Throttle and shed before the user lookup, so rejected attempts cost no DB or bcrypt work
+    await ratelimit.limit("login", request, user.email)
+    hashing.admit()
+    db_user = await run_in_threadpool(db.query(User).filter(User.email == user.email).first)
+    if not db_user:
         raise HTTPException(status_code=401, detail="Invalid credentials.")
 
-    token = create_access_token(data={"sub": str(db_user.id)})
-    return {"access_token": token, "token_type": "bearer"}
+    valid, new_hash = await verify_and_update_password(user.password, db_user.hashed_password)
+    if not valid:
+        raise HTTPException(status_code=401, detail="Invalid credentials.")
+    if new_hash:
+        # Stored hash used a different BCRYPT_ROUNDS; upgrade it transparently
+        db_user.hashed_password = new_hash
+
+    return await run_in_threadpool(_start_session, db, db_user.id)
+
+# Refresh tokens: renewing a session costs a token lookup and a JWT signature, not a bcrypt verification
+@router.post("/token/refresh")
+def refresh_access_token(body: RefreshRequest, db: Session = Depends(get_db)):
+    user_id, refresh_token = tokens.rotate(db, body.refresh_token)
+    return _token_response(user_id, refresh_token)
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+def logout(body: RefreshRequest, db: Session = Depends(get_db)):
+    """End the session the refresh token belongs to"""
+    tokens.revoke(db, body.refresh_token)
+
+@router.post("/logout/all", status_code=status.HTTP_204_NO_CONTENT)
+def logout_everywhere(user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db)):
+    """End every session of the current user; issued access tokens stay valid until they expire"""
+    tokens.revoke_all(db, user_id)
 
 @router.get("/dashboard")
-def get_dashboard(current_user: User = Depends(get_current_user)):
-    return {
-        "id": current_user.id,
-        "first_name": current_user.first_name,
-        "last_name": current_user.last_name,
-        "email": current_user.email,
-        "phone": current_user.phone,
-        "profile_image": current_user.profile_image,
-    }
+async def get_dashboard(current_profile: dict = Depends(get_current_profile)):
+    return current_profile
 
 @router.put("/profile")
 def update_profile(user_update: UserUpdate, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
@@ -69,16 +102,31 @@ def update_profile(user_update: UserUpdate, current_user: User = Depends(get_cur
     if user_update.phone is not None:
         current_user.phone = user_update.phone
     if user_update.profile_image is not None:
-        current_user.profile_image = user_update.profile_image
+        current_user.profile_image = blobs.profile_image_ref(user_update.profile_image)
     
     db.commit()
     db.refresh(current_user)
-    
-    return {
-        "id": current_user.id,
-        "first_name": current_user.first_name,
-        "last_name": current_user.last_name,
-        "email": current_user.email,
-        "phone": current_user.phone,
-        "profile_image": current_user.profile_image,
-    }
\ No newline at end of file
+    invalidate_profile(current_user.id)
+
+    return user_profile(current_user)
+
+# Profile images
+@router.put("/profile/image")
+async def upload_profile_image(request: Request, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Replace the profile image with the raw image in the request body"""
+    data = await blobs.read_limited(request.stream())
+    current_user.profile_image = await run_in_threadpool(blobs.store, data)
+    await run_in_threadpool(db.commit)
+    invalidate_profile(current_user.id)
+    return user_profile(current_user)
+
+@router.delete("/profile/image", status_code=status.HTTP_204_NO_CONTENT)
+def delete_profile_image(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    current_user.profile_image = None
+    db.commit()
+    invalidate_profile(current_user.id)
+
+@router.get("/images/{digest}")
+def get_image(digest: str, request: Request, size: Optional[int] = None):
+    """Profile images by digest; public so they work in <img> tags"""
+    return blobs.blob_response(request, digest, size)
@@ -0,0 +1,289 @@
+"""
+Content-addressed blob store for profile images.
+
+Each distinct image is stored once under BLOB_STORE_DIR as
+``<dir>/<first two hex digits>/<sha256>``. A re-uploaded picture, or two users
+picking the same one, costs no extra space, and the users row holds only the
+64-character digest. Files are written under a temporary name and renamed into
+place, so readers never see a partial blob and concurrent writers of the same
+content are harmless. Nothing is deleted when a user changes their image,
+since a blob may be shared.
+
+Thumbnails (PROFILE_THUMBNAIL_SIZES, longest side in pixels) are generated
+with Pillow when an image is stored and kept next to it as
+``<sha256>.<size>``. Without Pillow installed the original is served for every
+size. Images whose header declares a side longer than PROFILE_IMAGE_MAX_SIDE
+are rejected before any pixel is decoded: a small compressed file can
+otherwise expand to hundreds of megabytes.
+
+Blobs are served with a strong ETag (the digest never changes for a URL),
+single-range Range support and long-lived caching.
+"""
+import base64
+import binascii
+import hashlib
+import io
+import os
+import re
+import tempfile
+from typing import AsyncIterator, Iterator, Optional, Tuple
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+load_dotenv()
+
+BLOB_STORE_DIR = os.getenv("BLOB_STORE_DIR", "blobs")
+BLOB_MAX_BYTES = int(os.getenv("BLOB_MAX_BYTES", str(5 * 1024 * 1024)))
+PROFILE_THUMBNAIL_SIZES = sorted(
+    int(size) for size in os.getenv("PROFILE_THUMBNAIL_SIZES", "64,256").split(",") if size.strip()
+)
+# Longest accepted side in pixels; needs Pillow to be checked
+PROFILE_IMAGE_MAX_SIDE = int(os.getenv("PROFILE_IMAGE_MAX_SIDE", "4096"))
+# Path (or absolute URL) under which the images route is reachable by browsers
+PROFILE_IMAGE_URL_PREFIX = os.getenv("PROFILE_IMAGE_URL_PREFIX", "/images").rstrip("/")
+
+CHUNK_SIZE = 64 * 1024
+DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+
+# Only raster formats browsers render as plain images; SVG can carry script
+_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+
+def sniff_content_type(head: bytes) -> Optional[str]:
+    """Image type from the first bytes of a file; None if it isn't a supported image"""
+    for signature, content_type in _SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+def is_digest(value: Optional[str]) -> bool:
+    return bool(value) and DIGEST_RE.match(value) is not None
+
+def _path(digest: str, size: Optional[int] = None) -> str:
+    name = digest if size is None else f"{digest}.{size}"
+    return os.path.join(BLOB_STORE_DIR, digest[:2], name)
+
+def _write_atomic(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            tmp.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def _too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Images are limited to {BLOB_MAX_BYTES} bytes",
+    )
+
+def _too_many_pixels() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Images are limited to {PROFILE_IMAGE_MAX_SIDE}x{PROFILE_IMAGE_MAX_SIDE} pixels",
+    )
+
+def _unsupported() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+        detail="Profile images must be PNG, JPEG, GIF or WebP",
+    )
+
+# Writing
+def _open_image(data: bytes):
+    """The image with only its header parsed; None without Pillow or if it can't be parsed
+
+    Raises 413 if it declares a side longer than PROFILE_IMAGE_MAX_SIDE.
+    """
+    if Image is None:
+        return None
+    try:
+        image = Image.open(io.BytesIO(data))
+    except Image.DecompressionBombError:
+        raise _too_many_pixels()
+    except (OSError, ValueError):
+        return None
+    if max(image.size) > PROFILE_IMAGE_MAX_SIDE:
+        image.close()
+        raise _too_many_pixels()
+    return image
+
+def _make_thumbnails(digest: str, image) -> None:
+    try:
+        image.load()
+        for size in PROFILE_THUMBNAIL_SIZES:
+            path = _path(digest, size)
+            if os.path.exists(path):
+                continue
+            thumbnail = image.copy()
+            thumbnail.thumbnail((size, size))
+            out = io.BytesIO()
+            if thumbnail.mode in ("RGBA", "LA", "P"):
+                thumbnail.save(out, format="PNG", optimize=True)
+            else:
+                thumbnail.convert("RGB").save(out, format="JPEG", quality=85)
+            _write_atomic(path, out.getvalue())
+    except (OSError, ValueError, Image.DecompressionBombError):
+        # Undecodable despite a valid signature: the original is still served
+        pass
+
+def store(data: bytes) -> str:
+    """Store an image and its thumbnails; returns its digest
+
+    Raises 413/415 HTTPExceptions for oversized or unsupported data.
+    """
+    if len(data) > BLOB_MAX_BYTES:
+        raise _too_large()
+    if sniff_content_type(data[:16]) is None:
+        raise _unsupported()
+    image = _open_image(data)
+
+    digest = hashlib.sha256(data).hexdigest()
+    path = _path(digest)
+    if not os.path.exists(path):
+        _write_atomic(path, data)
+    if image is not None:
+        with image:
+            _make_thumbnails(digest, image)
+    return digest
+
+async def read_limited(chunks: AsyncIterator[bytes]) -> bytes:
+    """Collect a request body, giving up as soon as it exceeds BLOB_MAX_BYTES"""
+    buffer = bytearray()
+    async for chunk in chunks:
+        buffer += chunk
+        if len(buffer) > BLOB_MAX_BYTES:
+            raise _too_large()
+    return bytes(buffer)
+
+def decode_inline_image(value: str) -> Optional[bytes]:
+    """Image bytes from a data URL or bare base64 string; None if value is neither"""
+    if value.startswith("data:"):
+        header, _, payload = value.partition(",")
+        if not header.endswith(";base64"):
+            return None
+    else:
+        payload = value
+    try:
+        data = base64.b64decode(payload, validate=True)
+    except (binascii.Error, ValueError):
+        return None
+    return data if sniff_content_type(data[:16]) else None
+
+def profile_image_ref(value: Optional[str]) -> Optional[str]:
+    """What to keep in users.profile_image for a submitted value
+
+    Inline images (data URLs or base64) go to the blob store and become their
+    digest; digests and URLs are kept as they are; an empty value clears the image.
+    """
+    if not value:
+        return None
+    if is_digest(value) or value.startswith(("http://", "https://", "/")):
+        return value
+    data = decode_inline_image(value)
+    if data is None:
+        raise _unsupported()
+    return store(data)
+
+def image_url(ref: Optional[str], size: Optional[int] = None) -> Optional[str]:
+    """Browser-facing URL for a stored profile_image value"""
+    if not is_digest(ref):
+        return ref
+    url = f"{PROFILE_IMAGE_URL_PREFIX}/{ref}"
+    return f"{url}?size={size}" if size else url
+
+# Serving
+def _byte_range(header: Optional[str], length: int) -> Optional[Tuple[int, int]]:
+    """Inclusive (start, end) of a single-range Range header; None serves the whole blob"""
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start, _, end = header[len("bytes="):].strip().partition("-")
+    try:
+        if not start:
+            # Suffix range: the last N bytes
+            suffix = int(end)
+            if suffix <= 0:
+                raise ValueError
+            return max(length - suffix, 0), length - 1
+        first = int(start)
+        last = min(int(end), length - 1) if end else length - 1
+    except ValueError:
+        return None
+    if first >= length or last < first:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            headers={"Content-Range": f"bytes */{length}"},
+        )
+    return first, last
+
+def _read(path: str, start: int, length: int) -> Iterator[bytes]:
+    with open(path, "rb") as blob:
+        blob.seek(start)
+        while length > 0:
+            chunk = blob.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+def blob_response(request: Request, digest: str, size: Optional[int] = None) -> Response:
+    """Stream a stored image, or its smallest thumbnail of at least size pixels"""
+    if not is_digest(digest):
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    path, etag = _path(digest), f'"{digest}"'
+    if size:
+        for thumbnail_size in PROFILE_THUMBNAIL_SIZES:
+            if thumbnail_size >= size and os.path.exists(_path(digest, thumbnail_size)):
+                path, etag = _path(digest, thumbnail_size), f'"{digest}.{thumbnail_size}"'
+                break
+    try:
+        with open(path, "rb") as blob:
+            content_type = sniff_content_type(blob.read(16))
+            length = os.fstat(blob.fileno()).st_size
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        # Content at a digest URL never changes
+        "Cache-Control": "public, max-age=31536000, immutable",
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in (tag.strip() for tag in if_none_match.split(","))):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    if if_range is None or if_range.strip() == etag:
+        byte_range = _byte_range(request.headers.get("range"), length)
+    if byte_range is None:
+        headers["Content-Length"] = str(length)
+        return StreamingResponse(_read(path, 0, length), media_type=content_type, headers=headers)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{length}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        _read(path, start, end - start + 1),
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
+        media_type=content_type,
+        headers=headers,
+    )
@@ -0,0 +1,120 @@
+"""
+Caching helpers for the auth service
+
+``LRUCache`` is a per-process cache. A shared backend (``create_backend``) lets
+replicas see each other's writes and invalidations; ``memory://`` is a local
+stand-in with the same interface for development and tests, ``redis://`` talks
+to Redis when the ``redis`` package is installed.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+_MISSING = object()
+
+class LRUCache:
+    """Thread-safe LRU cache with an optional per-entry time-to-live
+
+    A maxsize of 0 disables the cache: every lookup misses and nothing is stored.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+
+            expires_at, value = entry
+            if expires_at and expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        if not self.enabled:
+            return
+
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else 0.0
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+# Shared backends store JSON-serializable values under string keys
+class MemoryBackend:
+    """In-process stand-in for a shared cache such as Redis"""
+
+    def __init__(self):
+        self._cache = LRUCache(maxsize=100_000)
+
+    def get(self, key: str) -> Optional[Any]:
+        raw = self._cache.get(key)
+        return None if raw is None else json.loads(raw)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self._cache.set(key, json.dumps(value), ttl=ttl)
+
+    def delete(self, key: str) -> None:
+        self._cache.delete(key)
+
+class RedisBackend:
+    """Shared cache in Redis"""
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError("The redis package is required for a redis:// cache URL") from exc
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[Any]:
+        raw = self._client.get(key)
+        return None if raw is None else json.loads(raw)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self._client.set(key, json.dumps(value), ex=int(ttl) if ttl else None)
+
+    def delete(self, key: str) -> None:
+        self._client.delete(key)
+
+def create_backend(url: Optional[str]):
+    """Build a shared cache backend from a URL; None when no URL is configured"""
+    if not url:
+        return None
+    if url.startswith("memory://"):
+        return MemoryBackend()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    raise ValueError(f"Unsupported cache URL: {url!r}")
@@ -0,0 +1,144 @@
+"""
+Password hashing on a dedicated, bounded process pool.
+
+bcrypt burns 100-300 ms of CPU per call. Running it in the request threadpool
+lets a burst of logins starve every other endpoint on the pod, so hashes are
+computed in worker processes instead. At most PASSWORD_HASH_QUEUE_LIMIT jobs
+may be running or waiting at once; beyond that requests are shed immediately
+with 503 rather than queueing behind work that would time out anyway.
+
+BCRYPT_ROUNDS is both the cost for new hashes and the only accepted cost for
+existing ones: a successful login with a hash of any other cost returns a
+replacement hash, so the cost can be tuned without a migration.
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+from starlette.concurrency import run_in_threadpool
+
+from .metrics import PASSWORD_HASH_IN_FLIGHT, PASSWORD_HASH_REJECTED, PASSWORD_HASH_SECONDS
+
+load_dotenv()
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# 0 hashes in the request threadpool instead of worker processes (tests, local dev)
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", "16"))
+PASSWORD_HASH_RETRY_AFTER = os.getenv("PASSWORD_HASH_RETRY_AFTER", "1")
+
+@lru_cache(maxsize=4)
+def _crypt_context(rounds: int) -> CryptContext:
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds,
+    )
+
+# Worker functions: module level so they can be pickled into the pool, and
+# timed in the worker so the metric reflects bcrypt cost rather than queueing
+def _hash(password: str, rounds: int) -> Tuple[str, float]:
+    started = time.perf_counter()
+    hashed = _crypt_context(rounds).hash(password)
+    return hashed, time.perf_counter() - started
+
+def _verify_and_update(password: str, hashed: str, rounds: int) -> Tuple[Tuple[bool, Optional[str]], float]:
+    started = time.perf_counter()
+    result = _crypt_context(rounds).verify_and_update(password, hashed)
+    return result, time.perf_counter() - started
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+# Only touched from the event loop thread, so a plain counter is enough
+_in_flight = 0
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: forking a process that runs an event loop and DB pools is unsafe
+            _executor = ProcessPoolExecutor(
+                max_workers=PASSWORD_HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+def _reset_executor(broken: ProcessPoolExecutor) -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is broken:
+            _executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+def shutdown() -> None:
+    """Stop the worker processes (called on application shutdown)"""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+def in_flight() -> int:
+    """Hashing jobs currently running or queued"""
+    return _in_flight
+
+PASSWORD_HASH_IN_FLIGHT.set_function(in_flight)
+
+def admit() -> None:
+    """Shed a request with 503 now if hashing is saturated, before any other work is done for it"""
+    if _in_flight >= PASSWORD_HASH_QUEUE_LIMIT:
+        PASSWORD_HASH_REJECTED.inc()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Authentication is busy, please retry shortly.",
+            headers={"Retry-After": PASSWORD_HASH_RETRY_AFTER},
+        )
+
+async def _run(operation: str, func, *args):
+    global _in_flight
+
+    admit()
+    _in_flight += 1
+    try:
+        if PASSWORD_HASH_WORKERS <= 0:
+            result, elapsed = await run_in_threadpool(func, *args)
+        else:
+            executor = _get_executor()
+            try:
+                result, elapsed = await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM-killed); start a fresh pool for later requests
+                _reset_executor(executor)
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Authentication is temporarily unavailable, please retry.",
+                    headers={"Retry-After": PASSWORD_HASH_RETRY_AFTER},
+                )
+    finally:
+        _in_flight -= 1
+
+    PASSWORD_HASH_SECONDS.labels(operation).observe(elapsed)
+    return result
+
+async def hash_password(password: str) -> str:
+    """Hash a password at the configured cost"""
+    return await _run("hash", _hash, password, BCRYPT_ROUNDS)
+
+async def verify_and_update_password(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """Verify a password; also return a replacement hash if the stored cost is outdated"""
+    return await _run("verify", _verify_and_update, password, hashed, BCRYPT_ROUNDS)
+
+async def verify_password(password: str, hashed: str) -> bool:
+    valid, _ = await verify_and_update_password(password, hashed)
+    return valid
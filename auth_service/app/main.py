@@ -1,10 +1,9 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from . import models
-from .database import engine
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from . import hashing
 from .auth import router as auth_router
-
-models.Base.metadata.create_all(bind=engine)
+from .metrics import MetricsMiddleware
 
 app = FastAPI(title="Notes App Auth Service", version="1.0.0")
 
@@ -16,10 +15,16 @@ app.add_middleware(
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(auth_router)
 
 
+@app.on_event("shutdown")
+def shutdown_hashing_workers():
+    hashing.shutdown()
+
+
 @app.get("/")
 def read_root():
     return {"message": "Auth Service API", "version": "1.0.0"}
@@ -27,4 +32,9 @@ def read_root():
 
 @app.get("/health")
 def health_check():
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,81 @@
+"""
+One-shot migration of inline profile images into the blob store.
+
+    python -m app.migrate_profile_images [--batch-size 100] [--dry-run]
+
+Rows whose profile_image holds a data URL or bare base64 image get the image
+stored in the blob store and the column rewritten to its digest. Digests and
+URLs are left alone, so the migration can be re-run safely, and values that
+don't decode to a supported image are reported and kept.
+"""
+import argparse
+
+from fastapi import HTTPException
+from sqlalchemy import and_, func
+
+from . import blobs
+from .database import SessionLocal
+from .models import User
+from .utils import invalidate_profile
+
+def migrate(batch_size: int = 100, dry_run: bool = False) -> dict:
+    """Convert inline images batch by batch, committing after each one"""
+    counts = {"converted": 0, "skipped": 0, "bytes_before": 0}
+    last_id = 0
+    db = SessionLocal()
+    try:
+        while True:
+            # Digests are 64 characters and URLs aren't rewritten, so only longer non-URL values qualify
+            rows = db.query(User).filter(and_(
+                User.id > last_id,
+                func.length(User.profile_image) > 64,
+                ~User.profile_image.startswith("http://"),
+                ~User.profile_image.startswith("https://"),
+            )).order_by(User.id).limit(batch_size).all()
+            if not rows:
+                break
+
+            converted = []
+            for user in rows:
+                last_id = user.id
+                data = blobs.decode_inline_image(user.profile_image)
+                if data is None:
+                    counts["skipped"] += 1
+                    print(f"user {user.id}: profile_image is not an inline image, left as is")
+                    continue
+                inline_size = len(user.profile_image)
+                if not dry_run:
+                    try:
+                        user.profile_image = blobs.store(data)
+                    except HTTPException as exc:
+                        counts["skipped"] += 1
+                        print(f"user {user.id}: {exc.detail}, left as is")
+                        continue
+                counts["bytes_before"] += inline_size
+                converted.append(user.id)
+
+            if not dry_run:
+                db.commit()
+                for user_id in converted:
+                    invalidate_profile(user_id)
+            db.expunge_all()
+            counts["converted"] += len(converted)
+    finally:
+        db.close()
+    return counts
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be converted without writing")
+    args = parser.parse_args()
+
+    counts = migrate(args.batch_size, args.dry_run)
+    action = "Would convert" if args.dry_run else "Converted"
+    print(
+        f"{action} {counts['converted']} profile images "
+        f"({counts['bytes_before']} bytes moved out of the users table); {counts['skipped']} skipped"
+    )
+
+if __name__ == "__main__":
+    main()
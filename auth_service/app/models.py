@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, UniqueConstraint
+from sqlalchemy import Boolean, Column, DateTime, Integer, String, UniqueConstraint
 from .database import Base
 
 class User(Base):
@@ -10,4 +10,17 @@ class User(Base):
     email = Column(String, unique=True, index=True, nullable=False)
     phone = Column(String, nullable=False)
     hashed_password = Column(String, nullable=False)
-    profile_image = Column(String, nullable=True)  # Store image URL or base64
\ No newline at end of file
+    profile_image = Column(String, nullable=True)  # Store image URL or base64
+
+class RefreshToken(Base):
+    """One link in a chain of rotated refresh tokens; a family is one login session"""
+    __tablename__ = "refresh_tokens"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False, index=True)
+    family_id = Column(String(32), nullable=False, index=True)
+    secret_hash = Column(String(64), nullable=False)  # SHA-256 of the token's secret part
+    session_started_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    used_at = Column(DateTime, nullable=True)  # Set when exchanged for its successor
+    revoked = Column(Boolean, nullable=False, default=False)
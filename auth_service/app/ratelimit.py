@@ -0,0 +1,151 @@
+"""
+Token-bucket rate limiting for the credential endpoints.
+
+/login and /signup each take a token from a bucket per client IP and one per
+email address before any database or bcrypt work is done. A bucket holds up
+to ``BURST`` tokens and refills at ``PER_MINUTE / 60`` tokens per second; an
+empty bucket answers 429 with Retry-After set to when the next token arrives.
+Email buckets are keyed by a digest of the lower-cased address, so addresses
+aren't kept in memory or in the shared backend.
+
+Buckets live in-process by default, which limits each pod separately. Setting
+RATE_LIMIT_URL to ``redis://...`` shares them across replicas (the refill and
+take run as one Lua script); ``memory://`` is an in-process stand-in with the
+same interface for development and tests. A backend outage lets requests
+through rather than locking every user out.
+"""
+import hashlib
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, Request, status
+from starlette.concurrency import run_in_threadpool
+
+from .metrics import RATE_LIMITED
+
+load_dotenv()
+
+RATE_LIMIT_URL = os.getenv("RATE_LIMIT_URL")
+# 0 disables a limit
+RATE_LIMIT_IP_PER_MINUTE = float(os.getenv("RATE_LIMIT_IP_PER_MINUTE", "30"))
+RATE_LIMIT_IP_BURST = float(os.getenv("RATE_LIMIT_IP_BURST", "10"))
+RATE_LIMIT_EMAIL_PER_MINUTE = float(os.getenv("RATE_LIMIT_EMAIL_PER_MINUTE", "5"))
+RATE_LIMIT_EMAIL_BURST = float(os.getenv("RATE_LIMIT_EMAIL_BURST", "5"))
+# Reverse proxies in front of the service that append to X-Forwarded-For
+RATE_LIMIT_TRUSTED_PROXIES = int(os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "0"))
+
+logger = logging.getLogger(__name__)
+
+class MemoryBucketBackend:
+    """Token buckets in this process, evicting the least recently used beyond maxsize"""
+
+    def __init__(self, maxsize: int = 100_000):
+        self.maxsize = maxsize
+        self._buckets: "OrderedDict[str, tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: float) -> float:
+        """Take a token; returns 0 if one was available, else seconds until the next one"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated_at) * rate)
+            if tokens >= 1:
+                tokens, wait = tokens - 1, 0.0
+            else:
+                wait = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return wait
+
+_TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+class RedisBucketBackend:
+    """Token buckets in Redis, shared by every replica"""
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError("The redis package is required for a redis:// rate limit URL") from exc
+        self._take = redis.Redis.from_url(url).register_script(_TAKE_SCRIPT)
+
+    def take(self, key: str, rate: float, burst: float) -> float:
+        return float(self._take(keys=[key], args=[rate, burst, time.time()]))
+
+def create_backend(url: Optional[str]):
+    """Bucket backend for a URL; in-process buckets when no URL is configured"""
+    if not url or url.startswith("memory://"):
+        return MemoryBucketBackend()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBucketBackend(url)
+    raise ValueError(f"Unsupported rate limit URL: {url!r}")
+
+_backend = create_backend(RATE_LIMIT_URL)
+
+def client_ip(request: Request) -> str:
+    """Address of the client, skipping RATE_LIMIT_TRUSTED_PROXIES proxy hops"""
+    if RATE_LIMIT_TRUSTED_PROXIES > 0:
+        hops = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+        if len(hops) >= RATE_LIMIT_TRUSTED_PROXIES:
+            # Each trusted proxy appended the address it received the request from
+            return hops[-RATE_LIMIT_TRUSTED_PROXIES]
+    return request.client.host if request.client else "unknown"
+
+def _take(key: str, per_minute: float, burst: float) -> float:
+    if per_minute <= 0:
+        return 0.0
+    try:
+        return _backend.take(key, per_minute / 60, max(burst, 1))
+    except Exception:
+        logger.warning("Rate limit backend unavailable", exc_info=True)
+        return 0.0
+
+def _check(action: str, ip: str, email: str) -> None:
+    email_digest = hashlib.sha256(email.strip().lower().encode()).hexdigest()[:32]
+    for scope, key, per_minute, burst in (
+        ("ip", f"rl:{action}:ip:{ip}", RATE_LIMIT_IP_PER_MINUTE, RATE_LIMIT_IP_BURST),
+        ("email", f"rl:{action}:email:{email_digest}", RATE_LIMIT_EMAIL_PER_MINUTE, RATE_LIMIT_EMAIL_BURST),
+    ):
+        wait = _take(key, per_minute, burst)
+        if wait > 0:
+            RATE_LIMITED.labels(action, scope).inc()
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many attempts, please retry later.",
+                headers={"Retry-After": str(max(1, math.ceil(wait)))},
+            )
+
+async def limit(action: str, request: Request, email: str) -> None:
+    """Take a token for the client IP and the email; raises 429 if either bucket is empty"""
+    ip = client_ip(request)
+    if isinstance(_backend, MemoryBucketBackend):
+        _check(action, ip, email)
+    else:
+        # Network round trips stay off the event loop
+        await run_in_threadpool(_check, action, ip, email)
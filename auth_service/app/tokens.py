@@ -0,0 +1,128 @@
+"""
+Refresh tokens with rotation and reuse detection.
+
+A refresh token is ``<row id>.<random secret>``; the refresh_tokens row keeps
+only a SHA-256 of the secret. Renewing an access token costs a primary-key
+lookup, a conditional UPDATE that marks the token used, an INSERT of its
+successor and a JWT signature, instead of a bcrypt verification.
+
+Every exchange rotates the token. The tokens descending from one login form a
+family, and presenting a token that was already exchanged means it was copied:
+the whole family is revoked, so both the thief and the victim must log in
+again. A token reused within REFRESH_TOKEN_REUSE_GRACE seconds of its exchange
+is only rejected, which covers two tabs refreshing at the same moment.
+
+Sessions slide: each exchange extends the expiry by REFRESH_TOKEN_TTL_DAYS, up
+to REFRESH_SESSION_MAX_DAYS after the login.
+"""
+import hashlib
+import hmac
+import os
+import secrets
+from datetime import datetime, timedelta
+from typing import Tuple
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, status
+from sqlalchemy import and_
+from sqlalchemy.orm import Session
+
+from .metrics import REFRESH_TOKENS
+from .models import RefreshToken
+
+load_dotenv()
+
+REFRESH_TOKEN_TTL_DAYS = float(os.getenv("REFRESH_TOKEN_TTL_DAYS", "14"))
+REFRESH_SESSION_MAX_DAYS = float(os.getenv("REFRESH_SESSION_MAX_DAYS", "90"))
+REFRESH_TOKEN_REUSE_GRACE = float(os.getenv("REFRESH_TOKEN_REUSE_GRACE", "10"))
+
+def _hash_secret(secret: str) -> str:
+    return hashlib.sha256(secret.encode()).hexdigest()
+
+def _invalid_token() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token.")
+
+def _add_token(db: Session, user_id: int, family_id: str, session_started_at: datetime, now: datetime) -> str:
+    secret = secrets.token_urlsafe(32)
+    expires_at = min(
+        now + timedelta(days=REFRESH_TOKEN_TTL_DAYS),
+        session_started_at + timedelta(days=REFRESH_SESSION_MAX_DAYS),
+    )
+    token = RefreshToken(
+        user_id=user_id,
+        family_id=family_id,
+        secret_hash=_hash_secret(secret),
+        session_started_at=session_started_at,
+        expires_at=expires_at,
+    )
+    db.add(token)
+    db.flush()
+    return f"{token.id}.{secret}"
+
+def issue(db: Session, user_id: int) -> str:
+    """Start a new session for a user and return its first refresh token; the caller commits"""
+    now = datetime.utcnow()
+    # Expired rows of this user are dead weight; drop them while we're here
+    db.query(RefreshToken).filter(
+        and_(RefreshToken.user_id == user_id, RefreshToken.expires_at < now)
+    ).delete(synchronize_session=False)
+    return _add_token(db, user_id, secrets.token_hex(16), now, now)
+
+def _lookup(db: Session, token: str) -> RefreshToken:
+    token_id, _, secret = token.partition(".")
+    if not token_id.isdigit() or not secret:
+        raise _invalid_token()
+    row = db.get(RefreshToken, int(token_id))
+    if row is None or not hmac.compare_digest(row.secret_hash, _hash_secret(secret)):
+        raise _invalid_token()
+    return row
+
+def _revoke_family(db: Session, family_id: str) -> None:
+    db.query(RefreshToken).filter(RefreshToken.family_id == family_id).update(
+        {RefreshToken.revoked: True}, synchronize_session=False
+    )
+
+def rotate(db: Session, token: str) -> Tuple[int, str]:
+    """Exchange a refresh token for its successor; returns (user_id, new token)
+
+    Commits. Raises 401 for unknown, expired, revoked or reused tokens.
+    """
+    row = _lookup(db, token)
+    now = datetime.utcnow()
+    if row.revoked or row.expires_at <= now:
+        REFRESH_TOKENS.labels(outcome="rejected").inc()
+        raise _invalid_token()
+
+    # Claim the token atomically so that of two concurrent exchanges only one wins
+    claimed = db.query(RefreshToken).filter(
+        and_(RefreshToken.id == row.id, RefreshToken.used_at.is_(None), RefreshToken.revoked == False)
+    ).update({RefreshToken.used_at: now}, synchronize_session=False)
+    if not claimed:
+        db.refresh(row)
+        if not row.revoked and row.used_at < now - timedelta(seconds=REFRESH_TOKEN_REUSE_GRACE):
+            _revoke_family(db, row.family_id)
+            db.commit()
+            REFRESH_TOKENS.labels(outcome="reuse_detected").inc()
+        else:
+            db.rollback()
+            REFRESH_TOKENS.labels(outcome="rejected").inc()
+        raise _invalid_token()
+
+    user_id = row.user_id
+    new_token = _add_token(db, user_id, row.family_id, row.session_started_at, now)
+    db.commit()
+    REFRESH_TOKENS.labels(outcome="rotated").inc()
+    return user_id, new_token
+
+def revoke(db: Session, token: str) -> None:
+    """End the session a refresh token belongs to; commits"""
+    row = _lookup(db, token)
+    _revoke_family(db, row.family_id)
+    db.commit()
+
+def revoke_all(db: Session, user_id: int) -> None:
+    """End every session of a user; commits"""
+    db.query(RefreshToken).filter(RefreshToken.user_id == user_id).update(
+        {RefreshToken.revoked: True}, synchronize_session=False
+    )
+    db.commit()
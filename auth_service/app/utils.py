@@ -1,28 +1,49 @@
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from jose import jwt, JWTError
+import itertools
+import logging
 import os
+import uuid
 from dotenv import load_dotenv
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from .blobs import PROFILE_THUMBNAIL_SIZES, image_url
+from .cache import LRUCache, create_backend
 from .database import SessionLocal
 from .models import User
 
 load_dotenv()
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 SECRET_KEY = os.getenv("JWT_SECRET_KEY")
 ALGORITHM = os.getenv("JWT_ALGORITHM")
+# Short-lived; clients renew with a refresh token instead of logging in again
+ACCESS_TOKEN_EXPIRE_MINUTES = float(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+# User profile cache: authenticated reads are served from here instead of
+# loading the user row on every request
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "10000"))
+# Lifetime of entries in the optional shared backend (memory:// or
+# redis://...), which every replica sees updates in
+PROFILE_CACHE_TTL = float(os.getenv("PROFILE_CACHE_TTL", "300"))
+PROFILE_CACHE_URL = os.getenv("PROFILE_CACHE_URL")
+# The per-process layer is only invalidated on the replica handling an update,
+# so its TTL bounds how long the other replicas may serve the old profile
+PROFILE_CACHE_LOCAL_TTL = float(os.getenv("PROFILE_CACHE_LOCAL_TTL", "5"))
 
-def verify_password(plain: str, hashed: str) -> bool:
-    return pwd_context.verify(plain, hashed)
+logger = logging.getLogger(__name__)
 
-def create_access_token(data: dict, expires_delta: timedelta = timedelta(hours=1)):
+_profile_backend = create_backend(PROFILE_CACHE_URL)
+_profile_cache = LRUCache(maxsize=PROFILE_CACHE_SIZE, ttl=min(PROFILE_CACHE_TTL, PROFILE_CACHE_LOCAL_TTL))
+# Bumped on invalidation, so a load that raced with an update doesn't cache what
+# it read. Entries only need to outlive the loads in flight, and anything a lost
+# entry lets through expires from the local layer just as fast.
+_profile_generations = LRUCache(maxsize=PROFILE_CACHE_SIZE, ttl=PROFILE_CACHE_LOCAL_TTL)
+_profile_generation_sequence = itertools.count(1)
+
+def create_access_token(data: dict, expires_delta: timedelta = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)):
     to_encode = data.copy()
     expire = datetime.utcnow() + expires_delta
     to_encode.update({"exp": expire})
@@ -35,23 +56,99 @@ def get_db():
     finally:
         db.close()
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Invalid authentication credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
+async def get_current_user_id(token: str = Depends(oauth2_scheme)) -> int:
+    """Validate the JWT and return its user ID without touching the database"""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub")
         if user_id is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
+            raise _credentials_exception()
+        return int(user_id)
+    except (JWTError, ValueError):
+        raise _credentials_exception()
+
+# Profile cache
+def user_profile(user: User) -> dict:
+    """Public profile fields of a user"""
+    return {
+        "id": user.id,
+        "first_name": user.first_name,
+        "last_name": user.last_name,
+        "email": user.email,
+        "phone": user.phone,
+        "profile_image": image_url(user.profile_image),
+        "profile_thumbnail": image_url(user.profile_image, PROFILE_THUMBNAIL_SIZES[0] if PROFILE_THUMBNAIL_SIZES else None),
+    }
+
+# In the shared backend profiles are keyed by a per-user version that each
+# update replaces, so a load that read the row before the update can only
+# store the old profile under a key nobody reads anymore
+def _profile_key(user_id: int, version: str) -> str:
+    return f"auth:profile:{user_id}:{version}"
+
+def _version_key(user_id: int) -> str:
+    return f"auth:profile-version:{user_id}"
+
+def _load_profile(user_id: int):
+    # A cache outage must not lock users out, so backend errors count as misses
+    version = None
+    if _profile_backend is not None:
+        try:
+            # Read before the row, so the profile is never older than its version
+            version = _profile_backend.get(_version_key(user_id)) or "0"
+            profile = _profile_backend.get(_profile_key(user_id, version))
+            if profile is not None:
+                return profile
+        except Exception:
+            version = None
+            logger.warning("Profile cache backend unavailable", exc_info=True)
+
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.id == user_id).first()
+        profile = user_profile(user) if user else None
+    finally:
+        db.close()
+
+    if profile is not None and version is not None:
+        try:
+            _profile_backend.set(_profile_key(user_id, version), profile, ttl=PROFILE_CACHE_TTL)
+        except Exception:
+            logger.warning("Profile cache backend unavailable", exc_info=True)
+    return profile
+
+def invalidate_profile(user_id: int) -> None:
+    """Drop a user's cached profile from every cache layer; call after commit"""
+    _profile_generations.set(user_id, next(_profile_generation_sequence))
+    _profile_cache.delete(user_id)
+    if _profile_backend is not None:
+        try:
+            _profile_backend.set(_version_key(user_id), uuid.uuid4().hex)
+        except Exception:
+            logger.warning("Profile cache backend unavailable", exc_info=True)
+
+async def get_current_profile(user_id: int = Depends(get_current_user_id)) -> dict:
+    """Profile of the authenticated user; no DB session is opened on a cache hit"""
+    profile = _profile_cache.get(user_id)
+    if profile is None:
+        generation = _profile_generations.get(user_id)
+        profile = await run_in_threadpool(_load_profile, user_id)
+        if profile is None:
+            raise _credentials_exception()
+        if _profile_generations.get(user_id) == generation:
+            _profile_cache.set(user_id, profile)
+    return profile
 
-    user = db.query(User).filter(User.id == int(user_id)).first()
+def get_current_user(user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db)) -> User:
+    user = db.query(User).filter(User.id == user_id).first()
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
 
     return user
\ No newline at end of file
@@ -0,0 +1,63 @@
+"""
+Alembic environment for the auth service.
+
+The notes and auth services share one PostgreSQL database, so each keeps its
+revision in its own version table. On PostgreSQL the migration holds an
+advisory lock: when several pods run ``alembic upgrade head`` at once (one per
+init container), the first migrates and the rest wait, then find nothing to do.
+"""
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine, pool, text
+
+from app.database import DATABASE_URL
+from app.models import Base
+
+VERSION_TABLE = "alembic_version_auth"
+# Arbitrary, but distinct from the notes service's key
+ADVISORY_LOCK_KEY = 720_002
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+def run_migrations_offline() -> None:
+    context.configure(
+        url=DATABASE_URL,
+        target_metadata=target_metadata,
+        version_table=VERSION_TABLE,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online() -> None:
+    engine = create_engine(DATABASE_URL, poolclass=pool.NullPool)
+    with engine.connect() as connection:
+        is_postgres = connection.dialect.name == "postgresql"
+        if is_postgres:
+            connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": ADVISORY_LOCK_KEY})
+            connection.commit()
+        try:
+            context.configure(
+                connection=connection,
+                target_metadata=target_metadata,
+                version_table=VERSION_TABLE,
+                # SQLite can't ALTER most things in place
+                render_as_batch=connection.dialect.name == "sqlite",
+            )
+            with context.begin_transaction():
+                context.run_migrations()
+        finally:
+            if is_postgres:
+                connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ADVISORY_LOCK_KEY})
+                connection.commit()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,56 @@
+"""Baseline: the schema the service used to create on startup
+
+Databases created by the old ``create_all`` call already have these tables,
+so each table and index is only created when missing.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def _create_table(name: str, *columns) -> None:
+    if not sa.inspect(op.get_bind()).has_table(name):
+        op.create_table(name, *columns)
+
+def _create_index(name: str, table: str, columns, unique: bool = False) -> None:
+    if name not in {index["name"] for index in sa.inspect(op.get_bind()).get_indexes(table)}:
+        op.create_index(name, table, columns, unique=unique)
+
+def upgrade() -> None:
+    _create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("first_name", sa.String(), nullable=False),
+        sa.Column("last_name", sa.String(), nullable=False),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("phone", sa.String(), nullable=False),
+        sa.Column("hashed_password", sa.String(), nullable=False),
+        sa.Column("profile_image", sa.String(), nullable=True),
+    )
+    _create_index("ix_users_id", "users", ["id"])
+    _create_index("ix_users_email", "users", ["email"], unique=True)
+
+    _create_table(
+        "refresh_tokens",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("family_id", sa.String(32), nullable=False),
+        sa.Column("secret_hash", sa.String(64), nullable=False),
+        sa.Column("session_started_at", sa.DateTime(), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.Column("used_at", sa.DateTime(), nullable=True),
+        sa.Column("revoked", sa.Boolean(), nullable=False),
+    )
+    _create_index("ix_refresh_tokens_user_id", "refresh_tokens", ["user_id"])
+    _create_index("ix_refresh_tokens_family_id", "refresh_tokens", ["family_id"])
+
+def downgrade() -> None:
+    op.drop_table("refresh_tokens")
+    op.drop_table("users")
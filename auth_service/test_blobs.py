@@ -0,0 +1,41 @@
+"""
+Profile image storage limits, with blobs written to a temporary directory.
+"""
+import hashlib
+import io
+import os
+
+import pytest
+from fastapi import HTTPException
+from PIL import Image, ImageFile
+
+from app import blobs
+
+@pytest.fixture(autouse=True)
+def store_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(blobs, "BLOB_STORE_DIR", str(tmp_path))
+
+def _png(width: int, height: int) -> bytes:
+    out = io.BytesIO()
+    Image.new("L", (width, height)).save(out, format="PNG")
+    return out.getvalue()
+
+def test_image_within_limits_is_stored_with_thumbnails():
+    digest = blobs.store(_png(300, 200))
+    assert os.path.exists(blobs._path(digest))
+    for size in blobs.PROFILE_THUMBNAIL_SIZES:
+        with Image.open(blobs._path(digest, size)) as thumbnail:
+            assert max(thumbnail.size) == min(size, 300)
+
+def test_oversized_dimensions_are_rejected_before_decoding(monkeypatch):
+    # Blank pixels compress to almost nothing
+    data = _png(blobs.PROFILE_IMAGE_MAX_SIDE * 2, 64)
+    assert len(data) < blobs.BLOB_MAX_BYTES
+
+    def decode(*args, **kwargs):
+        raise AssertionError("pixels decoded")
+    monkeypatch.setattr(ImageFile.ImageFile, "load", decode)
+    with pytest.raises(HTTPException) as excinfo:
+        blobs.store(data)
+    assert excinfo.value.status_code == 413
+    assert not os.path.exists(blobs._path(hashlib.sha256(data).hexdigest()))
@@ -0,0 +1,91 @@
+"""
+The profile cache behind /dashboard.
+
+Runs on a temporary SQLite database brought to head with the service's
+migrations, with the ``memory://`` stand-in as the shared backend.
+"""
+import os
+import tempfile
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mktemp(suffix='.db')}")
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from fastapi.testclient import TestClient
+
+from app import cache, utils
+from app.database import SessionLocal
+from app.main import app
+from app.models import User
+
+@pytest.fixture(scope="module")
+def client():
+    command.upgrade(Config(os.path.join(os.path.dirname(__file__), "alembic.ini")), "head")
+    return TestClient(app)
+
+@pytest.fixture
+def user(client, monkeypatch):
+    monkeypatch.setattr(utils, "_profile_backend", cache.create_backend("memory://"))
+    utils._profile_cache.clear()
+    db = SessionLocal()
+    try:
+        row = User(first_name="Ada", last_name="Lovelace", email=f"ada{os.urandom(4).hex()}@example.com",
+                   phone="555-0100", hashed_password="x")
+        db.add(row)
+        db.commit()
+        return row.id
+    finally:
+        db.close()
+
+def _rename(user_id: int, first_name: str) -> None:
+    """An update committed by another replica: this one's local layer isn't told"""
+    db = SessionLocal()
+    try:
+        db.query(User).filter(User.id == user_id).update({User.first_name: first_name})
+        db.commit()
+    finally:
+        db.close()
+
+def _dashboard(client, user_id: int) -> dict:
+    token = utils.create_access_token({"sub": str(user_id)})
+    response = client.get("/dashboard", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    return response.json()
+
+def test_update_on_another_replica_is_seen_once_the_local_entry_expires(client, user):
+    assert _dashboard(client, user)["first_name"] == "Ada"
+    _rename(user, "Augusta")
+    # The other replica bumped the shared version; only the local layer is stale
+    utils._profile_backend.set(utils._version_key(user), "other-replica")
+    assert _dashboard(client, user)["first_name"] == "Ada"
+    utils._profile_cache.clear()
+    assert _dashboard(client, user)["first_name"] == "Augusta"
+
+def test_local_entries_expire_quickly_by_default():
+    assert utils._profile_cache.ttl <= utils.PROFILE_CACHE_LOCAL_TTL
+
+def test_load_racing_an_update_is_not_cached(client, user, monkeypatch):
+    real_user_profile = utils.user_profile
+
+    def read_then_update(row):
+        profile = real_user_profile(row)
+        # The update commits and invalidates after this load read the row
+        _rename(user, "Augusta")
+        utils.invalidate_profile(user)
+        return profile
+    monkeypatch.setattr(utils, "user_profile", read_then_update)
+    assert _dashboard(client, user)["first_name"] == "Ada"
+    monkeypatch.setattr(utils, "user_profile", real_user_profile)
+
+    # Neither layer kept the old profile
+    assert utils._profile_cache.get(user) is None
+    assert _dashboard(client, user)["first_name"] == "Augusta"
+
+def test_invalidation_bookkeeping_is_bounded(monkeypatch):
+    monkeypatch.setattr(utils._profile_generations, "maxsize", 3)
+    for user_id in range(1000, 1010):
+        utils.invalidate_profile(user_id)
+    assert len(utils._profile_generations) == 3
@@ -0,0 +1,121 @@
+"""
+Rate limiting and load shedding of /login and /signup.
+
+Buckets use the ``memory://`` backend, a fresh one per test, on a temporary
+SQLite database brought to head with the service's migrations.
+"""
+import os
+import tempfile
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mktemp(suffix='.db')}")
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from app import hashing, ratelimit
+from app.main import app
+
+@pytest.fixture(scope="module")
+def client():
+    command.upgrade(Config(os.path.join(os.path.dirname(__file__), "alembic.ini")), "head")
+    return TestClient(app)
+
+@pytest.fixture
+def limits(monkeypatch):
+    """Fresh memory:// buckets; call with per-minute rates and bursts to set the limits"""
+    monkeypatch.setattr(ratelimit, "_backend", ratelimit.create_backend("memory://"))
+
+    def configure(ip=(0, 0), email=(0, 0), trusted_proxies=0):
+        monkeypatch.setattr(ratelimit, "RATE_LIMIT_IP_PER_MINUTE", ip[0])
+        monkeypatch.setattr(ratelimit, "RATE_LIMIT_IP_BURST", ip[1])
+        monkeypatch.setattr(ratelimit, "RATE_LIMIT_EMAIL_PER_MINUTE", email[0])
+        monkeypatch.setattr(ratelimit, "RATE_LIMIT_EMAIL_BURST", email[1])
+        monkeypatch.setattr(ratelimit, "RATE_LIMIT_TRUSTED_PROXIES", trusted_proxies)
+    return configure
+
+def _login(client, email, ip=None):
+    headers = {"X-Forwarded-For": ip} if ip else {}
+    return client.post("/login", json={"email": email, "password": "wrong-password"}, headers=headers)
+
+def test_bucket_refills(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ratelimit.time, "monotonic", lambda: now[0])
+    backend = ratelimit.create_backend("memory://")
+
+    # 2 tokens, one more per second
+    assert backend.take("key", 1.0, 2) == 0
+    assert backend.take("key", 1.0, 2) == 0
+    assert backend.take("key", 1.0, 2) == pytest.approx(1.0)
+    now[0] += 0.5
+    assert backend.take("key", 1.0, 2) == pytest.approx(0.5)
+    now[0] += 0.5
+    assert backend.take("key", 1.0, 2) == 0
+    # Refill stops at the burst size
+    now[0] += 60
+    assert [backend.take("key", 1.0, 2) for _ in range(3)][-1] == pytest.approx(1.0)
+
+def test_login_answers_429_with_retry_after(client, limits):
+    limits(ip=(1, 2))
+    assert _login(client, "a@example.com").status_code == 401
+    assert _login(client, "b@example.com").status_code == 401
+
+    response = _login(client, "c@example.com")
+    assert response.status_code == 429
+    # One token a minute
+    assert 1 <= int(response.headers["Retry-After"]) <= 60
+
+def test_ip_and_email_buckets_are_separate(client, limits):
+    limits(ip=(60, 2), email=(1, 1), trusted_proxies=1)
+    # The same address from another IP is still limited by its email bucket
+    assert _login(client, "victim@example.com", ip="10.0.0.1").status_code == 401
+    assert _login(client, "Victim@Example.com", ip="10.0.0.2").status_code == 429
+
+    # Other addresses from one IP are limited by its IP bucket
+    assert _login(client, "x@example.com", ip="10.0.0.3").status_code == 401
+    assert _login(client, "y@example.com", ip="10.0.0.3").status_code == 401
+    assert _login(client, "z@example.com", ip="10.0.0.3").status_code == 429
+    assert _login(client, "z@example.com", ip="10.0.0.4").status_code == 401
+
+def test_signup_has_its_own_buckets(client, limits):
+    limits(ip=(1, 1))
+    assert _login(client, "a@example.com").status_code == 401
+    assert _login(client, "a@example.com").status_code == 429
+    response = client.post("/signup", json={
+        "first_name": "A",
+        "last_name": "B",
+        "email": "a@example.com",
+        "phone": "555-0100",
+        "password": "secret-password",
+        "confirm_password": "other-password",
+    })
+    assert response.status_code == 400
+
+def test_backend_outage_lets_requests_through(client, limits, monkeypatch):
+    limits(ip=(1, 1))
+
+    def unavailable(key, rate, burst):
+        raise ConnectionError("backend down")
+    monkeypatch.setattr(ratelimit._backend, "take", unavailable)
+    assert [_login(client, "a@example.com").status_code for _ in range(3)] == [401, 401, 401]
+
+def test_saturated_hashing_sheds_with_503(client, limits, monkeypatch):
+    limits()
+    monkeypatch.setattr(hashing, "_in_flight", hashing.PASSWORD_HASH_QUEUE_LIMIT)
+    with pytest.raises(HTTPException) as excinfo:
+        hashing.admit()
+    assert excinfo.value.status_code == 503
+
+    response = _login(client, "a@example.com")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == hashing.PASSWORD_HASH_RETRY_AFTER
+
+    monkeypatch.setattr(hashing, "_in_flight", hashing.PASSWORD_HASH_QUEUE_LIMIT - 1)
+    hashing.admit()
+    assert _login(client, "a@example.com").status_code == 401
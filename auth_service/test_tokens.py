@@ -0,0 +1,155 @@
+"""
+Refresh token rotation, reuse detection and revocation.
+
+Runs on a temporary SQLite database brought to head with the service's
+migrations; each test starts sessions for its own user id.
+"""
+import os
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mktemp(suffix='.db')}")
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from fastapi import HTTPException
+
+from app import tokens
+from app.database import SessionLocal
+from app.models import RefreshToken
+
+@pytest.fixture(scope="module", autouse=True)
+def schema():
+    command.upgrade(Config(os.path.join(os.path.dirname(__file__), "alembic.ini")), "head")
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    yield session
+    session.close()
+
+def _issue(db, user_id: int) -> str:
+    token = tokens.issue(db, user_id)
+    db.commit()
+    return token
+
+def _assert_rejected(db, token: str) -> None:
+    with pytest.raises(HTTPException) as excinfo:
+        tokens.rotate(db, token)
+    assert excinfo.value.status_code == 401
+
+def _row(db, token: str) -> RefreshToken:
+    db.expire_all()
+    return db.get(RefreshToken, int(token.partition(".")[0]))
+
+def _age_exchange(db, token: str, seconds: float) -> None:
+    """Pretend the token was exchanged this many seconds ago"""
+    row = _row(db, token)
+    row.used_at = datetime.utcnow() - timedelta(seconds=seconds)
+    db.commit()
+
+def test_rotate_returns_a_successor_in_the_same_family(db):
+    first = _issue(db, 1)
+    user_id, second = tokens.rotate(db, first)
+    assert user_id == 1
+    assert second != first
+    assert _row(db, second).family_id == _row(db, first).family_id
+    assert _row(db, first).used_at is not None
+    assert tokens.rotate(db, second)[0] == 1
+
+@pytest.mark.parametrize("token", ["", "abc", "1", "1.", "999999.secret", "x.secret"])
+def test_malformed_and_unknown_tokens_are_rejected(db, token):
+    _assert_rejected(db, token)
+
+def test_wrong_secret_is_rejected(db):
+    token_id, _, _ = _issue(db, 2).partition(".")
+    _assert_rejected(db, f"{token_id}.not-the-secret")
+
+def test_replay_after_grace_revokes_the_family(db):
+    first = _issue(db, 3)
+    _, second = tokens.rotate(db, first)
+    _, third = tokens.rotate(db, second)
+    other_session = _issue(db, 3)
+
+    _age_exchange(db, first, tokens.REFRESH_TOKEN_REUSE_GRACE + 1)
+    _assert_rejected(db, first)
+    # Every token of the family is dead, including the current one...
+    assert all(row.revoked for row in db.query(RefreshToken).filter_by(family_id=_row(db, first).family_id))
+    _assert_rejected(db, third)
+    # ...but the user's other sessions are not
+    assert tokens.rotate(db, other_session)[0] == 3
+
+def test_replay_within_grace_is_only_rejected(db):
+    first = _issue(db, 4)
+    _, second = tokens.rotate(db, first)
+
+    _assert_rejected(db, first)
+    assert not _row(db, second).revoked
+    assert tokens.rotate(db, second)[0] == 4
+
+def test_expired_token_is_rejected(db):
+    token = _issue(db, 5)
+    row = _row(db, token)
+    row.expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+    _assert_rejected(db, token)
+
+def test_rotation_slides_expiry_up_to_the_session_maximum(db):
+    first = _issue(db, 6)
+    row = _row(db, first)
+    # A session that started just short of its maximum age
+    row.session_started_at = datetime.utcnow() - timedelta(days=tokens.REFRESH_SESSION_MAX_DAYS - 1)
+    db.commit()
+
+    _, second = tokens.rotate(db, first)
+    successor = _row(db, second)
+    assert successor.expires_at == successor.session_started_at + timedelta(days=tokens.REFRESH_SESSION_MAX_DAYS)
+
+def test_revoke_ends_one_session(db):
+    first = _issue(db, 7)
+    _, second = tokens.rotate(db, first)
+    other_session = _issue(db, 7)
+
+    tokens.revoke(db, second)
+    _assert_rejected(db, second)
+    assert tokens.rotate(db, other_session)[0] == 7
+
+def test_revoke_all_ends_every_session(db):
+    sessions = [_issue(db, 8) for _ in range(3)]
+    unrelated = _issue(db, 9)
+
+    tokens.revoke_all(db, 8)
+    for token in sessions:
+        _assert_rejected(db, token)
+    assert tokens.rotate(db, unrelated)[0] == 9
+
+def test_concurrent_rotations_have_one_winner(db):
+    token = _issue(db, 10)
+    barrier = threading.Barrier(2)
+    results = []
+
+    def exchange():
+        session = SessionLocal()
+        try:
+            barrier.wait()
+            results.append(tokens.rotate(session, token)[1])
+        except HTTPException as exc:
+            results.append(exc.status_code)
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=exchange) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    winners = [result for result in results if isinstance(result, str)]
+    assert len(winners) == 1
+    assert results.count(401) == 1
+    # The loser was inside the grace window: the winner's session lives on
+    assert tokens.rotate(db, winners[0])[0] == 10
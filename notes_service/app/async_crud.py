@@ -0,0 +1,142 @@
+"""
+Async counterparts of the functions in crud.py.
+
+Each function runs the synchronous implementation through
+``AsyncSession.run_sync``, so the queries are defined once in crud.py while
+the database I/O is awaited on the event loop (asyncpg/aiosqlite) instead of
+blocking a threadpool worker.
+
+``run_sync`` runs its function on the event loop thread, so only the awaited
+database I/O yields. Work that blocks for another reason is kept out of it and
+sent to the threadpool: calls to a shared list cache backend (a blocking Redis
+client) and the Python-side ranking of fallback search results.
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional
+from . import crud, models, schemas, search, sync
+
+# Category and tag list cache
+async def _read_through(db: AsyncSession, kind: str, user_id: int, version: Optional[int], load) -> List[dict]:
+    """crud._read_through with the shared backend calls in the threadpool and load() through run_sync"""
+    if version is None:
+        version = await get_collection_version(db, user_id)
+    key = crud.list_key(kind, user_id, version)
+
+    if crud._list_backend is None:
+        items = crud.cached_list(key)
+    else:
+        items = await run_in_threadpool(crud.cached_list, key)
+    if items is None:
+        items = await db.run_sync(load, user_id)
+        if crud._list_backend is None:
+            crud.store_list(key, items)
+        else:
+            await run_in_threadpool(crud.store_list, key, items)
+    return items
+
+# Category CRUD operations
+async def create_category(db: AsyncSession, category: schemas.CategoryCreate, user_id: int) -> models.Category:
+    """Create a new category for a user"""
+    return await db.run_sync(crud.create_category, category, user_id)
+
+async def get_categories(db: AsyncSession, user_id: int, version: Optional[int] = None) -> List[dict]:
+    """Get all categories for a user, as schemas.Category dicts from the list cache"""
+    return await _read_through(db, "categories", user_id, version, crud.load_categories)
+
+async def get_category(db: AsyncSession, category_id: int, user_id: int) -> Optional[models.Category]:
+    """Get a specific category by ID for a user"""
+    return await db.run_sync(crud.get_category, category_id, user_id)
+
+async def update_category(db: AsyncSession, category_id: int, user_id: int, category_update: schemas.CategoryUpdate) -> Optional[models.Category]:
+    """Update a category"""
+    return await db.run_sync(crud.update_category, category_id, user_id, category_update)
+
+async def delete_category(db: AsyncSession, category_id: int, user_id: int) -> bool:
+    """Delete a category and set notes' category_id to None"""
+    return await db.run_sync(crud.delete_category, category_id, user_id)
+
+# Tag CRUD operations
+async def create_tag(db: AsyncSession, tag: schemas.TagCreate, user_id: int) -> models.Tag:
+    """Create a new tag for a user"""
+    return await db.run_sync(crud.create_tag, tag, user_id)
+
+async def get_tags(db: AsyncSession, user_id: int, version: Optional[int] = None) -> List[dict]:
+    """Get all tags for a user, as schemas.Tag dicts from the list cache"""
+    return await _read_through(db, "tags", user_id, version, crud.load_tags)
+
+async def get_tag(db: AsyncSession, tag_id: int, user_id: int) -> Optional[models.Tag]:
+    """Get a specific tag by ID for a user"""
+    return await db.run_sync(crud.get_tag, tag_id, user_id)
+
+async def delete_tag(db: AsyncSession, tag_id: int, user_id: int) -> bool:
+    """Delete a tag and its associations"""
+    return await db.run_sync(crud.delete_tag, tag_id, user_id)
+
+# Note CRUD operations
+async def create_note(db: AsyncSession, note: schemas.NoteCreate, user_id: int) -> models.Note:
+    """Create a new note for a user"""
+    return await db.run_sync(crud.create_note, note, user_id)
+
+async def get_notes(
+    db: AsyncSession, user_id: int, filters: schemas.NoteFilter, version: Optional[int] = None
+) -> tuple[List[models.Note], Optional[int], bool, Optional[str]]:
+    """Get notes for a user with filtering and offset or keyset pagination"""
+    ranked_ids = await _rank_search(db, user_id, filters.search) if filters.search else None
+    return await db.run_sync(crud.get_notes, user_id, filters, version, ranked_ids)
+
+async def get_note(db: AsyncSession, note_id: int, user_id: int) -> Optional[models.Note]:
+    """Get a specific note by ID for a user"""
+    return await db.run_sync(crud.get_note, note_id, user_id)
+
+async def update_note(db: AsyncSession, note_id: int, user_id: int, note_update: schemas.NoteUpdate) -> Optional[models.Note]:
+    """Update a note"""
+    return await db.run_sync(crud.update_note, note_id, user_id, note_update)
+
+async def delete_note(db: AsyncSession, note_id: int, user_id: int) -> bool:
+    """Permanently delete a note and its associations"""
+    return await db.run_sync(crud.delete_note, note_id, user_id)
+
+async def permanently_delete_note(db: AsyncSession, note_id: int, user_id: int) -> bool:
+    """Permanently delete a note and its associations"""
+    return await db.run_sync(crud.permanently_delete_note, note_id, user_id)
+
+async def toggle_favorite(db: AsyncSession, note_id: int, user_id: int) -> Optional[models.Note]:
+    """Toggle favorite status of a note"""
+    return await db.run_sync(crud.toggle_favorite, note_id, user_id)
+
+async def _rank_search(db: AsyncSession, user_id: int, value: str) -> Optional[List[int]]:
+    """Fallback search ranking with the scoring in the threadpool; None where the database ranks"""
+    clauses = search.parse_query(value)
+    if not clauses or db.get_bind().dialect.name == "postgresql":
+        return None
+    rows, corpus_size = await db.run_sync(search.load_postings, user_id, clauses)
+    return await run_in_threadpool(search.rank_postings, rows, corpus_size, clauses)
+
+# Batch operations
+async def batch_update_notes(db: AsyncSession, user_id: int, batch: schemas.NoteBatchRequest) -> Optional[List[dict]]:
+    """Apply one operation to many notes with set-based statements in a single transaction"""
+    return await db.run_sync(crud.batch_update_notes, user_id, batch)
+
+# Collection versions
+async def get_collection_version(db: AsyncSession, user_id: int) -> int:
+    """Current version of the user's notes, categories and tags (0 before the first write)"""
+    return await db.run_sync(crud.get_collection_version, user_id)
+
+async def get_note_version(db: AsyncSession, note_id: int, user_id: int) -> Optional[int]:
+    """Row version of a note (None if the user has no such note), without loading it"""
+    return await db.run_sync(crud.get_note_version, note_id, user_id)
+
+# Dashboard stats
+async def refresh_user_stats(db: AsyncSession, user_id: int) -> dict:
+    """Recompute a user's materialized counters from the source tables"""
+    return await db.run_sync(crud.refresh_user_stats, user_id)
+
+async def get_dashboard_stats(db: AsyncSession, user_id: int) -> dict:
+    """Get dashboard statistics for a user"""
+    return await db.run_sync(crud.get_dashboard_stats, user_id)
+
+# Incremental sync
+async def get_sync_changes(db: AsyncSession, user_id: int, since: Optional[str], limit: int) -> dict:
+    """Changes after a sync token, shaped like schemas.SyncResponse"""
+    return await db.run_sync(sync.get_changes, user_id, since, limit)
@@ -0,0 +1,300 @@
+"""
+Async route handlers, mounted instead of routes.py when DB_MODE=async.
+
+They expose exactly the same API as routes.py and share its request parsing
+and response helpers, but await AsyncSession-backed crud functions.
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from typing import Literal, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import async_crud, exporter, importer, schemas
+from .database import AsyncSessionLocal
+from .auth import get_current_user_id
+from .routes import (
+    _batch_response, _check_etag, _collection_etag, _dashboard_response, _note_etag,
+    _note_list_response, _sync_token_errors, _transform_note_for_response, get_note_filters,
+)
+from .serialization import FastJSONResponse
+
+router = APIRouter()
+
+# Dependency to get database session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def collection_version(
+    current_user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+) -> int:
+    """The user's collection version, read once per request for the ETag and the caches"""
+    return await async_crud.get_collection_version(db=db, user_id=current_user_id)
+
+async def collection_etag(
+    request: Request,
+    current_user_id: int = Depends(get_current_user_id),
+    version: int = Depends(collection_version)
+) -> dict:
+    """ETag headers for a collection read, answering 304 before any row is queried"""
+    return _check_etag(request, _collection_etag(request, current_user_id, version))
+
+# Category routes
+@router.post("/categories", response_model=schemas.Category, status_code=status.HTTP_201_CREATED)
+async def create_category(
+    category: schemas.CategoryCreate,
+    current_user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Create a new category"""
+    return await async_crud.create_category(db=db, category=category, user_id=current_user_id)
+
+@router.get("/categories", response_model=schemas.CategoryList)
+async def get_categories(
+    response: Response,
+    etag_headers: dict = Depends(collection_etag),
+    version: int = Depends(collection_version),
+    current_user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get all categories for the current user"""
+    categories = await async_crud.get_categories(db=db, user_id=current_user_id, version=version)
+    response.headers.update(etag_headers)
+    return schemas.CategoryList(categories=categories, total=len(categories))
+
+@router.get("/categories/{category_id}", response_model=schemas.Category)
+async def get_category(
+    category_id: int,
+    current_user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get a specific category"""
+    category = await async_crud.get_category(db=db, category_id=category_id, user_id=current_user_id)
+    if not category:
+        raise HTTPException(status_code=404, detail="Category not found")
+    return category
+
+@router.put("/categories/{category_id}", response_model=schemas.Category)
+async def update_category(
+    category_id: int,
+    category_update: schemas.CategoryUpdate,
+    current_user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Update a category"""
+    category = await async_crud.update_category(
+        db=db, category_id=category_id, user_id=current_user_id, category_update=category_update
+    )
+    if not category:
+        raise HTTPException(status_code=404, detail="Category not found")
+    return category
+
+@router.delete("/categories/{category_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_category(
+    category_id: int,
+    current_user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Delete a category"""
+    if not await async_crud.delete_category(db=db, category_id=category_id, user_id=current_user_id):
+        raise HTTPException(status_code=404, detail="Category not found")
+
+# Tag routes
+@router.post("/tags", response_model=schemas.Tag, status_code=status.HTTP_201_CREATED)
+async def create_tag(
+    tag: schemas.TagCreate,
+    current_user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Create a new tag"""
+    return await async_crud.create_tag(db=db, tag=tag, user_id=current_user_id)
+
+@router.get("/tags", response_model=schemas.TagList)
+async def get_tags(
+    response: Response,
+    etag_headers: dict = Depends(collection_etag),
+    version: int = Depends(collection_version),
+    current_user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get all tags for the current user"""
+    tags = await async_crud.get_tags(db=db, user_id=current_user_id, version=version)
+    response.headers.update(etag_headers)
+    return schemas.TagList(tags=tags, total=len(tags))
+
+@router.delete("/tags/{tag_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_tag(
+    tag_id: int,
+    current_user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Delete a tag"""
+    if not await async_crud.delete_tag(db=db, tag_id=tag_id, user_id=current_user_id):
+        raise HTTPException(status_code=404, detail="Tag not found")
+
+# Note routes
+@router.post("/notes", response_model=schemas.NoteResponse, status_code=status.HTTP_201_CREATED)
+async def create_note(
+    note: schemas.NoteCreate,
+    current_user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Create a new note"""
+    try:
+        note_result = await async_crud.create_note(db=db, note=note, user_id=current_user_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return _transform_note_for_response(note_result)
+
+@router.get("/notes", response_model=schemas.NoteList)
+async def get_notes(
+    filters: schemas.NoteFilter = Depends(get_note_filters),
+    etag_headers: dict = Depends(collection_etag),
+    version: int = Depends(collection_version),
+    current_user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get notes with filtering and offset or cursor pagination"""
+    notes, total, total_is_approximate, next_cursor = await async_crud.get_notes(
+        db=db, user_id=current_user_id, filters=filters, version=version
+    )
+    response = _note_list_response(notes, total, total_is_approximate, next_cursor, filters)
+    response.headers.update(etag_headers)
+    return response
+
+@router.get("/notes/export")
+async def export_notes(
+    format: Literal["ndjson", "markdown"] = Query("ndjson", description="ndjson, or markdown for a zip of Markdown files"),
+    current_user_id: int = Depends(get_current_user_id)
+):
+    """Stream every note of the current user as NDJSON or a zip of Markdown files"""
+    return exporter.export_response(current_user_id, format, use_async=True)
+
+@router.get("/notes/{note_id}", response_model=schemas.NoteResponse)
+async def get_note(
+    note_id: int,
+    request: Request,
+    response: Response,
+    current_user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get a specific note"""
+    version = await async_crud.get_note_version(db=db, note_id=note_id, user_id=current_user_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Note not found")
+    etag_headers = _check_etag(request, _note_etag(note_id, version))
+    note = await async_crud.get_note(db=db, note_id=note_id, user_id=current_user_id)
+    if not note:
+        raise HTTPException(status_code=404, detail="Note not found")
+    response.headers.update(etag_headers)
+    return _transform_note_for_response(note)
+
+@router.put("/notes/{note_id}", response_model=schemas.NoteResponse)
+async def update_note(
+    note_id: int,
+    note_update: schemas.NoteUpdate,
+    current_user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Update a note"""
+    try:
+        note = await async_crud.update_note(
+            db=db, note_id=note_id, user_id=current_user_id, note_update=note_update
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if not note:
+        raise HTTPException(status_code=404, detail="Note not found")
+    return _transform_note_for_response(note)
+
+@router.delete("/notes/{note_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_note(
+    note_id: int,
+    permanent: bool = Query(False, description="Permanently delete the note"),
+    current_user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Delete a note (soft delete by default, permanent if specified)"""
+    if permanent:
+        success = await async_crud.permanently_delete_note(db=db, note_id=note_id, user_id=current_user_id)
+    else:
+        success = await async_crud.delete_note(db=db, note_id=note_id, user_id=current_user_id)
+    
+    if not success:
+        raise HTTPException(status_code=404, detail="Note not found")
+
+@router.post("/notes/batch", response_model=schemas.NoteBatchResponse)
+async def batch_update_notes(
+    batch: schemas.NoteBatchRequest,
+    current_user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Favorite, recategorize, tag, untag or delete many notes in one transaction"""
+    results = await async_crud.batch_update_notes(db=db, user_id=current_user_id, batch=batch)
+    return _batch_response(batch, results)
+
+# Bulk import
+@router.post("/notes/import", response_model=schemas.NoteImportProgress)
+async def import_notes(
+    request: Request,
+    import_id: Optional[str] = Query(None, max_length=64, pattern=r"^[A-Za-z0-9_-]+$", description="Client-chosen id for polling progress"),
+    current_user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Import notes from an NDJSON body or multipart upload, creating categories and tags by name"""
+    chunks = await importer.import_source(request)
+    job = importer.start_import(current_user_id, import_id)
+    
+    async def write_batch(items):
+        await db.run_sync(job.write_batch, items)
+    
+    return await importer.run_import(job, chunks, write_batch)
+
+@router.get("/notes/import/{import_id}", response_model=schemas.NoteImportProgress)
+async def get_import_progress(
+    import_id: str,
+    current_user_id: int = Depends(get_current_user_id)
+):
+    """Progress of a running or recently finished import"""
+    progress = importer.get_import_progress(current_user_id, import_id)
+    if not progress:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return progress
+
+# Note actions
+@router.post("/notes/{note_id}/favorite", response_model=schemas.NoteResponse)
+async def toggle_favorite(
+    note_id: int,
+    current_user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Toggle favorite status of a note"""
+    note = await async_crud.toggle_favorite(db=db, note_id=note_id, user_id=current_user_id)
+    if not note:
+        raise HTTPException(status_code=404, detail="Note not found")
+    return _transform_note_for_response(note)
+
+# Dashboard
+@router.get("/dashboard", response_model=schemas.DashboardStats)
+async def get_dashboard_stats(
+    etag_headers: dict = Depends(collection_etag),
+    current_user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get dashboard statistics and recent notes"""
+    stats = await async_crud.get_dashboard_stats(db=db, user_id=current_user_id)
+    response = _dashboard_response(stats)
+    response.headers.update(etag_headers)
+    return response
+
+# Incremental sync
+@router.get("/sync", response_model=schemas.SyncResponse)
+async def sync_changes(
+    since: Optional[str] = Query(None, description="next_token from the previous sync; omit for a full sync"),
+    limit: int = Query(500, ge=1, le=1000),
+    current_user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Notes, categories and tags changed since a sync token, and the ids deleted since then"""
+    with _sync_token_errors():
+        changes = await async_crud.get_sync_changes(db, current_user_id, since, limit)
+    return FastJSONResponse(changes)
@@ -1,23 +1,31 @@
 from jose import jwt, JWTError
 from fastapi import HTTPException, Depends, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from typing import Optional
+from typing import Optional, Tuple
+import hashlib
 import os
+import time
 from dotenv import load_dotenv
+from .cache import LRUCache
 
 load_dotenv()
 
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-here")
 ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 
+# Verified tokens, keyed by SHA-256 of the token (size 0 disables). A page load
+# sends several API calls with the same token; a hit skips the HMAC check and
+# claim parsing. Entries never outlive the token's exp, nor JWT_CACHE_TTL.
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "4096"))
+JWT_CACHE_TTL = float(os.getenv("JWT_CACHE_TTL", "300"))
+
+_token_cache = LRUCache(maxsize=JWT_CACHE_SIZE, ttl=JWT_CACHE_TTL)
+
 security = HTTPBearer()
 
-def get_current_user_id(credentials: HTTPAuthorizationCredentials = Depends(security)) -> int:
-    """
-    Extract and validate user ID from JWT token
-    """
+def _decode_token(token: str) -> Tuple[int, Optional[float]]:
+    """Verify a token and return its user ID and expiry timestamp"""
     try:
-        token = credentials.credentials
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: int = payload.get("sub")
         
@@ -28,7 +36,8 @@ def get_current_user_id(credentials: HTTPAuthorizationCredentials = Depends(secu
                 headers={"WWW-Authenticate": "Bearer"},
             )
         
-        return int(user_id)
+        exp = payload.get("exp")
+        return int(user_id), float(exp) if exp is not None else None
     
     except JWTError:
         raise HTTPException(
@@ -43,6 +52,35 @@ def get_current_user_id(credentials: HTTPAuthorizationCredentials = Depends(secu
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+async def get_current_user_id(credentials: HTTPAuthorizationCredentials = Depends(security)) -> int:
+    """
+    Extract and validate user ID from JWT token
+
+    Declared async so it runs on the event loop rather than taking a
+    threadpool worker for a few microseconds of CPU work.
+    """
+    token = credentials.credentials
+    if not _token_cache.enabled:
+        return _decode_token(token)[0]
+
+    key = hashlib.sha256(token.encode()).digest()
+    cached = _token_cache.get(key)
+    if cached is not None:
+        user_id, exp = cached
+        if exp is None or exp > time.time():
+            return user_id
+        _token_cache.delete(key)
+
+    # Misses, and expired entries, go through full verification so the
+    # client gets the same error jwt.decode would give
+    user_id, exp = _decode_token(token)
+    ttl = JWT_CACHE_TTL
+    if exp is not None:
+        ttl = min(ttl, exp - time.time())
+    if ttl > 0:
+        _token_cache.set(key, (user_id, exp), ttl=ttl)
+    return user_id
+
 def verify_token(token: str) -> Optional[dict]:
     """
     Verify JWT token and return payload
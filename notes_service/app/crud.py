@@ -1,9 +1,165 @@
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_, or_, desc, asc
-from typing import List, Optional
-from . import models, schemas
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import and_, or_, desc, asc, func, insert, select
+from typing import List, Optional, Tuple
+from datetime import datetime, timedelta, timezone
+import base64
+import json
+import logging
+import os
+import time
+from . import models, schemas, search
+from .cache import LRUCache, create_backend
 from .models import Note, Category, Tag, NoteTag
 
+NOTE_COUNT_CACHE_SIZE = int(os.getenv("NOTE_COUNT_CACHE_SIZE", "10000"))
+NOTE_COUNT_CACHE_TTL = float(os.getenv("NOTE_COUNT_CACHE_TTL", "30"))
+DASHBOARD_COUNTERS = os.getenv("DASHBOARD_COUNTERS", "false").lower() == "true"
+# How long deletions are remembered for incremental sync; older sync tokens need a full sync
+TOMBSTONE_RETENTION_DAYS = float(os.getenv("TOMBSTONE_RETENTION_DAYS", "30"))
+# Per-user category and tag lists (size 0 disables the in-process layer)
+LIST_CACHE_SIZE = int(os.getenv("LIST_CACHE_SIZE", "10000"))
+LIST_CACHE_TTL = float(os.getenv("LIST_CACHE_TTL", "300"))
+# Optional shared backend (memory:// or redis://...) so that replicas reuse
+# each other's loads
+LIST_CACHE_URL = os.getenv("LIST_CACHE_URL")
+
+logger = logging.getLogger(__name__)
+
+# Note totals and category/tag lists are keyed by the user's collection
+# version, which every write bumps in the database: after a write, every
+# replica looks up a new key instead of relying on its own invalidation.
+# The routes already read the version for the ETag and pass it in.
+_note_count_cache = LRUCache(maxsize=NOTE_COUNT_CACHE_SIZE, ttl=NOTE_COUNT_CACHE_TTL)
+
+_list_backend = create_backend(LIST_CACHE_URL)
+_list_cache = LRUCache(maxsize=LIST_CACHE_SIZE, ttl=LIST_CACHE_TTL)
+
+# Eager-load categories and tags with batched IN queries so each note row (and
+# its content column) is fetched once rather than once per tag
+NOTE_RELATIONSHIPS = (
+    selectinload(models.Note.category),
+    selectinload(models.Note.tags).selectinload(models.NoteTag.tag),
+)
+
+# Category and tag list cache
+def list_key(kind: str, user_id: int, version: int) -> str:
+    return f"notes:{kind}:{user_id}:{version}"
+
+def cached_list(key: str) -> Optional[List[dict]]:
+    """A cached list from the local layer, else from the shared backend (which may block on I/O)"""
+    items = _list_cache.get(key)
+    if items is not None or _list_backend is None:
+        return items
+
+    # A cache outage must not fail reads, so backend errors count as misses
+    try:
+        items = _list_backend.get(key)
+    except Exception:
+        logger.warning("List cache backend unavailable", exc_info=True)
+        return None
+    if items is not None:
+        _list_cache.set(key, items)
+    return items
+
+def store_list(key: str, items: List[dict]) -> None:
+    """Store a freshly loaded list in every cache layer"""
+    if _list_backend is not None:
+        try:
+            _list_backend.set(key, items, ttl=LIST_CACHE_TTL)
+        except Exception:
+            logger.warning("List cache backend unavailable", exc_info=True)
+    _list_cache.set(key, items)
+
+def _read_through(kind: str, user_id: int, version: int, load) -> List[dict]:
+    """A user's cached list at a collection version, loaded with load() and stored in every layer on a miss
+
+    The version must be read before load() runs, so what is cached under it is
+    never older than it.
+    """
+    key = list_key(kind, user_id, version)
+    items = cached_list(key)
+    if items is None:
+        items = load()
+        store_list(key, items)
+    return items
+
+def _upsert(db: Session):
+    """The dialect's INSERT ... ON CONFLICT construct, or None where there isn't one"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as upsert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as upsert
+    else:
+        return None
+    return upsert
+
+def _adjust_user_stats(db: Session, user_id: int, **deltas: int) -> None:
+    """Apply counter deltas in the caller's transaction, creating the user's row if needed
+
+    Applied whether or not DASHBOARD_COUNTERS is on, so the rows are current
+    whenever it is turned on. Migration 0004 seeded exact rows for existing
+    users; a user without one has no data yet, so the deltas are the counts.
+    """
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    table = models.UserNoteStats.__table__
+    increments = {field: table.c[field] + delta for field, delta in deltas.items()}
+    upsert = _upsert(db)
+    if upsert is not None:
+        db.execute(upsert(table).values(user_id=user_id, **deltas).on_conflict_do_update(
+            index_elements=[table.c.user_id], set_=increments
+        ))
+        return
+
+    updated = db.execute(
+        table.update().where(table.c.user_id == user_id).values(increments)
+    ).rowcount
+    if not updated:
+        db.execute(table.insert().values(user_id=user_id, **deltas))
+
+def _bump_collection_version(db: Session, user_id: int) -> None:
+    """Advance the user's collection version in the caller's transaction"""
+    table = models.UserCollectionVersion.__table__
+    upsert = _upsert(db)
+    if upsert is not None:
+        # New rows start at the current time in microseconds, so versions (and
+        # the ETags built from them) aren't reused after a database is recreated
+        statement = upsert(table).values(user_id=user_id, version=int(time.time() * 1_000_000))
+        db.execute(statement.on_conflict_do_update(
+            index_elements=[table.c.user_id], set_={"version": table.c.version + 1}
+        ))
+        return
+
+    updated = db.execute(
+        table.update().where(table.c.user_id == user_id).values(version=table.c.version + 1)
+    ).rowcount
+    if not updated:
+        db.execute(table.insert().values(user_id=user_id, version=int(time.time() * 1_000_000)))
+
+def get_collection_version(db: Session, user_id: int) -> int:
+    """Current version of the user's notes, categories and tags (0 before the first write)"""
+    return db.query(models.UserCollectionVersion.version).filter(
+        models.UserCollectionVersion.user_id == user_id
+    ).scalar() or 0
+
+def _record_deletions(db: Session, user_id: int, kind: str, object_ids) -> None:
+    """Write tombstones for deleted rows in the caller's transaction, pruning expired ones"""
+    db.execute(insert(models.Tombstone), [
+        {"user_id": user_id, "kind": kind, "object_id": object_id} for object_id in object_ids
+    ])
+    cutoff = datetime.now(timezone.utc) - timedelta(days=TOMBSTONE_RETENTION_DAYS)
+    db.query(models.Tombstone).filter(
+        and_(models.Tombstone.user_id == user_id, models.Tombstone.deleted_at < cutoff)
+    ).delete(synchronize_session=False)
+
+def _touch_notes(db: Session, *criteria) -> None:
+    """Bump updated_at of notes whose representation changed without a column of their own changing"""
+    db.query(models.Note).filter(*criteria).update(
+        {models.Note.updated_at: func.now()}, synchronize_session=False
+    )
+
 # Category CRUD operations
 def create_category(db: Session, category: schemas.CategoryCreate, user_id: int) -> models.Category:
     """Create a new category for a user"""
@@ -12,13 +168,27 @@ def create_category(db: Session, category: schemas.CategoryCreate, user_id: int)
         user_id=user_id
     )
     db.add(db_category)
+    _adjust_user_stats(db, user_id, categories_count=1)
+    _bump_collection_version(db, user_id)
     db.commit()
     db.refresh(db_category)
     return db_category
 
-def get_categories(db: Session, user_id: int) -> List[models.Category]:
-    """Get all categories for a user"""
-    return db.query(models.Category).filter(models.Category.user_id == user_id).all()
+def get_categories(db: Session, user_id: int, version: Optional[int] = None) -> List[dict]:
+    """Get all categories for a user, as schemas.Category dicts from the list cache
+
+    version is the user's collection version if the caller already read it.
+    """
+    if version is None:
+        version = get_collection_version(db, user_id)
+    return _read_through("categories", user_id, version, lambda: load_categories(db, user_id))
+
+def load_categories(db: Session, user_id: int) -> List[dict]:
+    """Query a user's categories as schemas.Category dicts, bypassing the list cache"""
+    return [
+        schemas.Category.model_validate(category).model_dump(mode="json")
+        for category in db.query(models.Category).filter(models.Category.user_id == user_id)
+    ]
 
 def get_category(db: Session, category_id: int, user_id: int) -> Optional[models.Category]:
     """Get a specific category by ID for a user"""
@@ -36,6 +206,10 @@ def update_category(db: Session, category_id: int, user_id: int, category_update
     for field, value in update_data.items():
         setattr(db_category, field, value)
     
+    if update_data:
+        # Notes embed their category
+        _touch_notes(db, models.Note.category_id == category_id, models.Note.user_id == user_id)
+        _bump_collection_version(db, user_id)
     db.commit()
     db.refresh(db_category)
     return db_category
@@ -52,6 +226,9 @@ def delete_category(db: Session, category_id: int, user_id: int) -> bool:
     ).update({models.Note.category_id: None})
     
     db.delete(db_category)
+    _record_deletions(db, user_id, "category", [category_id])
+    _adjust_user_stats(db, user_id, categories_count=-1)
+    _bump_collection_version(db, user_id)
     db.commit()
     return True
 
@@ -71,13 +248,27 @@ def create_tag(db: Session, tag: schemas.TagCreate, user_id: int) -> models.Tag:
         user_id=user_id
     )
     db.add(db_tag)
+    _adjust_user_stats(db, user_id, tags_count=1)
+    _bump_collection_version(db, user_id)
     db.commit()
     db.refresh(db_tag)
     return db_tag
 
-def get_tags(db: Session, user_id: int) -> List[models.Tag]:
-    """Get all tags for a user"""
-    return db.query(models.Tag).filter(models.Tag.user_id == user_id).all()
+def get_tags(db: Session, user_id: int, version: Optional[int] = None) -> List[dict]:
+    """Get all tags for a user, as schemas.Tag dicts from the list cache
+
+    version is the user's collection version if the caller already read it.
+    """
+    if version is None:
+        version = get_collection_version(db, user_id)
+    return _read_through("tags", user_id, version, lambda: load_tags(db, user_id))
+
+def load_tags(db: Session, user_id: int) -> List[dict]:
+    """Query a user's tags as schemas.Tag dicts, bypassing the list cache"""
+    return [
+        schemas.Tag.model_validate(tag).model_dump(mode="json")
+        for tag in db.query(models.Tag).filter(models.Tag.user_id == user_id)
+    ]
 
 def get_tag(db: Session, tag_id: int, user_id: int) -> Optional[models.Tag]:
     """Get a specific tag by ID for a user"""
@@ -92,17 +283,103 @@ def delete_tag(db: Session, tag_id: int, user_id: int) -> bool:
         return False
     
     # Delete note-tag associations
+    _touch_notes(db, models.Note.id.in_(select(models.NoteTag.note_id).where(models.NoteTag.tag_id == tag_id)))
     db.query(models.NoteTag).filter(models.NoteTag.tag_id == tag_id).delete()
     
     db.delete(db_tag)
+    _record_deletions(db, user_id, "tag", [tag_id])
+    _adjust_user_stats(db, user_id, tags_count=-1)
+    _bump_collection_version(db, user_id)
     db.commit()
     return True
 
+# Note tag links
+def _owned_tags(db: Session, user_id: int, tag_ids) -> List[models.Tag]:
+    """The user's tags among tag_ids, checked in one query"""
+    tag_ids = set(tag_ids or ())
+    if not tag_ids:
+        return []
+    return db.query(models.Tag).filter(
+        and_(models.Tag.user_id == user_id, models.Tag.id.in_(tag_ids))
+    ).all()
+
+def _owned_tag_ids(db: Session, user_id: int, tag_ids) -> set:
+    """The subset of tag_ids that belong to the user, checked in one query"""
+    tag_ids = set(tag_ids or ())
+    if not tag_ids:
+        return set()
+    return {
+        tag_id for (tag_id,) in db.query(models.Tag.id).filter(
+            and_(models.Tag.user_id == user_id, models.Tag.id.in_(tag_ids))
+        )
+    }
+
+def _sync_note_tags(db: Session, db_note: models.Note, user_id: int, tag_ids) -> bool:
+    """Make a loaded note's tags equal the user's tags among tag_ids, touching only the difference
+
+    Returns whether anything changed.
+    """
+    wanted = {tag.id: tag for tag in _owned_tags(db, user_id, tag_ids)}
+    removed = [link for link in db_note.tags if link.tag_id not in wanted]
+    for link in removed:
+        db_note.tags.remove(link)
+        db.delete(link)
+    current = {link.tag_id for link in db_note.tags}
+    added = [models.NoteTag(tag=tag) for tag_id, tag in wanted.items() if tag_id not in current]
+    db_note.tags.extend(added)
+    return bool(removed or added)
+
+def _resolve_category(db: Session, category_id: Optional[int], user_id: int) -> Optional[models.Category]:
+    """The user's category for category_id (None clears it); raises ValueError if it isn't theirs"""
+    if category_id is None:
+        return None
+    category = get_category(db, category_id, user_id)
+    if not category:
+        raise ValueError("Category not found")
+    return category
+
+# Keyset pagination cursors
+def encode_cursor(note: models.Note) -> str:
+    """Encode the (updated_at, id) position of a note as an opaque cursor"""
+    updated_at = note.updated_at.isoformat() if note.updated_at is not None else None
+    payload = json.dumps([updated_at, note.id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], int]:
+    """Decode a cursor produced by encode_cursor; raises ValueError if malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        updated_at, note_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return (datetime.fromisoformat(updated_at) if updated_at is not None else None), int(note_id)
+    except (TypeError, ValueError, UnicodeDecodeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+def _after_cursor(db: Session, updated_at: Optional[datetime], note_id: int):
+    """Notes that come after a cursor position in (updated_at DESC, id) order
+
+    updated_at is NOT NULL since migration 0003, but a cursor may still carry
+    NULL; descending order puts NULLs first on PostgreSQL and last elsewhere.
+    """
+    nulls_first = search.is_postgres(db)
+    if updated_at is None:
+        after_null = and_(models.Note.updated_at.is_(None), models.Note.id > note_id)
+        return or_(after_null, models.Note.updated_at.isnot(None)) if nulls_first else after_null
+    after = or_(
+        models.Note.updated_at < updated_at,
+        and_(models.Note.updated_at == updated_at, models.Note.id > note_id)
+    )
+    return after if nulls_first else or_(after, models.Note.updated_at.is_(None))
+
 # Note CRUD operations
 def create_note(db: Session, note: schemas.NoteCreate, user_id: int) -> models.Note:
-    """Create a new note for a user"""
-    # Create the note
-    note_data = note.dict(exclude={"tag_ids"})
+    """Create a new note for a user; raises ValueError if the category isn't theirs
+
+    One transaction: the category and tags are loaded once (validating them and
+    providing the response data), the note is inserted with RETURNING for its
+    generated columns, and its tag links go in a single batched INSERT.
+    """
+    category = _resolve_category(db, note.category_id or None, user_id)
+    note_data = note.dict(exclude={"tag_ids", "category_id"})
     
     # Convert enum values to strings
     if "status" in note_data and hasattr(note_data["status"], "value"):
@@ -112,39 +389,77 @@ def create_note(db: Session, note: schemas.NoteCreate, user_id: int) -> models.N
     
     db_note = models.Note(
         **note_data,
-        user_id=user_id
+        user_id=user_id,
+        category=category,
+        tags=[models.NoteTag(tag=tag) for tag in _owned_tags(db, user_id, note.tag_ids)]
     )
     db.add(db_note)
+    db.flush()
+    
+    search.index_new_notes(db, [db_note])
+    _adjust_user_stats(db, user_id, total_notes=1, favorite_notes=int(bool(db_note.is_favorite)))
+    _bump_collection_version(db, user_id)
     db.commit()
-    db.refresh(db_note)
-    
-    # Add tags if provided
-    if note.tag_ids:
-        for tag_id in note.tag_ids:
-            # Verify tag belongs to user
-            tag = get_tag(db, tag_id, user_id)
-            if tag:
-                note_tag = models.NoteTag(note_id=db_note.id, tag_id=tag_id)
-                db.add(note_tag)
-        db.commit()
-        db.refresh(db_note)
-    
-    return get_note(db, db_note.id, user_id)
-
-def get_notes(db: Session, user_id: int, filters: schemas.NoteFilter) -> tuple[List[models.Note], int]:
-    """Get notes for a user with filtering and pagination"""
+    
+    return db_note
+
+def _estimate_count(db: Session, query) -> int:
+    """Row estimate from the Postgres planner instead of an exact COUNT"""
+    statement = query.statement.compile(
+        dialect=db.get_bind().dialect, compile_kwargs={"literal_binds": True}
+    )
+    plan = db.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}").scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+def _count_notes(
+    db: Session, query, user_id: int, filters: schemas.NoteFilter, version: Optional[int]
+) -> Tuple[Optional[int], bool]:
+    """Total matches for a note listing, served from the per-user cache when possible
+
+    Also returns whether the total is a planner estimate rather than an exact count.
+    """
+    if not filters.include_total:
+        return None, False
+    
+    if version is None:
+        version = get_collection_version(db, user_id)
+    key = (
+        user_id,
+        version,
+        filters.search,
+        filters.is_favorite,
+        filters.category_id,
+        tuple(sorted(set(filters.tag_ids or ()))),
+    )
+    total = _note_count_cache.get(key)
+    if total is not None:
+        return total, False
+    
+    if filters.approximate_total and search.is_postgres(db):
+        return _estimate_count(db, query), True
+    
+    total = query.count()
+    _note_count_cache.set(key, total)
+    return total, False
+
+def get_notes(
+    db: Session, user_id: int, filters: schemas.NoteFilter, version: Optional[int] = None,
+    ranked_ids: Optional[List[int]] = None
+) -> tuple[List[models.Note], Optional[int], bool, Optional[str]]:
+    """Get notes for a user with filtering and offset or keyset pagination
+
+    Returns the page, the total match count (None unless requested), whether
+    that total is a planner estimate, and a cursor for the next page (None on
+    the last page and for ranked search results).
+    version is the user's collection version if the caller already read it,
+    ranked_ids the fallback search ranking if it already computed that.
+    """
     query = db.query(models.Note).filter(models.Note.user_id == user_id)
+    rank_order = []
     
     # Apply filters
-    if filters.search:
-        search_pattern = f"%{filters.search}%"
-        query = query.filter(
-            or_(
-                models.Note.title.ilike(search_pattern),
-                models.Note.content.ilike(search_pattern)
-            )
-        )
-
     if filters.is_favorite is not None:
         query = query.filter(models.Note.is_favorite == filters.is_favorite)
     
@@ -152,149 +467,277 @@ def get_notes(db: Session, user_id: int, filters: schemas.NoteFilter) -> tuple[L
         query = query.filter(models.Note.category_id == filters.category_id)
     
     if filters.tag_ids:
-        # Notes that have any of the specified tags
-        query = query.join(models.NoteTag).filter(models.NoteTag.tag_id.in_(filters.tag_ids))
+        # Notes that have any of the specified tags (EXISTS, so a note matching
+        # several tags is neither repeated nor counted twice)
+        query = query.filter(models.Note.tags.any(models.NoteTag.tag_id.in_(filters.tag_ids)))
     
-    # Get total count before pagination
-    total = query.count()
+    clauses = search.parse_query(filters.search) if filters.search else []
+    if clauses and not search.is_postgres(db):
+        return _get_ranked_notes(db, query, user_id, clauses, filters, ranked_ids)
+    if clauses:
+        query, rank_order = search.apply_search(query, clauses)
+    
+    total, total_is_approximate = _count_notes(db, query, user_id, filters, version)
     
-    # Apply pagination and ordering
-    notes = query.options(
-        joinedload(models.Note.category),
-        joinedload(models.Note.tags).joinedload(models.NoteTag.tag)
-    ).order_by(desc(models.Note.updated_at)).offset(filters.offset).limit(filters.limit).all()
+    page = query.options(*NOTE_RELATIONSHIPS).order_by(
+        *rank_order, desc(models.Note.updated_at), asc(models.Note.id)
+    )
     
-    return notes, total
+    if filters.cursor:
+        # Seek past the last row of the previous page instead of counting through an offset
+        page = page.filter(_after_cursor(db, *decode_cursor(filters.cursor)))
+    else:
+        page = page.offset(filters.offset)
+    
+    # Fetch one extra row to find out whether there is a next page
+    notes = page.limit(filters.limit + 1).all()
+    next_cursor = None
+    if len(notes) > filters.limit:
+        notes = notes[:filters.limit]
+        if not rank_order:
+            next_cursor = encode_cursor(notes[-1])
+    
+    return notes, total, total_is_approximate, next_cursor
+
+def _get_ranked_notes(
+    db: Session, query, user_id: int, clauses: List[search.Clause], filters: schemas.NoteFilter,
+    ranked_ids: Optional[List[int]]
+) -> tuple[List[models.Note], Optional[int], bool, None]:
+    """A page of fallback search results, cut from the full ranking so totals and late pages are exact"""
+    if ranked_ids is None:
+        ranked_ids = search.rank_fallback(db, user_id, clauses)
+    matches = search.filter_ranked(query, ranked_ids) if ranked_ids else []
+    page_ids = matches[filters.offset:filters.offset + filters.limit]
+    
+    notes = {}
+    if page_ids:
+        notes = {
+            note.id: note
+            for note in query.options(*NOTE_RELATIONSHIPS).filter(models.Note.id.in_(page_ids))
+        }
+    total = len(matches) if filters.include_total else None
+    return [notes[note_id] for note_id in page_ids if note_id in notes], total, False, None
 
 def get_note(db: Session, note_id: int, user_id: int) -> Optional[models.Note]:
     """Get a specific note by ID for a user"""
-    note = db.query(models.Note).options(
-        joinedload(models.Note.category),
-        joinedload(models.Note.tags).joinedload(models.NoteTag.tag)
-    ).filter(
+    note = db.query(models.Note).options(*NOTE_RELATIONSHIPS).filter(
         and_(models.Note.id == note_id, models.Note.user_id == user_id)
     ).first()
     
     return note
 
-def update_note(db: Session, note_id: int, user_id: int, note_update: schemas.NoteUpdate) -> Optional[models.Note]:
-    """Update a note"""
-    db_note = db.query(models.Note).filter(
+def get_note_version(db: Session, note_id: int, user_id: int) -> Optional[int]:
+    """Row version of a note (None if the user has no such note), without loading it"""
+    return db.query(models.Note.version).filter(
         and_(models.Note.id == note_id, models.Note.user_id == user_id)
-    ).first()
+    ).scalar()
+
+def update_note(db: Session, note_id: int, user_id: int, note_update: schemas.NoteUpdate) -> Optional[models.Note]:
+    """Update a note; raises ValueError if the new category isn't the user's
+
+    The note is loaded with its relationships up front and modified in place,
+    so the returned object needs no reload after the commit.
+    """
+    db_note = get_note(db, note_id, user_id)
     
     if not db_note:
         return None
     
     # Update note fields
     update_data = note_update.dict(exclude_unset=True, exclude={"tag_ids"})
+    if "category_id" in update_data:
+        category_id = update_data.pop("category_id")
+        if category_id != db_note.category_id:
+            db_note.category = _resolve_category(db, category_id, user_id)
     
     # Convert enum values to strings
     for field, value in update_data.items():
         if hasattr(value, "value"):
             update_data[field] = value.value
     
+    was_favorite = bool(db_note.is_favorite)
     for field, value in update_data.items():
         setattr(db_note, field, value)
+    _adjust_user_stats(db, user_id, favorite_notes=int(bool(db_note.is_favorite)) - was_favorite)
     
-    # Update tags if provided
-    if note_update.tag_ids is not None:
-        # Remove existing tags
-        db.query(models.NoteTag).filter(models.NoteTag.note_id == note_id).delete()
-        
-        # Add new tags
-        for tag_id in note_update.tag_ids:
-            # Verify tag belongs to user
-            tag = get_tag(db, tag_id, user_id)
-            if tag:
-                note_tag = models.NoteTag(note_id=note_id, tag_id=tag_id)
-                db.add(note_tag)
+    if "title" in update_data or "content" in update_data:
+        search.index_note(db, db_note)
     
+    # Update tags if provided; the note's own row changes too so its ETag does
+    if note_update.tag_ids is not None and _sync_note_tags(db, db_note, user_id, note_update.tag_ids):
+        db_note.updated_at = func.now()
+    
+    _bump_collection_version(db, user_id)
     db.commit()
-    db.refresh(db_note)
-    return get_note(db, note_id, user_id)
+    return db_note
 
 def delete_note(db: Session, note_id: int, user_id: int) -> bool:
     """Permanently delete a note and its associations"""
-    db_note = db.query(models.Note).filter(
+    # Only the ownership check and the favorite flag are needed, not the note's content
+    is_favorite = db.query(models.Note.is_favorite).filter(
         and_(models.Note.id == note_id, models.Note.user_id == user_id)
-    ).first()
+    ).scalar()
     
-    if not db_note:
+    if is_favorite is None:
         return False
     
     # Delete note-tag associations first
-    db.query(models.NoteTag).filter(models.NoteTag.note_id == note_id).delete()
+    db.query(models.NoteTag).filter(models.NoteTag.note_id == note_id).delete(synchronize_session=False)
+    search.remove_note(db, note_id)
     
     # Delete the note permanently
-    db.delete(db_note)
+    db.query(models.Note).filter(models.Note.id == note_id).delete(synchronize_session=False)
+    _record_deletions(db, user_id, "note", [note_id])
+    _adjust_user_stats(db, user_id, total_notes=-1, favorite_notes=-int(bool(is_favorite)))
+    _bump_collection_version(db, user_id)
     db.commit()
     return True
 
 def permanently_delete_note(db: Session, note_id: int, user_id: int) -> bool:
     """Permanently delete a note and its associations"""
-    db_note = db.query(models.Note).filter(
-        and_(models.Note.id == note_id, models.Note.user_id == user_id)
-    ).first()
-    
-    if not db_note:
-        return False
-    
-    # Delete note-tag associations
-    db.query(models.NoteTag).filter(models.NoteTag.note_id == note_id).delete()
-    
-    db.delete(db_note)
-    db.commit()
-    return True
+    return delete_note(db, note_id, user_id)
 
 def toggle_favorite(db: Session, note_id: int, user_id: int) -> Optional[models.Note]:
     """Toggle favorite status of a note"""
-    db_note = db.query(models.Note).filter(
-        and_(models.Note.id == note_id, models.Note.user_id == user_id)
-    ).first()
+    db_note = get_note(db, note_id, user_id)
     
     if not db_note:
         return None
     
     db_note.is_favorite = not db_note.is_favorite
+    _adjust_user_stats(db, user_id, favorite_notes=1 if db_note.is_favorite else -1)
+    _bump_collection_version(db, user_id)
     db.commit()
-    db.refresh(db_note)
+    return db_note
+
+# Batch operations
+def batch_update_notes(db: Session, user_id: int, batch: schemas.NoteBatchRequest) -> Optional[List[dict]]:
+    """Apply one operation to many notes with set-based statements in a single transaction
+
+    Returns a result per requested id (notes the user doesn't own are
+    "not_found"), or None if the referenced category or tags don't belong to the user.
+    """
+    note_ids = list(dict.fromkeys(batch.note_ids))
+    rows = db.query(models.Note.id, models.Note.is_favorite).filter(
+        and_(models.Note.user_id == user_id, models.Note.id.in_(note_ids))
+    ).all()
+    owned = {row.id for row in rows}
+    favorites = sum(1 for row in rows if row.is_favorite)
+    results = [{"id": note_id, "status": "ok" if note_id in owned else "not_found"} for note_id in note_ids]
+    if not owned:
+        return results
+    
+    owned_notes = db.query(models.Note).filter(
+        and_(models.Note.user_id == user_id, models.Note.id.in_(owned))
+    )
+    
+    if batch.operation == "set_favorite":
+        owned_notes.update({models.Note.is_favorite: batch.is_favorite}, synchronize_session=False)
+        now_favorite = len(owned) if batch.is_favorite else 0
+        _adjust_user_stats(db, user_id, favorite_notes=now_favorite - favorites)
     
-    # Return the note with relationships loaded
-    return db.query(models.Note).options(
-        joinedload(models.Note.category),
-        joinedload(models.Note.tags).joinedload(models.NoteTag.tag)
-    ).filter(models.Note.id == note_id).first()
+    elif batch.operation == "set_category":
+        if batch.category_id is not None and not get_category(db, batch.category_id, user_id):
+            return None
+        owned_notes.update({models.Note.category_id: batch.category_id}, synchronize_session=False)
+    
+    elif batch.operation in ("add_tags", "remove_tags"):
+        tag_ids = set(batch.tag_ids)
+        if _owned_tag_ids(db, user_id, tag_ids) != tag_ids:
+            return None
+        
+        links = db.query(models.NoteTag).filter(
+            and_(models.NoteTag.note_id.in_(owned), models.NoteTag.tag_id.in_(tag_ids))
+        )
+        _touch_notes(db, models.Note.id.in_(owned))
+        if batch.operation == "remove_tags":
+            links.delete(synchronize_session=False)
+        else:
+            existing = set(links.with_entities(models.NoteTag.note_id, models.NoteTag.tag_id))
+            new_links = [
+                {"note_id": note_id, "tag_id": tag_id}
+                for note_id in owned for tag_id in tag_ids
+                if (note_id, tag_id) not in existing
+            ]
+            if new_links:
+                db.execute(insert(models.NoteTag), new_links)
+    
+    elif batch.operation == "delete":
+        db.query(models.NoteTag).filter(
+            models.NoteTag.note_id.in_(owned)
+        ).delete(synchronize_session=False)
+        search.remove_notes(db, list(owned))
+        owned_notes.delete(synchronize_session=False)
+        _record_deletions(db, user_id, "note", owned)
+        _adjust_user_stats(db, user_id, total_notes=-len(owned), favorite_notes=-favorites)
+    
+    _bump_collection_version(db, user_id)
+    db.commit()
+    return results
 
 # Dashboard stats
+def _aggregate_dashboard_counts(db: Session, user_id: int) -> dict:
+    """Compute all dashboard counters in a single statement"""
+    categories_count = select(func.count()).select_from(models.Category).where(
+        models.Category.user_id == user_id
+    ).scalar_subquery()
+    tags_count = select(func.count()).select_from(models.Tag).where(
+        models.Tag.user_id == user_id
+    ).scalar_subquery()
+    
+    row = db.execute(
+        select(
+            func.count().label("total_notes"),
+            func.count().filter(models.Note.is_favorite == True).label("favorite_notes"),
+            categories_count.label("categories_count"),
+            tags_count.label("tags_count"),
+        ).select_from(models.Note).where(models.Note.user_id == user_id)
+    ).one()
+    return dict(row._mapping)
+
+def refresh_user_stats(db: Session, user_id: int) -> dict:
+    """Recompute a user's materialized counters from the source tables, for repairs and bulk loads
+
+    The row is locked (created if need be) before counting, so a concurrent
+    write either committed before the count or applies its delta after it.
+    """
+    table = models.UserNoteStats.__table__
+    upsert = _upsert(db)
+    if upsert is not None:
+        db.execute(upsert(table).values(user_id=user_id).on_conflict_do_nothing(index_elements=[table.c.user_id]))
+    elif db.get(models.UserNoteStats, user_id) is None:
+        db.execute(table.insert().values(user_id=user_id))
+    db.execute(select(table.c.user_id).where(table.c.user_id == user_id).with_for_update())
+    counts = _aggregate_dashboard_counts(db, user_id)
+    db.execute(table.update().where(table.c.user_id == user_id).values(counts))
+    db.commit()
+    return counts
+
+def _get_dashboard_counts(db: Session, user_id: int) -> dict:
+    if not DASHBOARD_COUNTERS:
+        return _aggregate_dashboard_counts(db, user_id)
+    
+    db_stats = db.get(models.UserNoteStats, user_id)
+    if db_stats is None:
+        # Only users without any data have no row; counting for them is cheap
+        return _aggregate_dashboard_counts(db, user_id)
+    return {
+        "total_notes": db_stats.total_notes,
+        "favorite_notes": db_stats.favorite_notes,
+        "categories_count": db_stats.categories_count,
+        "tags_count": db_stats.tags_count,
+    }
+
 def get_dashboard_stats(db: Session, user_id: int) -> dict:
     """Get dashboard statistics for a user"""
-    # Count all notes for the user
-    total_notes = db.query(models.Note).filter(models.Note.user_id == user_id).count()
-    
-    # Count favorite notes
-    favorite_notes = db.query(models.Note).filter(
-        and_(
-            models.Note.user_id == user_id, 
-            models.Note.is_favorite == True
-        )
-    ).count()
-    
-    categories_count = db.query(models.Category).filter(models.Category.user_id == user_id).count()
-    tags_count = db.query(models.Tag).filter(models.Tag.user_id == user_id).count()
+    counts = _get_dashboard_counts(db, user_id)
     
     # Get recent notes (last 5)
-    recent_notes = db.query(models.Note).options(
-        joinedload(models.Note.category),
-        joinedload(models.Note.tags).joinedload(models.NoteTag.tag)
-    ).filter(models.Note.user_id == user_id).order_by(desc(models.Note.updated_at)).limit(5).all()
+    recent_notes = db.query(models.Note).options(*NOTE_RELATIONSHIPS).filter(
+        models.Note.user_id == user_id
+    ).order_by(desc(models.Note.updated_at), asc(models.Note.id)).limit(5).all()
     
     return {
-        "total_notes": total_notes,
-        "favorite_notes": favorite_notes,
-        "categories_count": categories_count,
-        "tags_count": tags_count,
+        **counts,
         "recent_notes": recent_notes
     }
-
-
@@ -1,13 +1,53 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
 from dotenv import load_dotenv
+from .metrics import instrument_engine
+from .pool import engine_options
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+# "sync" serves requests from the threadpool with blocking sessions,
+# "async" serves them on the event loop with AsyncSession
+DB_MODE = os.getenv("DB_MODE", "sync").lower()
+
+_ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def get_async_database_url(url: str) -> str:
+    """Swap the driver of a sync database URL for its asyncio counterpart"""
+    parsed = make_url(url)
+    driver = _ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        raise ValueError(f"No async driver configured for {parsed.get_backend_name()!r}")
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+instrument_engine(engine)
+# Write paths build their responses from the objects they just wrote, so those
+# must not expire (and be re-selected) on commit; sessions are request-scoped
+SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
+
+async_engine = None
+AsyncSessionLocal = None
+
+if DB_MODE == "async":
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or get_async_database_url(DATABASE_URL)
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL, is_async=True))
+    instrument_engine(async_engine.sync_engine)
+    # Objects are serialized after the session's greenlet context has ended,
+    # so they must not expire and lazy-load on commit
+    AsyncSessionLocal = async_sessionmaker(
+        bind=async_engine, autoflush=False, expire_on_commit=False
+    )
+elif DB_MODE != "sync":
+    raise ValueError(f"Invalid DB_MODE: {DB_MODE!r} (expected 'sync' or 'async')")
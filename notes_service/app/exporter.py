@@ -0,0 +1,200 @@
+"""
+Streaming full-account export.
+
+Notes are read with a server-side cursor in partitions of EXPORT_BATCH_SIZE
+(plain column rows, so nothing accumulates in the session's identity map),
+tag names are fetched with one IN query per partition and category names once
+per export. Each note is written straight to the response as either an NDJSON
+line (the same shape the bulk import accepts) or a Markdown file in a zip
+archive built on the fly, so memory stays flat regardless of account size.
+"""
+import io
+import json
+import os
+import re
+import zipfile
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterator, List
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import AsyncSessionLocal, SessionLocal
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+# Response chunks are coalesced up to about this many bytes
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+_SLUG_RE = re.compile(r"[^A-Za-z0-9_-]+")
+
+# Queries
+def _notes_statement(user_id: int):
+    return select(
+        models.Note.id,
+        models.Note.title,
+        models.Note.content,
+        models.Note.is_favorite,
+        models.Note.category_id,
+        models.Note.created_at,
+        models.Note.updated_at,
+    ).where(models.Note.user_id == user_id).order_by(models.Note.id).execution_options(
+        yield_per=EXPORT_BATCH_SIZE
+    )
+
+def _categories_statement(user_id: int):
+    return select(models.Category.id, models.Category.name).where(models.Category.user_id == user_id)
+
+def _tags_statement(note_ids: List[int]):
+    return select(models.NoteTag.note_id, models.Tag.name).join(
+        models.Tag, models.Tag.id == models.NoteTag.tag_id
+    ).where(models.NoteTag.note_id.in_(note_ids)).order_by(models.NoteTag.id)
+
+def _records(partition, categories: Dict[int, str], tag_rows) -> List[dict]:
+    tags: Dict[int, List[str]] = {}
+    for note_id, name in tag_rows:
+        tags.setdefault(note_id, []).append(name)
+    return [
+        {
+            "id": row.id,
+            "title": row.title,
+            "content": row.content,
+            "is_favorite": bool(row.is_favorite),
+            "category": categories.get(row.category_id),
+            "tags": tags.get(row.id, []),
+            "created_at": row.created_at,
+            "updated_at": row.updated_at,
+        }
+        for row in partition
+    ]
+
+def iter_records(db: Session, user_id: int) -> Iterator[dict]:
+    """All of a user's notes as export records, read in partitions"""
+    categories = dict(db.execute(_categories_statement(user_id)).all())
+    for partition in db.execute(_notes_statement(user_id)).partitions():
+        tag_rows = db.execute(_tags_statement([row.id for row in partition])).all()
+        yield from _records(partition, categories, tag_rows)
+
+async def aiter_records(db, user_id: int) -> AsyncIterator[dict]:
+    """Async counterpart of iter_records for an AsyncSession"""
+    categories = dict((await db.execute(_categories_statement(user_id))).all())
+    result = await db.stream(_notes_statement(user_id))
+    async for partition in result.partitions():
+        tag_rows = (await db.execute(_tags_statement([row.id for row in partition]))).all()
+        for record in _records(partition, categories, tag_rows):
+            yield record
+
+# Formats
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+class NDJSONWriter:
+    media_type = "application/x-ndjson"
+    extension = "ndjson"
+
+    def feed(self, record: dict) -> bytes:
+        return json.dumps(record, default=_json_default, ensure_ascii=False).encode() + b"\n"
+
+    def close(self) -> bytes:
+        return b""
+
+class _Sink(io.RawIOBase):
+    """Write-only, unseekable buffer; zipfile then streams entries with data descriptors"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+class MarkdownZipWriter:
+    media_type = "application/zip"
+    extension = "zip"
+
+    def __init__(self):
+        self._sink = _Sink()
+        self._zip = zipfile.ZipFile(self._sink, mode="w", compression=zipfile.ZIP_DEFLATED)
+
+    def feed(self, record: dict) -> bytes:
+        slug = _SLUG_RE.sub("-", record["title"]).strip("-")[:60] or "note"
+        info = zipfile.ZipInfo(f"notes/{record['id']}-{slug}.md")
+        modified = record["updated_at"] or record["created_at"]
+        if modified and modified.year >= 1980:
+            info.date_time = modified.timetuple()[:6]
+        info.compress_type = zipfile.ZIP_DEFLATED
+
+        # JSON strings are valid YAML scalars, so titles and names need no extra escaping
+        front_matter = [
+            f"title: {json.dumps(record['title'], ensure_ascii=False)}",
+            f"favorite: {json.dumps(record['is_favorite'])}",
+            f"category: {json.dumps(record['category'], ensure_ascii=False)}",
+            f"tags: {json.dumps(record['tags'], ensure_ascii=False)}",
+            f"created_at: {json.dumps(record['created_at'], default=_json_default)}",
+            f"updated_at: {json.dumps(record['updated_at'], default=_json_default)}",
+        ]
+        document = "---\n" + "\n".join(front_matter) + "\n---\n\n" + (record["content"] or "") + "\n"
+        self._zip.writestr(info, document.encode())
+        return self._sink.take()
+
+    def close(self) -> bytes:
+        self._zip.close()
+        return self._sink.take()
+
+FORMATS = {"ndjson": NDJSONWriter, "markdown": MarkdownZipWriter}
+
+# Responses
+def _stream(user_id: int, writer) -> Iterator[bytes]:
+    db = SessionLocal()
+    try:
+        pending, size = [], 0
+        for record in iter_records(db, user_id):
+            chunk = writer.feed(record)
+            pending.append(chunk)
+            size += len(chunk)
+            if size >= EXPORT_CHUNK_BYTES:
+                yield b"".join(pending)
+                pending, size = [], 0
+        pending.append(writer.close())
+        yield b"".join(pending)
+    finally:
+        db.close()
+
+async def _astream(user_id: int, writer) -> AsyncIterator[bytes]:
+    async with AsyncSessionLocal() as db:
+        pending, size = [], 0
+        async for record in aiter_records(db, user_id):
+            chunk = writer.feed(record)
+            pending.append(chunk)
+            size += len(chunk)
+            if size >= EXPORT_CHUNK_BYTES:
+                yield b"".join(pending)
+                pending, size = [], 0
+        pending.append(writer.close())
+        yield b"".join(pending)
+
+def export_response(user_id: int, export_format: str, use_async: bool = False) -> StreamingResponse:
+    """Stream a user's notes in the given format
+
+    The export opens its own session: the response body is produced after the
+    route (and its request-scoped session) has returned.
+    """
+    writer = FORMATS[export_format]()
+    stream = _astream(user_id, writer) if use_async else _stream(user_id, writer)
+    filename = f"notes-export-{datetime.utcnow():%Y%m%d}.{writer.extension}"
+    return StreamingResponse(
+        stream,
+        media_type=writer.media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -0,0 +1,238 @@
+"""
+Bulk note import.
+
+An import is NDJSON (one ``schemas.NoteImportItem`` per line), sent either as
+the raw request body or as the ``file`` part of a multipart upload. The body
+is split into lines as it arrives and notes are written in batches of
+IMPORT_BATCH_SIZE: one multi-row INSERT for the notes, one for their tag links
+and one for the search index, then a commit. Category and tag names are
+resolved once per import and missing ones are created on the fly.
+
+Progress of running and recent imports is kept in-process, so it can be polled
+from the replica handling the upload.
+"""
+import os
+from datetime import datetime, timezone
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+from pydantic import ValidationError
+from sqlalchemy import and_, insert
+from sqlalchemy.orm import Session
+
+from . import crud, models, schemas, search
+from .cache import LRUCache
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+IMPORT_MAX_LINE_BYTES = int(os.getenv("IMPORT_MAX_LINE_BYTES", str(1024 * 1024)))
+# Errors beyond this many are counted but not listed
+IMPORT_MAX_ERRORS = 100
+
+NDJSON_CONTENT_TYPES = {
+    "application/x-ndjson",
+    "application/ndjson",
+    "application/jsonl",
+    "application/jsonlines",
+}
+
+# Progress of running and recently finished imports, keyed by (user, import id)
+_imports = LRUCache(maxsize=1000, ttl=3600)
+
+class NoteImport:
+    """State of one import: progress counters and the name -> id caches"""
+
+    def __init__(self, user_id: int, import_id: str):
+        self.user_id = user_id
+        self.progress = schemas.NoteImportProgress(import_id=import_id, status="running")
+        self._categories: Dict[str, int] = {}
+        self._tags: Dict[str, int] = {}
+
+    def _fail(self, line: int, detail: str) -> None:
+        self.progress.failed += 1
+        if len(self.progress.errors) < IMPORT_MAX_ERRORS:
+            self.progress.errors.append(schemas.NoteImportError(line=line, detail=detail))
+
+    def parse_line(self, line: int, raw: bytes) -> Optional[schemas.NoteImportItem]:
+        """Validate one line; invalid lines are recorded as failures and skipped"""
+        self.progress.lines_read = line
+        if not raw.strip():
+            return None
+        if len(raw) > IMPORT_MAX_LINE_BYTES:
+            self._fail(line, f"Line exceeds {IMPORT_MAX_LINE_BYTES} bytes")
+            return None
+        try:
+            return schemas.NoteImportItem.model_validate_json(raw)
+        except ValidationError as exc:
+            error = exc.errors()[0]
+            location = ".".join(str(part) for part in error["loc"])
+            self._fail(line, f"{location}: {error['msg']}" if location else error["msg"])
+            return None
+
+    def _resolve_names(self, db: Session, model, cache: Dict[str, int], names: set) -> int:
+        """Fill the cache with ids for names, creating missing rows; returns rows created"""
+        missing = [name for name in names if name not in cache]
+        if not missing:
+            return 0
+
+        existing = db.query(model.id, model.name).filter(
+            and_(model.user_id == self.user_id, model.name.in_(missing))
+        ).order_by(model.id)
+        for row_id, name in existing:
+            cache.setdefault(name, row_id)
+
+        new_names = [name for name in missing if name not in cache]
+        if new_names:
+            created = db.execute(
+                insert(model).returning(model.id, model.name),
+                [{"name": name, "user_id": self.user_id} for name in new_names],
+            )
+            for row_id, name in created:
+                cache[name] = row_id
+        return len(new_names)
+
+    def write_batch(self, db: Session, items: List[schemas.NoteImportItem]) -> None:
+        """Insert a batch of notes with their tags and search index rows, then commit"""
+        try:
+            categories_created = self._resolve_names(
+                db, models.Category, self._categories, {item.category for item in items if item.category}
+            )
+            tags_created = self._resolve_names(
+                db, models.Tag, self._tags, {name for item in items for name in item.tags}
+            )
+
+            now = datetime.now(timezone.utc)
+            # updated_at is left to the database default: it is when the note
+            # changed here, which incremental sync relies on to pick it up
+            rows = [{
+                "title": item.title,
+                "content": item.content,
+                "is_favorite": item.is_favorite,
+                "category_id": self._categories[item.category] if item.category else None,
+                "user_id": self.user_id,
+                "created_at": _as_utc(item.created_at) or _as_utc(item.updated_at) or now,
+            } for item in items]
+            note_ids = db.execute(
+                insert(models.Note).returning(models.Note.id, sort_by_parameter_order=True), rows
+            ).scalars().all()
+
+            note_tags = [
+                {"note_id": note_id, "tag_id": self._tags[name]}
+                for note_id, item in zip(note_ids, items) for name in item.tags
+            ]
+            if note_tags:
+                db.execute(insert(models.NoteTag), note_tags)
+
+            search.index_new_notes(db, [
+                models.Note(id=note_id, user_id=self.user_id, title=row["title"], content=row["content"])
+                for note_id, row in zip(note_ids, rows)
+            ])
+            crud._adjust_user_stats(
+                db,
+                self.user_id,
+                total_notes=len(rows),
+                favorite_notes=sum(1 for item in items if item.is_favorite),
+                categories_count=categories_created,
+                tags_count=tags_created,
+            )
+            crud._bump_collection_version(db, self.user_id)
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Names created in the rolled back transaction no longer exist
+            self._categories.clear()
+            self._tags.clear()
+            raise
+
+        self.progress.imported += len(rows)
+        self.progress.categories_created += categories_created
+        self.progress.tags_created += tags_created
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+# Request body
+async def _upload_chunks(upload) -> AsyncIterator[bytes]:
+    try:
+        while chunk := await upload.read(64 * 1024):
+            yield chunk
+    finally:
+        await upload.close()
+
+async def import_source(request: Request) -> AsyncIterator[bytes]:
+    """Byte chunks of the NDJSON document in an NDJSON or multipart request"""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type == "multipart/form-data":
+        # Starlette spools the upload to a temporary file as it is received
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail="Multipart imports need a 'file' part")
+        return _upload_chunks(upload)
+    if content_type in NDJSON_CONTENT_TYPES:
+        return request.stream()
+    raise HTTPException(
+        status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+        detail="Send application/x-ndjson or a multipart upload with a 'file' part",
+    )
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, bytes]]:
+    """Split chunks into numbered lines without holding more than one partial line"""
+    buffer = b""
+    line = 0
+    async for chunk in chunks:
+        buffer += chunk
+        *complete, buffer = buffer.split(b"\n")
+        for raw in complete:
+            line += 1
+            yield line, raw
+        if len(buffer) > IMPORT_MAX_LINE_BYTES:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Line {line + 1} exceeds {IMPORT_MAX_LINE_BYTES} bytes",
+            )
+    if buffer:
+        yield line + 1, buffer
+
+# Import jobs
+def start_import(user_id: int, import_id: Optional[str]) -> NoteImport:
+    """Register a new import; a client-chosen id lets it poll progress during the upload"""
+    import_id = import_id or os.urandom(8).hex()
+    existing = _imports.get((user_id, import_id))
+    if existing is not None and existing.progress.status == "running":
+        raise HTTPException(status_code=409, detail="An import with this id is already running")
+
+    job = NoteImport(user_id, import_id)
+    _imports.set((user_id, import_id), job)
+    return job
+
+def get_import_progress(user_id: int, import_id: str) -> Optional[schemas.NoteImportProgress]:
+    """Progress of a running or recently finished import"""
+    job = _imports.get((user_id, import_id))
+    return job.progress if job else None
+
+async def run_import(
+    job: NoteImport,
+    chunks: AsyncIterator[bytes],
+    write_batch: Callable[[List[schemas.NoteImportItem]], Awaitable[None]],
+) -> schemas.NoteImportProgress:
+    """Parse the body and hand full batches to write_batch as they accumulate"""
+    batch: List[schemas.NoteImportItem] = []
+    try:
+        async for line, raw in _lines(chunks):
+            item = job.parse_line(line, raw)
+            if item is None:
+                continue
+            batch.append(item)
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                await write_batch(batch)
+                batch = []
+        if batch:
+            await write_batch(batch)
+    except BaseException:
+        job.progress.status = "failed"
+        raise
+
+    job.progress.status = "completed"
+    return job.progress
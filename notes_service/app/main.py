@@ -1,10 +1,18 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from . import models
-from .database import engine
-from .routes import router
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from . import search
+from .database import DB_MODE, engine
+from .metrics import MetricsMiddleware
 
-models.Base.metadata.create_all(bind=engine)
+if DB_MODE == "async":
+    from .async_routes import router
+else:
+    from .routes import router
+
+# The schema is managed by Alembic (alembic upgrade head); this only backfills the
+# fallback search index of an existing database
+search.install(engine)
 
 app = FastAPI(title="Notes App Notes Service", version="1.0.0")
 
@@ -15,7 +23,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(router, prefix="/api/v1", tags=["notes"])
 
@@ -26,3 +36,7 @@ def read_root():
 @app.get("/health")
 def health_check():
     return {"status": "healthy"}
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,145 @@
+"""
+Prometheus metrics for the notes service, served at /metrics
+"""
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import event
+
+# Database connection pool
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    "db_pool_checkout_seconds",
+    "Time spent waiting to check a connection out of the pool",
+    ["pool"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections",
+    "Connections currently checked out of the pool",
+    ["pool"],
+)
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow_connections",
+    "Connections currently open beyond pool_size",
+    ["pool"],
+)
+DB_POOL_OVERFLOW_EVENTS = Counter(
+    "db_pool_overflow_events_total",
+    "Connections opened beyond pool_size",
+    ["pool"],
+)
+DB_POOL_TIMEOUTS = Counter(
+    "db_pool_checkout_timeouts_total",
+    "Checkouts that gave up after pool_timeout",
+    ["pool"],
+)
+
+# HTTP requests
+HTTP_REQUESTS = Counter(
+    "http_requests_total",
+    "HTTP requests by route template and status",
+    ["method", "route", "status"],
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template and status",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1, 2.5, 5, 10),
+)
+HTTP_REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "Database statements executed while handling a request",
+    ["method", "route"],
+    buckets=(0, 1, 2, 3, 4, 5, 8, 13, 21, 34, 55, 89),
+)
+HTTP_REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_seconds",
+    "Time spent executing database statements while handling a request",
+    ["method", "route"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+
+# Database statements
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds",
+    "Execution time of individual database statements",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+
+class RequestStats:
+    """Database work attributed to the request being handled"""
+    __slots__ = ("queries", "db_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+# Threadpool workers and run_sync greenlets inherit the request's context,
+# so statements executed on behalf of a request find its stats object here
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+def current_request_stats() -> Optional[RequestStats]:
+    return _request_stats.get()
+
+# The start time lives on the statement's execution context, which is discarded
+# with it, so a statement that fails (and never reaches after_cursor_execute)
+# leaves nothing behind on the pooled connection
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_start = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_query_start", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    DB_QUERY_SECONDS.observe(elapsed)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+
+def instrument_engine(engine) -> None:
+    """Time every statement run through a (sync) engine"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status and DB work per route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            _request_stats.reset(token)
+
+            # Label by template ("/api/v1/notes/{note_id}"), never by raw path
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "<unmatched>"
+            method = scope["method"]
+            status = str(status_code)
+            HTTP_REQUESTS.labels(method, template, status).inc()
+            HTTP_REQUEST_SECONDS.labels(method, template, status).observe(elapsed)
+            HTTP_REQUEST_DB_QUERIES.labels(method, template).observe(stats.queries)
+            HTTP_REQUEST_DB_SECONDS.labels(method, template).observe(stats.db_seconds)
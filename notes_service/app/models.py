@@ -1,24 +1,45 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey
+from sqlalchemy import BigInteger, Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Index, text
+from sqlalchemy.dialects.sqlite import DATETIME as SQLITE_DATETIME
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
 
+# SQLite stores CURRENT_TIMESTAMP without fractional seconds; bind values in the
+# same format so keyset comparisons against server-generated timestamps hold
+Timestamp = DateTime(timezone=True).with_variant(
+    SQLITE_DATETIME(storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"),
+    "sqlite",
+)
+
 class Category(Base):
     __tablename__ = "categories"
+    __table_args__ = (
+        Index("ix_categories_user_name", "user_id", "name"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), nullable=False)
     description = Column(Text, nullable=True)
     color = Column(String(7), default="#667eea")  # Hex color code
     user_id = Column(Integer, nullable=False, index=True)  # Foreign key to user service
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    created_at = Column(Timestamp, server_default=func.now())
+    updated_at = Column(Timestamp, onupdate=func.now())
 
-    # Relationship to notes
-    notes = relationship("Note", back_populates="category")
+    # Relationship to notes; delete_category detaches them in bulk, so the ORM
+    # needn't load them on delete
+    notes = relationship("Note", back_populates="category", passive_deletes=True)
 
 class Note(Base):
     __tablename__ = "notes"
+    __table_args__ = (
+        # Backs the default listing order and keyset pagination
+        Index("ix_notes_user_updated_id", "user_id", text("updated_at DESC"), "id"),
+        # The same order within one category
+        Index("ix_notes_user_category_updated", "user_id", "category_id", text("updated_at DESC"), "id"),
+    )
+    # Fetch server-generated created_at/updated_at with RETURNING on INSERT and
+    # UPDATE instead of a SELECT when they are next read
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(255), nullable=False)
@@ -26,8 +47,11 @@ class Note(Base):
     is_favorite = Column(Boolean, default=False)
     user_id = Column(Integer, nullable=False, index=True)  # Foreign key to user service
     category_id = Column(Integer, ForeignKey("categories.id"), nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    created_at = Column(Timestamp, server_default=func.now())
+    updated_at = Column(Timestamp, nullable=False, server_default=func.now(), onupdate=func.now())
+    # Incremented by every UPDATE of the row, bulk ones included; backs the note's
+    # ETag, as updated_at only has whole seconds on SQLite
+    version = Column(Integer, nullable=False, server_default=text("1"), onupdate=text("version + 1"))
 
     # Relationship to category
     category = relationship("Category", back_populates="notes")
@@ -36,17 +60,26 @@ class Note(Base):
 
 class Tag(Base):
     __tablename__ = "tags"
+    __table_args__ = (
+        Index("ix_tags_user_name", "user_id", "name"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(50), nullable=False)
     user_id = Column(Integer, nullable=False, index=True)  # Foreign key to user service
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(Timestamp, server_default=func.now())
 
-    # Relationship to note tags
-    note_tags = relationship("NoteTag", back_populates="tag")
+    # Relationship to note tags; delete_tag removes the links in bulk first
+    note_tags = relationship("NoteTag", back_populates="tag", passive_deletes=True)
 
 class NoteTag(Base):
     __tablename__ = "note_tags"
+    __table_args__ = (
+        # A tag is linked to a note at most once; also serves lookups by note
+        Index("uq_note_tags_note_tag", "note_id", "tag_id", unique=True),
+        # Notes carrying a tag
+        Index("ix_note_tags_tag_note", "tag_id", "note_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     note_id = Column(Integer, ForeignKey("notes.id"), nullable=False)
@@ -55,3 +88,47 @@ class NoteTag(Base):
     # Relationships
     note = relationship("Note", back_populates="tags")
     tag = relationship("Tag", back_populates="note_tags")
+
+class NoteSearchTerm(Base):
+    """Inverted index row used for full-text search when not running on PostgreSQL"""
+    __tablename__ = "note_search_terms"
+    __table_args__ = (
+        Index("ix_note_search_terms_user_term", "user_id", "term"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    note_id = Column(Integer, ForeignKey("notes.id"), nullable=False, index=True)
+    user_id = Column(Integer, nullable=False)
+    term = Column(String(64), nullable=False)
+    positions = Column(Text, nullable=False)  # Comma-separated token positions
+    title_hits = Column(Integer, nullable=False, default=0)
+
+class Tombstone(Base):
+    """A deleted note, category or tag, kept so incremental sync can report the deletion"""
+    __tablename__ = "tombstones"
+    __table_args__ = (
+        Index("ix_tombstones_user_deleted", "user_id", "deleted_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    kind = Column(String(16), nullable=False)  # "note", "category" or "tag"
+    object_id = Column(Integer, nullable=False)
+    deleted_at = Column(Timestamp, nullable=False, server_default=func.now())
+
+class UserCollectionVersion(Base):
+    """Per-user version of the notes, categories and tags, bumped by every write; backs ETags"""
+    __tablename__ = "user_collection_versions"
+
+    user_id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False)
+
+class UserNoteStats(Base):
+    """Materialized per-user dashboard counters, kept current by the crud write paths"""
+    __tablename__ = "user_note_stats"
+
+    user_id = Column(Integer, primary_key=True)
+    total_notes = Column(Integer, nullable=False, default=0)
+    favorite_notes = Column(Integer, nullable=False, default=0)
+    categories_count = Column(Integer, nullable=False, default=0)
+    tags_count = Column(Integer, nullable=False, default=0)
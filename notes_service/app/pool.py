@@ -0,0 +1,91 @@
+"""
+Connection pool configuration and instrumentation.
+
+Pool sizing is read from the environment so the total number of Postgres
+connections (replicas x (DB_POOL_SIZE + DB_MAX_OVERFLOW)) can be kept under
+max_connections as the deployment scales out.
+"""
+import os
+import time
+from uuid import uuid4
+
+from dotenv import load_dotenv
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+
+from .metrics import (
+    DB_POOL_CHECKED_OUT,
+    DB_POOL_CHECKOUT_SECONDS,
+    DB_POOL_OVERFLOW,
+    DB_POOL_OVERFLOW_EVENTS,
+    DB_POOL_TIMEOUTS,
+)
+
+load_dotenv()
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+# PgBouncer in transaction pooling mode can't keep server-side prepared statements
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "false").lower() == "true"
+
+class _InstrumentedPoolMixin:
+    pool_name = "default"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        DB_POOL_CHECKED_OUT.labels(self.pool_name).set_function(self.checkedout)
+        DB_POOL_OVERFLOW.labels(self.pool_name).set_function(lambda: max(self.overflow(), 0))
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            DB_POOL_TIMEOUTS.labels(self.pool_name).inc()
+            raise
+        finally:
+            DB_POOL_CHECKOUT_SECONDS.labels(self.pool_name).observe(time.perf_counter() - started)
+
+    def _create_connection(self):
+        # The overflow counter has already been incremented for this connection
+        if self.overflow() > 0:
+            DB_POOL_OVERFLOW_EVENTS.labels(self.pool_name).inc()
+        return super()._create_connection()
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pool_name = "sync"
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pool_name = "async"
+
+def engine_options(url: str, is_async: bool = False) -> dict:
+    """Keyword arguments for create_engine/create_async_engine"""
+    if make_url(url).get_backend_name() == "sqlite":
+        # SQLite uses SQLAlchemy's file/thread pools; the sizing knobs don't apply
+        return {}
+
+    options = {
+        "poolclass": InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+    if DB_PGBOUNCER and is_async:
+        # asyncpg prepares every statement; psycopg2 never does, so it needs no
+        # change. Disable the statement caches, give each statement a unique name
+        # and leave pooling to PgBouncer so prepared statements don't pile up.
+        options = {
+            "poolclass": NullPool,
+            "connect_args": {
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+                "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+            },
+        }
+    return options
@@ -1,7 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from . import crud, schemas, models
+from starlette.concurrency import run_in_threadpool
+from contextlib import contextmanager
+from typing import List, Literal, Optional
+import hashlib
+from . import crud, exporter, importer, schemas, models, sync
+from .serialization import FastJSONResponse, note_dicts
 from .database import SessionLocal
 from .auth import get_current_user_id
 
@@ -15,6 +19,46 @@ def get_db():
     finally:
         db.close()
 
+# Conditional requests: collections carry an ETag derived from the user's
+# collection version, single notes one derived from their row version
+ETAG_CACHE_CONTROL = "private, no-cache"
+
+def _etag_headers(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": ETAG_CACHE_CONTROL}
+
+def _check_etag(request: Request, etag: str) -> dict:
+    """Headers for a response with this ETag; raises 304 if If-None-Match already has it"""
+    header = request.headers.get("if-none-match")
+    if header:
+        # Weak comparison, as required for If-None-Match
+        candidates = {value.strip().removeprefix("W/") for value in header.split(",")}
+        if "*" in candidates or etag.removeprefix("W/") in candidates:
+            raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=_etag_headers(etag))
+    return _etag_headers(etag)
+
+def _collection_etag(request: Request, user_id: int, version: int) -> str:
+    # The representation also depends on the route and its query parameters
+    variant = hashlib.sha1(f"{user_id}:{request.url.path}?{request.url.query}".encode()).hexdigest()[:12]
+    return f'W/"{version}-{variant}"'
+
+def _note_etag(note_id: int, version: int) -> str:
+    return f'W/"n{note_id}-{version}"'
+
+def collection_version(
+    current_user_id: int = Depends(get_current_user_id),
+    db: Session = Depends(get_db)
+) -> int:
+    """The user's collection version, read once per request for the ETag and the caches"""
+    return crud.get_collection_version(db=db, user_id=current_user_id)
+
+def collection_etag(
+    request: Request,
+    current_user_id: int = Depends(get_current_user_id),
+    version: int = Depends(collection_version)
+) -> dict:
+    """ETag headers for a collection read, answering 304 before any row is queried"""
+    return _check_etag(request, _collection_etag(request, current_user_id, version))
+
 # Helper function to transform notes for response
 def _transform_note_for_response(note):
     """Transform a note with NoteTag relationships to proper tags for API response"""
@@ -54,11 +98,15 @@ def create_category(
 
 @router.get("/categories", response_model=schemas.CategoryList)
 def get_categories(
+    response: Response,
+    etag_headers: dict = Depends(collection_etag),
+    version: int = Depends(collection_version),
     current_user_id: int = Depends(get_current_user_id),
     db: Session = Depends(get_db)
 ):
     """Get all categories for the current user"""
-    categories = crud.get_categories(db=db, user_id=current_user_id)
+    categories = crud.get_categories(db=db, user_id=current_user_id, version=version)
+    response.headers.update(etag_headers)
     return schemas.CategoryList(categories=categories, total=len(categories))
 
 @router.get("/categories/{category_id}", response_model=schemas.Category)
@@ -110,11 +158,15 @@ def create_tag(
 
 @router.get("/tags", response_model=schemas.TagList)
 def get_tags(
+    response: Response,
+    etag_headers: dict = Depends(collection_etag),
+    version: int = Depends(collection_version),
     current_user_id: int = Depends(get_current_user_id),
     db: Session = Depends(get_db)
 ):
     """Get all tags for the current user"""
-    tags = crud.get_tags(db=db, user_id=current_user_id)
+    tags = crud.get_tags(db=db, user_id=current_user_id, version=version)
+    response.headers.update(etag_headers)
     return schemas.TagList(tags=tags, total=len(tags))
 
 @router.delete("/tags/{tag_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -135,51 +187,107 @@ def create_note(
     db: Session = Depends(get_db)
 ):
     """Create a new note"""
-    # Validate category if provided
-    if note.category_id:
-        category = crud.get_category(db=db, category_id=note.category_id, user_id=current_user_id)
-        if not category:
-            raise HTTPException(status_code=400, detail="Category not found")
-    
-    note_result = crud.create_note(db=db, note=note, user_id=current_user_id)
+    try:
+        note_result = crud.create_note(db=db, note=note, user_id=current_user_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
     return _transform_note_for_response(note_result)
 
-@router.get("/notes", response_model=schemas.NoteList)
-def get_notes(
-    search: Optional[str] = Query(None, description="Search in title and content"),
+def get_note_filters(
+    search: Optional[str] = Query(None, description='Full-text search in title and content (supports prefix* and "exact phrase")'),
     is_favorite: Optional[bool] = Query(None, description="Filter by favorite status"),
     category_id: Optional[int] = Query(None, description="Filter by category"),
     tag_ids: Optional[List[int]] = Query(None, description="Filter by tags"),
     limit: int = Query(20, ge=1, le=100, description="Number of notes to return"),
     offset: int = Query(0, ge=0, description="Number of notes to skip"),
-    current_user_id: int = Depends(get_current_user_id),
-    db: Session = Depends(get_db)
-):
-    """Get notes with filtering and pagination"""
-    filters = schemas.NoteFilter(
+    cursor: Optional[str] = Query(None, description="Opaque next_cursor from a previous page; takes precedence over offset"),
+    include_total: bool = Query(True, description="Include the total number of matching notes"),
+    approximate_total: bool = Query(False, description="Allow an estimated total instead of an exact count"),
+) -> schemas.NoteFilter:
+    """Query parameters of the note listing"""
+    if cursor:
+        if search:
+            raise HTTPException(status_code=400, detail="Cursor pagination is not supported for search results")
+        try:
+            crud.decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    return schemas.NoteFilter(
         search=search,
         is_favorite=is_favorite,
         category_id=category_id,
         tag_ids=tag_ids,
         limit=limit,
-        offset=offset
+        offset=offset,
+        cursor=cursor,
+        include_total=include_total,
+        approximate_total=approximate_total
     )
-    
-    notes, total = crud.get_notes(db=db, user_id=current_user_id, filters=filters)
-    # Transform notes for proper serialization
-    transformed_notes = [_transform_note_for_response(note) for note in notes]
-    return schemas.NoteList(notes=transformed_notes, total=total, limit=limit, offset=offset)
+
+def _note_list_response(notes, total, total_is_approximate, next_cursor, filters: schemas.NoteFilter) -> FastJSONResponse:
+    # Rendered directly in the shape of schemas.NoteList, skipping model validation
+    return FastJSONResponse({
+        "notes": note_dicts(notes),
+        "total": total,
+        "total_is_approximate": total_is_approximate,
+        "limit": filters.limit,
+        "offset": filters.offset,
+        "next_cursor": next_cursor
+    })
+
+def _dashboard_response(stats: dict) -> FastJSONResponse:
+    # Rendered directly in the shape of schemas.DashboardStats
+    return FastJSONResponse({
+        "total_notes": stats["total_notes"],
+        "favorite_notes": stats["favorite_notes"],
+        "categories_count": stats["categories_count"],
+        "tags_count": stats["tags_count"],
+        "recent_notes": note_dicts(stats["recent_notes"])
+    })
+
+@router.get("/notes", response_model=schemas.NoteList)
+def get_notes(
+    filters: schemas.NoteFilter = Depends(get_note_filters),
+    etag_headers: dict = Depends(collection_etag),
+    version: int = Depends(collection_version),
+    current_user_id: int = Depends(get_current_user_id),
+    db: Session = Depends(get_db)
+):
+    """Get notes with filtering and offset or cursor pagination"""
+    notes, total, total_is_approximate, next_cursor = crud.get_notes(
+        db=db, user_id=current_user_id, filters=filters, version=version
+    )
+    response = _note_list_response(notes, total, total_is_approximate, next_cursor, filters)
+    response.headers.update(etag_headers)
+    return response
+
+@router.get("/notes/export")
+def export_notes(
+    format: Literal["ndjson", "markdown"] = Query("ndjson", description="ndjson, or markdown for a zip of Markdown files"),
+    current_user_id: int = Depends(get_current_user_id)
+):
+    """Stream every note of the current user as NDJSON or a zip of Markdown files"""
+    return exporter.export_response(current_user_id, format)
 
 @router.get("/notes/{note_id}", response_model=schemas.NoteResponse)
 def get_note(
     note_id: int,
+    request: Request,
+    response: Response,
     current_user_id: int = Depends(get_current_user_id),
     db: Session = Depends(get_db)
 ):
     """Get a specific note"""
+    # Check the ETag against the row version alone before loading the note and its relationships
+    version = crud.get_note_version(db=db, note_id=note_id, user_id=current_user_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Note not found")
+    etag_headers = _check_etag(request, _note_etag(note_id, version))
     note = crud.get_note(db=db, note_id=note_id, user_id=current_user_id)
     if not note:
         raise HTTPException(status_code=404, detail="Note not found")
+    response.headers.update(etag_headers)
     return _transform_note_for_response(note)
 
 @router.put("/notes/{note_id}", response_model=schemas.NoteResponse)
@@ -190,15 +298,12 @@ def update_note(
     db: Session = Depends(get_db)
 ):
     """Update a note"""
-    # Validate category if provided
-    if note_update.category_id:
-        category = crud.get_category(db=db, category_id=note_update.category_id, user_id=current_user_id)
-        if not category:
-            raise HTTPException(status_code=400, detail="Category not found")
-    
-    note = crud.update_note(
-        db=db, note_id=note_id, user_id=current_user_id, note_update=note_update
-    )
+    try:
+        note = crud.update_note(
+            db=db, note_id=note_id, user_id=current_user_id, note_update=note_update
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
     if not note:
         raise HTTPException(status_code=404, detail="Note not found")
     return _transform_note_for_response(note)
@@ -219,6 +324,57 @@ def delete_note(
     if not success:
         raise HTTPException(status_code=404, detail="Note not found")
 
+def _batch_response(batch: schemas.NoteBatchRequest, results) -> schemas.NoteBatchResponse:
+    if results is None:
+        detail = "Category not found" if batch.operation == "set_category" else "Tag not found"
+        raise HTTPException(status_code=400, detail=detail)
+    
+    succeeded = sum(1 for result in results if result["status"] == "ok")
+    return schemas.NoteBatchResponse(
+        operation=batch.operation,
+        results=results,
+        succeeded=succeeded,
+        failed=len(results) - succeeded
+    )
+
+@router.post("/notes/batch", response_model=schemas.NoteBatchResponse)
+def batch_update_notes(
+    batch: schemas.NoteBatchRequest,
+    current_user_id: int = Depends(get_current_user_id),
+    db: Session = Depends(get_db)
+):
+    """Favorite, recategorize, tag, untag or delete many notes in one transaction"""
+    results = crud.batch_update_notes(db=db, user_id=current_user_id, batch=batch)
+    return _batch_response(batch, results)
+
+# Bulk import
+@router.post("/notes/import", response_model=schemas.NoteImportProgress)
+async def import_notes(
+    request: Request,
+    import_id: Optional[str] = Query(None, max_length=64, pattern=r"^[A-Za-z0-9_-]+$", description="Client-chosen id for polling progress"),
+    current_user_id: int = Depends(get_current_user_id),
+    db: Session = Depends(get_db)
+):
+    """Import notes from an NDJSON body or multipart upload, creating categories and tags by name"""
+    chunks = await importer.import_source(request)
+    job = importer.start_import(current_user_id, import_id)
+    
+    async def write_batch(items):
+        await run_in_threadpool(job.write_batch, db, items)
+    
+    return await importer.run_import(job, chunks, write_batch)
+
+@router.get("/notes/import/{import_id}", response_model=schemas.NoteImportProgress)
+def get_import_progress(
+    import_id: str,
+    current_user_id: int = Depends(get_current_user_id)
+):
+    """Progress of a running or recently finished import"""
+    progress = importer.get_import_progress(current_user_id, import_id)
+    if not progress:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return progress
+
 # Note actions
 @router.post("/notes/{note_id}/favorite", response_model=schemas.NoteResponse)
 def toggle_favorite(
@@ -235,12 +391,34 @@ def toggle_favorite(
 # Dashboard
 @router.get("/dashboard", response_model=schemas.DashboardStats)
 def get_dashboard_stats(
+    etag_headers: dict = Depends(collection_etag),
     current_user_id: int = Depends(get_current_user_id),
     db: Session = Depends(get_db)
 ):
     """Get dashboard statistics and recent notes"""
     stats = crud.get_dashboard_stats(db=db, user_id=current_user_id)
-    # Transform recent notes for proper serialization
-    transformed_recent_notes = [_transform_note_for_response(note) for note in stats["recent_notes"]]
-    stats["recent_notes"] = transformed_recent_notes
-    return schemas.DashboardStats(**stats)
+    response = _dashboard_response(stats)
+    response.headers.update(etag_headers)
+    return response
+
+# Incremental sync
+@contextmanager
+def _sync_token_errors():
+    try:
+        yield
+    except sync.SyncTokenExpired:
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Sync token expired; sync again without a token")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+
+@router.get("/sync", response_model=schemas.SyncResponse)
+def sync_changes(
+    since: Optional[str] = Query(None, description="next_token from the previous sync; omit for a full sync"),
+    limit: int = Query(500, ge=1, le=1000),
+    current_user_id: int = Depends(get_current_user_id),
+    db: Session = Depends(get_db)
+):
+    """Notes, categories and tags changed since a sync token, and the ids deleted since then"""
+    with _sync_token_errors():
+        changes = sync.get_changes(db, current_user_id, since, limit)
+    return FastJSONResponse(changes)
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field, field_validator
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field, field_validator, model_validator
+from typing import List, Literal, Optional, Dict, Any
 from datetime import datetime
 
 # Category Schemas
@@ -68,6 +68,69 @@ class NoteResponse(NoteBase):
     class Config:
         from_attributes = True
 
+# Batch operation Schemas
+MAX_BATCH_SIZE = 1000
+
+class NoteBatchRequest(BaseModel):
+    note_ids: List[int] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+    operation: Literal["set_favorite", "set_category", "add_tags", "remove_tags", "delete"]
+    is_favorite: Optional[bool] = None
+    category_id: Optional[int] = None  # None with set_category clears the category
+    tag_ids: Optional[List[int]] = None
+
+    @model_validator(mode="after")
+    def check_operation_arguments(self):
+        if self.operation == "set_favorite" and self.is_favorite is None:
+            raise ValueError("is_favorite is required for set_favorite")
+        if self.operation in ("add_tags", "remove_tags") and not self.tag_ids:
+            raise ValueError(f"tag_ids is required for {self.operation}")
+        return self
+
+class NoteBatchResult(BaseModel):
+    id: int
+    status: Literal["ok", "not_found"]
+
+class NoteBatchResponse(BaseModel):
+    operation: str
+    results: List[NoteBatchResult]
+    succeeded: int
+    failed: int
+
+# Import Schemas
+class NoteImportItem(BaseModel):
+    """One line of an NDJSON import"""
+    title: str = Field(..., min_length=1, max_length=255)
+    content: Optional[str] = None
+    is_favorite: bool = False
+    category: Optional[str] = Field(None, max_length=100)  # Resolved or created by name
+    tags: List[str] = []  # Resolved or created by name
+    created_at: Optional[datetime] = None
+    # Only used as created_at when that is missing; imported notes count as
+    # updated at import time
+    updated_at: Optional[datetime] = None
+
+    @field_validator("tags")
+    @classmethod
+    def check_tags(cls, tags: List[str]) -> List[str]:
+        names = list(dict.fromkeys(name.strip() for name in tags if name.strip()))
+        if any(len(name) > 50 for name in names):
+            raise ValueError("tag names must be at most 50 characters")
+        return names
+
+class NoteImportError(BaseModel):
+    line: int
+    detail: str
+
+class NoteImportProgress(BaseModel):
+    import_id: str
+    status: Literal["running", "completed", "failed"]
+    lines_read: int = 0
+    imported: int = 0
+    failed: int = 0
+    categories_created: int = 0
+    tags_created: int = 0
+    errors: List[NoteImportError] = []
+
 # Search and Filter Schemas
 class NoteFilter(BaseModel):
     search: Optional[str] = None
@@ -76,6 +139,9 @@ class NoteFilter(BaseModel):
     tag_ids: Optional[List[int]] = None
     limit: int = Field(default=20, ge=1, le=100)
     offset: int = Field(default=0, ge=0)
+    cursor: Optional[str] = None
+    include_total: bool = True
+    approximate_total: bool = False
 
 # Dashboard Stats Schema
 class DashboardStats(BaseModel):
@@ -88,9 +154,11 @@ class DashboardStats(BaseModel):
 # Response Schemas
 class NoteList(BaseModel):
     notes: List[NoteResponse]
-    total: int
+    total: Optional[int] = None
+    total_is_approximate: bool = False
     limit: int
     offset: int
+    next_cursor: Optional[str] = None
 
 class CategoryList(BaseModel):
     categories: List[Category]
@@ -100,6 +168,20 @@ class TagList(BaseModel):
     tags: List[Tag]
     total: int
 
+# Sync Schemas
+class SyncDeleted(BaseModel):
+    notes: List[int] = []
+    categories: List[int] = []
+    tags: List[int] = []
+
+class SyncResponse(BaseModel):
+    notes: List[NoteResponse]
+    categories: List[Category]
+    tags: List[Tag]
+    deleted: SyncDeleted
+    next_token: str
+    has_more: bool
+
 # Error Schemas
 class ErrorResponse(BaseModel):
     detail: str
@@ -0,0 +1,308 @@
+"""
+Full-text search for notes.
+
+On PostgreSQL the notes table carries a generated ``search_vector`` tsvector
+column (title weighted above content) with a GIN index, and queries are ranked
+with ``ts_rank_cd``. On every other database (SQLite in development and tests)
+a tokenized inverted index is kept in ``note_search_terms`` and every match is
+ranked in Python, with pages cut from the full ranking. The fallback index is
+updated incrementally by the note write paths in ``crud.py``; the Postgres
+column is maintained by the database itself.
+
+Query syntax (all clauses must match):
+    fox              plain term
+    qu*              prefix match
+    "brown fox"      phrase
+"""
+import math
+import os
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, desc, func, literal_column, or_, text
+from sqlalchemy.orm import Query, Session
+
+from . import models
+
+SEARCH_CONFIG = os.getenv("SEARCH_TS_CONFIG", "english")
+
+MAX_TERM_LENGTH = 64
+TITLE_WEIGHT = 3.0
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_QUERY_RE = re.compile(r'"([^"]*)"|(\S+)')
+
+if not re.fullmatch(r"[a-z_]+", SEARCH_CONFIG):
+    raise ValueError(f"Invalid SEARCH_TS_CONFIG: {SEARCH_CONFIG!r}")
+
+_PG_VECTOR = literal_column("notes.search_vector")
+_PG_CONFIG = literal_column(f"'{SEARCH_CONFIG}'::regconfig")
+
+@dataclass
+class Clause:
+    terms: List[str]
+    prefix: bool = False
+
+    @property
+    def is_phrase(self) -> bool:
+        return len(self.terms) > 1
+
+def tokenize(value: Optional[str]) -> List[str]:
+    """Split text into lowercase index terms"""
+    if not value:
+        return []
+    return [token[:MAX_TERM_LENGTH] for token in _TOKEN_RE.findall(value.lower())]
+
+def parse_query(value: str) -> List[Clause]:
+    """Parse a search string into term, prefix and phrase clauses"""
+    clauses = []
+    for phrase, word in _QUERY_RE.findall(value):
+        if phrase:
+            terms = tokenize(phrase)
+            if terms:
+                clauses.append(Clause(terms=terms))
+            continue
+
+        prefix = word.endswith("*")
+        terms = tokenize(word)
+        if terms:
+            # "e-mail" tokenizes to two words and is treated as a phrase
+            clauses.append(Clause(terms=terms, prefix=prefix))
+    return clauses
+
+def is_postgres(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+# Schema setup
+def install(engine) -> None:
+    """Backfill the fallback index; the Postgres search column is created by the migrations"""
+    if engine.dialect.name == "postgresql":
+        return
+
+    with engine.begin() as conn:
+        indexed = conn.execute(text("SELECT 1 FROM note_search_terms LIMIT 1")).first()
+        has_notes = conn.execute(text("SELECT 1 FROM notes LIMIT 1")).first()
+    if has_notes and not indexed:
+        db = Session(bind=engine)
+        try:
+            rebuild_index(db)
+            db.commit()
+        finally:
+            db.close()
+
+# Fallback index maintenance
+def _document_positions(note: models.Note) -> Tuple[Dict[str, List[int]], Dict[str, int]]:
+    """Map each term to its positions, and count how often it occurs in the title"""
+    title_terms = tokenize(note.title)
+    content_terms = tokenize(note.content)
+
+    positions: Dict[str, List[int]] = {}
+    title_hits: Dict[str, int] = {}
+    for position, term in enumerate(title_terms):
+        positions.setdefault(term, []).append(position)
+        title_hits[term] = title_hits.get(term, 0) + 1
+
+    # Leave a gap so phrases never match across the title/content boundary
+    offset = len(title_terms) + 1
+    for position, term in enumerate(content_terms, start=offset):
+        positions.setdefault(term, []).append(position)
+
+    return positions, title_hits
+
+def index_note(db: Session, note: models.Note) -> None:
+    """(Re)index a single note; the note must already have an id"""
+    if is_postgres(db):
+        return
+
+    remove_note(db, note.id)
+    rows = _index_rows(note)
+    if rows:
+        db.bulk_insert_mappings(models.NoteSearchTerm, rows)
+
+def index_new_notes(db: Session, notes: List[models.Note]) -> None:
+    """Index freshly inserted notes (which have no index rows yet) in one executemany"""
+    if is_postgres(db):
+        return
+
+    rows = [row for note in notes for row in _index_rows(note)]
+    if rows:
+        db.bulk_insert_mappings(models.NoteSearchTerm, rows)
+
+def _index_rows(note: models.Note) -> List[dict]:
+    positions, title_hits = _document_positions(note)
+    return [
+        {
+            "note_id": note.id,
+            "user_id": note.user_id,
+            "term": term,
+            "positions": ",".join(str(p) for p in term_positions),
+            "title_hits": title_hits.get(term, 0),
+        }
+        for term, term_positions in positions.items()
+    ]
+
+def remove_note(db: Session, note_id: int) -> None:
+    """Drop a note from the fallback index"""
+    remove_notes(db, [note_id])
+
+def remove_notes(db: Session, note_ids: List[int]) -> None:
+    """Drop several notes from the fallback index in one statement"""
+    if is_postgres(db) or not note_ids:
+        return
+    db.query(models.NoteSearchTerm).filter(
+        models.NoteSearchTerm.note_id.in_(note_ids)
+    ).delete(synchronize_session=False)
+
+def rebuild_index(db: Session, user_id: Optional[int] = None) -> int:
+    """Rebuild the fallback index from scratch, optionally for one user"""
+    if is_postgres(db):
+        return 0
+
+    terms = db.query(models.NoteSearchTerm)
+    notes = db.query(models.Note)
+    if user_id is not None:
+        terms = terms.filter(models.NoteSearchTerm.user_id == user_id)
+        notes = notes.filter(models.Note.user_id == user_id)
+    terms.delete(synchronize_session=False)
+
+    count = 0
+    for note in notes.yield_per(500):
+        index_note(db, note)
+        count += 1
+    return count
+
+# Querying
+def _to_tsquery(clauses: List[Clause]) -> str:
+    def lexeme(term: str) -> str:
+        return "'" + term.replace("'", "''") + "'"
+
+    parts = []
+    for clause in clauses:
+        lexemes = [lexeme(term) for term in clause.terms]
+        if clause.prefix:
+            lexemes[-1] += ":*"
+        parts.append("(" + " <-> ".join(lexemes) + ")" if clause.is_phrase else lexemes[0])
+    return " & ".join(parts)
+
+def _prefix_upper_bound(prefix: str) -> str:
+    return prefix + "\U0010ffff"
+
+def _phrase_matches(postings: Dict[str, List[int]], clause: Clause) -> bool:
+    """Check that the clause terms occur at consecutive positions"""
+    candidates = []
+    for index, term in enumerate(clause.terms):
+        if clause.prefix and index == len(clause.terms) - 1:
+            positions = {p for t, ps in postings.items() if t.startswith(term) for p in ps}
+        else:
+            positions = set(postings.get(term, ()))
+        if not positions:
+            return False
+        candidates.append({p - index for p in positions})
+    return bool(set.intersection(*candidates))
+
+def load_postings(db: Session, user_id: int, clauses: List[Clause]) -> Tuple[List[tuple], int]:
+    """Fetch the user's fallback index rows for every term and prefix in the clauses
+
+    Also returns how many notes the user has, the corpus size for idf.
+    """
+    exact_terms = set()
+    prefixes = set()
+    for clause in clauses:
+        for index, term in enumerate(clause.terms):
+            if clause.prefix and index == len(clause.terms) - 1:
+                prefixes.add(term)
+            else:
+                exact_terms.add(term)
+
+    conditions = []
+    if exact_terms:
+        conditions.append(models.NoteSearchTerm.term.in_(exact_terms))
+    for prefix in prefixes:
+        conditions.append(and_(
+            models.NoteSearchTerm.term >= prefix,
+            models.NoteSearchTerm.term < _prefix_upper_bound(prefix),
+        ))
+
+    rows = db.query(
+        models.NoteSearchTerm.note_id,
+        models.NoteSearchTerm.term,
+        models.NoteSearchTerm.positions,
+        models.NoteSearchTerm.title_hits,
+    ).filter(
+        models.NoteSearchTerm.user_id == user_id,
+        or_(*conditions),
+    ).all()
+    corpus_size = db.query(func.count(models.Note.id)).filter(
+        models.Note.user_id == user_id
+    ).scalar()
+    return rows, corpus_size
+
+def rank_postings(rows: List[tuple], corpus_size: int, clauses: List[Clause]) -> List[int]:
+    """Score index rows from load_postings in Python and return note ids, best match first
+
+    Pure CPU work with no session, so async callers can run it in a thread.
+    """
+    # The rows hold every posting of each queried term, so these are document
+    # frequencies over the user's whole corpus, not just the matching notes
+    documents: Dict[int, Dict[str, Tuple[List[int], int]]] = {}
+    document_frequency: Dict[str, int] = {}
+    for note_id, term, positions, title_hits in rows:
+        documents.setdefault(note_id, {})[term] = (
+            [int(p) for p in positions.split(",")], title_hits
+        )
+        document_frequency[term] = document_frequency.get(term, 0) + 1
+
+    # A note may have been indexed after the count was read
+    total = max(corpus_size, len(documents))
+    scored = []
+    for note_id, document in documents.items():
+        postings = {term: positions for term, (positions, _) in document.items()}
+
+        matched_terms = set()
+        for clause in clauses:
+            if clause.is_phrase:
+                if not _phrase_matches(postings, clause):
+                    break
+                matched_terms.update(
+                    t for t in document
+                    if t in clause.terms or (clause.prefix and t.startswith(clause.terms[-1]))
+                )
+            else:
+                term = clause.terms[0]
+                hits = [t for t in document if t == term or (clause.prefix and t.startswith(term))]
+                if not hits:
+                    break
+                matched_terms.update(hits)
+        else:
+            # BM25-style saturation of a title-weighted term frequency
+            score = 0.0
+            for term in matched_terms:
+                positions, title_hits = document[term]
+                frequency = (len(positions) - title_hits) + TITLE_WEIGHT * title_hits
+                idf = 1.0 + math.log(total / document_frequency[term])
+                score += idf * frequency / (frequency + 1.2)
+            scored.append((score, note_id))
+
+    scored.sort(key=lambda item: (-item[0], -item[1]))
+    return [note_id for _, note_id in scored]
+
+def rank_fallback(db: Session, user_id: int, clauses: List[Clause]) -> List[int]:
+    """Return ids of all matching notes, best match first, using the fallback index"""
+    rows, corpus_size = load_postings(db, user_id, clauses)
+    return rank_postings(rows, corpus_size, clauses)
+
+def filter_ranked(query: Query, ranked_ids: List[int]) -> List[int]:
+    """The ranked ids that a filtered Note query also matches, still in rank order
+
+    Reads the query's ids instead of binding every ranked id into an IN list,
+    so there is no limit on how many notes a search may match.
+    """
+    allowed = {note_id for note_id, in query.with_entities(models.Note.id)}
+    return [note_id for note_id in ranked_ids if note_id in allowed]
+
+def apply_search(query: Query, clauses: List[Clause]) -> Tuple[Query, list]:
+    """Restrict a Note query to PostgreSQL full-text matches and return the rank ordering"""
+    tsquery = func.to_tsquery(_PG_CONFIG, _to_tsquery(clauses))
+    query = query.filter(_PG_VECTOR.op("@@")(tsquery))
+    return query, [desc(func.ts_rank_cd(_PG_VECTOR, tsquery))]
@@ -0,0 +1,82 @@
+"""
+Fast JSON rendering for note list responses.
+
+The routes still declare their response models for the OpenAPI docs, but the
+list endpoints return a pre-rendered response built straight from the ORM
+objects. That skips building ``schemas.NoteResponse`` per note
+(with nested ``from_attributes`` validation), FastAPI's re-validation against
+``response_model`` and ``jsonable_encoder``. The output is the same JSON the
+validated path produces, so the dict builders below must list the fields of
+the corresponding schemas in the same order; benchmarks/bench_serialization.py
+checks that.
+"""
+import json
+from datetime import datetime
+from typing import Any, Iterable, Optional
+
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def category_dict(category) -> Optional[dict]:
+    """schemas.Category as a plain dict"""
+    if category is None:
+        return None
+    return {
+        "name": category.name,
+        "description": category.description,
+        "color": category.color,
+        "id": category.id,
+        "user_id": category.user_id,
+        "created_at": category.created_at,
+        "updated_at": category.updated_at,
+    }
+
+def tag_dict(tag) -> dict:
+    """schemas.Tag as a plain dict"""
+    return {
+        "name": tag.name,
+        "id": tag.id,
+        "user_id": tag.user_id,
+        "created_at": tag.created_at,
+    }
+
+def note_dict(note) -> dict:
+    """schemas.NoteResponse as a plain dict, from a note with category and tags loaded"""
+    return {
+        "title": note.title,
+        "content": note.content,
+        "is_favorite": note.is_favorite,
+        "category_id": note.category_id,
+        "id": note.id,
+        "user_id": note.user_id,
+        "created_at": note.created_at,
+        "updated_at": note.updated_at,
+        "category": category_dict(note.category),
+        "tags": [tag_dict(note_tag.tag) for note_tag in note.tags],
+    }
+
+def note_dicts(notes: Iterable) -> list:
+    return [note_dict(note) for note in notes]
+
+def _default(value: Any):
+    if isinstance(value, datetime):
+        # Same format as pydantic: ISO 8601 with "Z" for UTC
+        text = value.isoformat()
+        return text[:-6] + "Z" if text.endswith("+00:00") else text
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+class FastJSONResponse(Response):
+    """JSON response for content that is already shaped like its response model"""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1 @@
+# Notes Service benchmarks
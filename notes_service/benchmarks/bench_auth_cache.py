@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Measure the per-request cost of the get_current_user_id auth dependency with
+and without the verified-token cache.
+
+Simulates page loads that each send several API calls with the same token,
+spread over a number of distinct users, and reports the mean time per call.
+
+Usage (from notes_service/):
+    python -m benchmarks.bench_auth_cache --requests 50000 --users 100 --calls-per-page 5
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from fastapi.security import HTTPAuthorizationCredentials
+from jose import jwt
+
+from app import auth
+from app.cache import LRUCache
+
+def make_tokens(users: int) -> list:
+    expire = datetime.utcnow() + timedelta(hours=1)
+    return [
+        jwt.encode({"sub": str(user_id), "exp": expire}, auth.SECRET_KEY, algorithm=auth.ALGORITHM)
+        for user_id in range(1, users + 1)
+    ]
+
+async def run(tokens: list, requests: int, calls_per_page: int) -> float:
+    """Return the mean seconds per dependency call"""
+    credentials = [
+        HTTPAuthorizationCredentials(scheme="Bearer", credentials=token) for token in tokens
+    ]
+    started = time.perf_counter()
+    for i in range(requests):
+        # calls_per_page consecutive requests share a token, like one page load
+        await auth.get_current_user_id(credentials[(i // calls_per_page) % len(credentials)])
+    return (time.perf_counter() - started) / requests
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--calls-per-page", type=int, default=5)
+    parser.add_argument("--cache-size", type=int, default=auth.JWT_CACHE_SIZE or 4096)
+    args = parser.parse_args()
+
+    tokens = make_tokens(args.users)
+    results = {}
+    for label, size in (("no cache", 0), ("cache", args.cache_size)):
+        auth._token_cache = LRUCache(maxsize=size, ttl=auth.JWT_CACHE_TTL)
+        results[label] = asyncio.run(run(tokens, args.requests, args.calls_per_page))
+
+    print(f"{args.requests} calls, {args.users} users, {args.calls_per_page} calls per page")
+    for label, seconds in results.items():
+        print(f"{label:>10}: {seconds * 1e6:8.2f} us/call")
+    hits, misses = auth._token_cache.hits, auth._token_cache.misses
+    print(f"cache hit rate: {hits / max(hits + misses, 1):.1%}")
+    print(f"speedup: {results['no cache'] / results['cache']:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Compare joined vs batched (selectin) eager loading for the notes listing.
+
+Seeds notes that each carry many tags, runs the listing query with both loader
+strategies and reports the statements issued, the rows the database returned
+and the bytes of column data in those rows.
+
+Usage (from notes_service/):
+    python -m benchmarks.bench_relationship_loading --notes 200 --tags-per-note 10
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import create_engine, desc, event
+from sqlalchemy.orm import Session, joinedload
+
+from app import models
+from app.crud import NOTE_RELATIONSHIPS
+
+JOINED = (
+    joinedload(models.Note.category),
+    joinedload(models.Note.tags).joinedload(models.NoteTag.tag),
+)
+
+def _value_size(value) -> int:
+    if value is None:
+        return 0
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode())
+    if isinstance(value, (int, float, bool)):
+        return 8
+    return len(str(value).encode())
+
+def seed(engine, notes: int, tags_per_note: int, content_bytes: int, user_id: int = 1) -> None:
+    models.Base.metadata.create_all(bind=engine)
+    with Session(bind=engine) as db:
+        category = models.Category(name="Benchmark", user_id=user_id)
+        tags = [models.Tag(name=f"tag-{i}", user_id=user_id) for i in range(tags_per_note)]
+        db.add(category)
+        db.add_all(tags)
+        db.flush()
+
+        content = ("lorem ipsum " * (content_bytes // 12 + 1))[:content_bytes]
+        for i in range(notes):
+            note = models.Note(
+                title=f"Note {i}", content=content, user_id=user_id, category_id=category.id
+            )
+            db.add(note)
+            db.flush()
+            db.add_all(models.NoteTag(note_id=note.id, tag_id=tag.id) for tag in tags)
+        db.commit()
+
+def measure(engine, options, limit: int, user_id: int = 1) -> dict:
+    """Run the listing query and replay its statements to count rows and bytes"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        started = time.perf_counter()
+        with Session(bind=engine) as db:
+            notes = db.query(models.Note).options(*options).filter(
+                models.Note.user_id == user_id
+            ).order_by(desc(models.Note.updated_at)).limit(limit).all()
+            tag_count = sum(len(note.tags) for note in notes)
+        elapsed = time.perf_counter() - started
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    rows = 0
+    size = 0
+    with engine.connect() as conn:
+        for statement, parameters in statements:
+            for row in conn.exec_driver_sql(statement, parameters).fetchall():
+                rows += 1
+                size += sum(_value_size(value) for value in row)
+
+    return {
+        "notes": len(notes),
+        "tags": tag_count,
+        "statements": len(statements),
+        "rows": rows,
+        "bytes": size,
+        "ms": elapsed * 1000,
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default="sqlite://")
+    parser.add_argument("--notes", type=int, default=200)
+    parser.add_argument("--tags-per-note", type=int, default=10)
+    parser.add_argument("--content-bytes", type=int, default=4000)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    seed(engine, args.notes, args.tags_per_note, args.content_bytes)
+
+    print(f"{args.limit} of {args.notes} notes, {args.tags_per_note} tags each, "
+          f"{args.content_bytes} bytes of content")
+    print(f"{'strategy':<10} {'statements':>10} {'rows':>8} {'bytes':>12} {'ms':>8}")
+    for name, options in (("joined", JOINED), ("selectin", NOTE_RELATIONSHIPS)):
+        result = measure(engine, options, args.limit)
+        print(f"{name:<10} {result['statements']:>10} {result['rows']:>8} "
+              f"{result['bytes']:>12,} {result['ms']:>8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Compare the serialization cost of a GET /notes page: the validated path
+(NoteResponse per note, then FastAPI's response_model validation and JSON
+encoding) against the direct rendering in app/serialization.py.
+
+Seeds notes with a category and several tags, loads one page with
+crud.get_notes, checks that both paths produce the same JSON and reports the
+time per page spent after the query.
+
+Usage (from notes_service/):
+    python -m benchmarks.bench_serialization --limit 100 --tags-per-note 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from app import crud, schemas
+from app.routes import _note_list_response, _transform_note_for_response
+from app.serialization import orjson
+
+from .bench_relationship_loading import seed
+
+NOTE_LIST_FIELD = create_response_field(name="NoteList", type_=schemas.NoteList)
+
+def validated_page(notes, total, total_is_approximate, next_cursor, filters) -> bytes:
+    """What GET /notes did before: build models, then let FastAPI validate and encode them"""
+    content = schemas.NoteList(
+        notes=[_transform_note_for_response(note) for note in notes],
+        total=total,
+        total_is_approximate=total_is_approximate,
+        limit=filters.limit,
+        offset=filters.offset,
+        next_cursor=next_cursor,
+    )
+    encoded = asyncio.run(serialize_response(field=NOTE_LIST_FIELD, response_content=content))
+    return JSONResponse(encoded).body
+
+def fast_page(notes, total, total_is_approximate, next_cursor, filters) -> bytes:
+    return _note_list_response(notes, total, total_is_approximate, next_cursor, filters).body
+
+def timed(func, args, rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        func(*args)
+    return (time.perf_counter() - started) / rounds
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--tags-per-note", type=int, default=5)
+    parser.add_argument("--content-bytes", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    seed(engine, args.limit, args.tags_per_note, args.content_bytes)
+    filters = schemas.NoteFilter(limit=args.limit)
+    with Session(bind=engine) as db:
+        notes, total, total_is_approximate, next_cursor = crud.get_notes(db, 1, filters)
+        page = (notes, total, total_is_approximate, next_cursor, filters)
+
+        if json.loads(validated_page(*page)) != json.loads(fast_page(*page)):
+            raise SystemExit("Serialized output differs between the two paths")
+
+        validated = timed(validated_page, page, args.rounds)
+        fast = timed(fast_page, page, args.rounds)
+
+    encoder = "orjson" if orjson is not None else "json"
+    print(f"{len(notes)} notes, {args.tags_per_note} tags each, encoder: {encoder}")
+    print(f"validated: {validated * 1e3:7.2f} ms/page")
+    print(f"     fast: {fast * 1e3:7.2f} ms/page")
+    print(f"  speedup: {validated / fast:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+# Load tests for the notes and auth services; see __main__.py for usage
@@ -0,0 +1,179 @@
+"""
+Drive a service with concurrent requests and summarise the results.
+
+Each operation runs as its own phase: ``requests`` calls spread over
+``concurrency`` workers. Latency is measured client-side; queries per request
+come from the service's own ``http_request_db_queries`` histogram, scraped
+from /metrics before and after the phase. A phase therefore reports the same
+numbers whether the app runs in-process (httpx's ASGI transport) or behind a
+real server.
+"""
+import asyncio
+import json
+import math
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+from prometheus_client.parser import text_string_to_metric_families
+
+# Queries per request are averages; timing-dependent cache hits move them by a hair
+QUERY_SLACK = 0.05
+
+@dataclass
+class Operation:
+    """One kind of request: which route it hits and how to build it"""
+    name: str
+    method: str
+    route: str  # Route template, as labelled in the service's metrics
+    build: Callable[[Any, int], dict]  # (context, i) -> httpx request arguments
+    expect: Tuple[int, ...] = (200,)
+    # Optional async (context, client, requests) hook that sets up what build needs
+    prepare: Optional[Callable[[Any, httpx.AsyncClient, int], Awaitable[None]]] = None
+    # Weight in the mixed phase; 0 keeps the operation out of it
+    mix_weight: int = 0
+
+@dataclass
+class PhaseResult:
+    latencies: List[float] = field(default_factory=list)
+    errors: int = 0
+    elapsed: float = 0.0
+    queries: Optional[float] = None
+    statuses: Dict[int, int] = field(default_factory=dict)
+
+    def summary(self) -> dict:
+        ordered = sorted(self.latencies)
+        return {
+            "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+            "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+            "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+            "rps": round(len(ordered) / self.elapsed, 1) if self.elapsed else 0.0,
+            "queries": None if self.queries is None else round(self.queries, 2),
+            "errors": self.errors,
+        }
+
+def percentile(ordered: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+async def query_counts(client: httpx.AsyncClient) -> Dict[Tuple[str, str], Tuple[float, float]]:
+    """(method, route) -> (queries, requests) so far, from the service's /metrics"""
+    response = await client.get("/metrics")
+    response.raise_for_status()
+    counts: Dict[Tuple[str, str], List[float]] = {}
+    for family in text_string_to_metric_families(response.text):
+        if family.name != "http_request_db_queries":
+            continue
+        for sample in family.samples:
+            key = (sample.labels.get("method"), sample.labels.get("route"))
+            if sample.name.endswith("_sum"):
+                counts.setdefault(key, [0.0, 0.0])[0] = sample.value
+            elif sample.name.endswith("_count"):
+                counts.setdefault(key, [0.0, 0.0])[1] = sample.value
+    return {key: (value[0], value[1]) for key, value in counts.items()}
+
+def _queries_per_request(before: dict, after: dict, keys) -> Optional[float]:
+    queries = requests = 0.0
+    for key in keys:
+        queries_before, requests_before = before.get(key, (0.0, 0.0))
+        queries_after, requests_after = after.get(key, (0.0, 0.0))
+        queries += queries_after - queries_before
+        requests += requests_after - requests_before
+    return queries / requests if requests else None
+
+async def _run_phase(client, context, pick: Callable[[int], Operation], requests: int, concurrency: int) -> PhaseResult:
+    result = PhaseResult()
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index
+        while next_index < requests:
+            i = next_index
+            next_index += 1
+            operation = pick(i)
+            started = time.perf_counter()
+            try:
+                response = await client.request(operation.method, **operation.build(context, i))
+            except httpx.HTTPError:
+                result.errors += 1
+                continue
+            result.latencies.append(time.perf_counter() - started)
+            result.statuses[response.status_code] = result.statuses.get(response.status_code, 0) + 1
+            if response.status_code not in operation.expect:
+                result.errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(1, min(concurrency, requests)))))
+    result.elapsed = time.perf_counter() - started
+    return result
+
+async def run(
+    client: httpx.AsyncClient,
+    context,
+    operations: List[Operation],
+    requests: int,
+    concurrency: int,
+    mixed_requests: int = 0,
+    seed: int = 42,
+    report: Callable[[str, dict, PhaseResult], None] = lambda name, summary, result: None,
+) -> Dict[str, dict]:
+    """Run every operation in turn, then the weighted mix; returns summaries by name"""
+    summaries = {}
+    for operation in operations:
+        if operation.prepare:
+            await operation.prepare(context, client, requests)
+        before = await query_counts(client)
+        result = await _run_phase(client, context, lambda i: operation, requests, concurrency)
+        after = await query_counts(client)
+        result.queries = _queries_per_request(before, after, [(operation.method, operation.route)])
+        summaries[operation.name] = result.summary()
+        report(operation.name, summaries[operation.name], result)
+
+    mix = [operation for operation in operations if operation.mix_weight]
+    if mixed_requests and mix:
+        rng = random.Random(seed)
+        picks = rng.choices(mix, weights=[operation.mix_weight for operation in mix], k=mixed_requests)
+        before = await query_counts(client)
+        result = await _run_phase(client, context, picks.__getitem__, mixed_requests, concurrency)
+        after = await query_counts(client)
+        result.queries = _queries_per_request(before, after, {(op.method, op.route) for op in mix})
+        summaries["mixed"] = result.summary()
+        report("mixed", summaries["mixed"], result)
+    return summaries
+
+# Baselines
+def save_baseline(path: str, settings: dict, summaries: Dict[str, dict]) -> None:
+    with open(path, "w") as f:
+        json.dump({"settings": settings, "results": summaries}, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+def compare(baseline: dict, settings: dict, summaries: Dict[str, dict], tolerance: float, queries_only: bool = False) -> List[str]:
+    """Regressions of this run against a baseline, as readable lines
+
+    Queries per request must not grow beyond QUERY_SLACK; p95 latency may grow and
+    throughput may drop by the tolerance (a fraction) before they count.
+    """
+    if baseline["settings"] != settings:
+        return [f"settings differ from the baseline's: {baseline['settings']} != {settings}"]
+
+    regressions = []
+    for name, old in baseline["results"].items():
+        new = summaries.get(name)
+        if new is None:
+            regressions.append(f"{name}: missing from this run")
+            continue
+        if new["errors"] > old["errors"]:
+            regressions.append(f"{name}: {new['errors']} errors (baseline {old['errors']})")
+        if old["queries"] is not None and (new["queries"] is None or new["queries"] > old["queries"] + QUERY_SLACK):
+            regressions.append(f"{name}: {new['queries']} queries/request (baseline {old['queries']})")
+        if queries_only:
+            continue
+        if new["p95_ms"] > old["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {new['p95_ms']:.1f} ms (baseline {old['p95_ms']:.1f} ms)")
+        if new["rps"] < old["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: {new['rps']:.0f} req/s (baseline {old['rps']:.0f} req/s)")
+    return regressions
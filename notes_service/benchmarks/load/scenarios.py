@@ -0,0 +1,283 @@
+"""
+The requests each service is driven with: every route of
+notes_service/app/routes.py and auth_service/app/auth.py, with the data they
+need prepared outside the measured phase.
+"""
+import os
+import struct
+import uuid
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+import httpx
+from jose import jwt
+
+from .runner import Operation
+from .seed import BENCH_EMAIL_DOMAIN, BENCH_PASSWORD, WORDS, AuthUser, NotesUser, issue_refresh_tokens
+
+API = "/api/v1"
+
+def bearer(user_id: int) -> dict:
+    """Authorization header with an access token for a user, signed like the auth service does"""
+    token = jwt.encode(
+        {"sub": str(user_id), "exp": datetime.utcnow() + timedelta(hours=2)},
+        os.environ["JWT_SECRET_KEY"],
+        algorithm=os.getenv("JWT_ALGORITHM", "HS256"),
+    )
+    return {"Authorization": f"Bearer {token}"}
+
+# Notes service
+@dataclass
+class NotesContext:
+    users: List[NotesUser]
+    run_id: str = field(default_factory=lambda: uuid.uuid4().hex[:8])
+    headers: List[dict] = field(default_factory=list)
+    # Per-user state set up by prepare hooks
+    cursors: Dict[int, str] = field(default_factory=dict)
+    etags: Dict[int, str] = field(default_factory=dict)
+    sync_tokens: Dict[int, str] = field(default_factory=dict)
+    import_ids: Dict[int, str] = field(default_factory=dict)
+    # (user index, id) of objects created for the delete phases
+    notes: List[Tuple[int, int]] = field(default_factory=list)
+    categories: List[Tuple[int, int]] = field(default_factory=list)
+    tags: List[Tuple[int, int]] = field(default_factory=list)
+
+    def __post_init__(self):
+        self.headers = [bearer(user.user_id) for user in self.users]
+
+    def user(self, i: int) -> Tuple[int, NotesUser]:
+        index = i % len(self.users)
+        return index, self.users[index]
+
+def _notes_request(context: NotesContext, i: int, path: str, **kwargs) -> dict:
+    index, _ = context.user(i)
+    headers = {**context.headers[index], **kwargs.pop("headers", {})}
+    return {"url": API + path, "headers": headers, **kwargs}
+
+def _pick(values: List[int], i: int) -> int:
+    return values[(i // 7) % len(values)]
+
+def _import_body(i: int, lines: int = 20) -> bytes:
+    return b"".join(
+        (
+            '{"title": "Imported %d-%d", "content": "%s", "category": "Imported", "tags": ["imported", "%s"]}\n'
+            % (i, line, " ".join(WORDS[:10]), WORDS[line % len(WORDS)])
+        ).encode()
+        for line in range(lines)
+    )
+
+async def _for_each_user(context: NotesContext, client: httpx.AsyncClient, path: str, **kwargs) -> Dict[int, httpx.Response]:
+    responses = {}
+    for index in range(len(context.users)):
+        response = await client.get(API + path, headers=context.headers[index], **kwargs)
+        response.raise_for_status()
+        responses[index] = response
+    return responses
+
+async def _prepare_cursors(context, client, requests):
+    responses = await _for_each_user(context, client, "/notes", params={"include_total": "false"})
+    context.cursors = {index: response.json()["next_cursor"] for index, response in responses.items()}
+
+async def _prepare_etags(context, client, requests):
+    responses = await _for_each_user(context, client, "/notes")
+    context.etags = {index: response.headers["etag"] for index, response in responses.items()}
+
+async def _prepare_sync_tokens(context, client, requests):
+    for index in range(len(context.users)):
+        token = None
+        while True:
+            response = await client.get(
+                API + "/sync", headers=context.headers[index], params={"since": token} if token else {}
+            )
+            response.raise_for_status()
+            body = response.json()
+            token = body["next_token"]
+            if not body["has_more"]:
+                break
+        context.sync_tokens[index] = token
+
+async def _prepare_imports(context, client, requests):
+    for index in range(len(context.users)):
+        import_id = f"bench-{context.run_id}-{index}"
+        response = await client.post(
+            API + "/notes/import",
+            headers={**context.headers[index], "Content-Type": "application/x-ndjson"},
+            params={"import_id": import_id},
+            content=_import_body(index, lines=1),
+        )
+        response.raise_for_status()
+        context.import_ids[index] = import_id
+
+def _creating(pool: str, path: str, payload):
+    """prepare hook creating one object per request to be deleted in the phase"""
+    async def prepare(context, client, requests):
+        created = []
+        for i in range(requests):
+            index, user = context.user(i)
+            response = await client.post(API + path, headers=context.headers[index], json=payload(context, user, i))
+            response.raise_for_status()
+            created.append((index, response.json()["id"]))
+        setattr(context, pool, created)
+    return prepare
+
+def _deleting(pool: str, path: str):
+    def build(context, i):
+        index, object_id = getattr(context, pool)[i]
+        return {"url": API + path.format(object_id), "headers": context.headers[index]}
+    return build
+
+def _new_note(context, user, i):
+    return {
+        "title": f"Bench note {context.run_id} {i}",
+        "content": " ".join(WORDS),
+        "category_id": _pick(user.category_ids, i) if user.category_ids else None,
+        "tag_ids": user.tag_ids[:2],
+    }
+
+def _new_category(context, user, i):
+    return {"name": f"Bench {context.run_id} {i}", "description": "Created by the load test"}
+
+def _new_tag(context, user, i):
+    return {"name": f"bench-{context.run_id}-{i}"}
+
+def notes_operations() -> List[Operation]:
+    def note_id(context, i):
+        return _pick(context.user(i)[1].note_ids, i)
+
+    return [
+        # Reads
+        Operation("GET /notes", "GET", f"{API}/notes", mix_weight=30,
+                  build=lambda c, i: _notes_request(c, i, "/notes")),
+        Operation("GET /notes?category_id", "GET", f"{API}/notes", mix_weight=5,
+                  build=lambda c, i: _notes_request(c, i, "/notes", params={"category_id": _pick(c.user(i)[1].category_ids, i)})),
+        Operation("GET /notes?tag_ids", "GET", f"{API}/notes", mix_weight=5,
+                  build=lambda c, i: _notes_request(c, i, "/notes", params={"tag_ids": _pick(c.user(i)[1].tag_ids, i)})),
+        Operation("GET /notes?is_favorite", "GET", f"{API}/notes", mix_weight=5,
+                  build=lambda c, i: _notes_request(c, i, "/notes", params={"is_favorite": "true"})),
+        Operation("GET /notes?search", "GET", f"{API}/notes", mix_weight=5,
+                  build=lambda c, i: _notes_request(c, i, "/notes", params={"search": WORDS[i % len(WORDS)]})),
+        Operation("GET /notes?cursor", "GET", f"{API}/notes", prepare=_prepare_cursors,
+                  build=lambda c, i: _notes_request(c, i, "/notes", params={"cursor": c.cursors[c.user(i)[0]], "include_total": "false"})),
+        Operation("GET /notes (If-None-Match)", "GET", f"{API}/notes", expect=(304,), prepare=_prepare_etags,
+                  build=lambda c, i: _notes_request(c, i, "/notes", headers={"If-None-Match": c.etags[c.user(i)[0]]})),
+        Operation("GET /notes/{note_id}", "GET", f"{API}/notes/{{note_id}}", mix_weight=15,
+                  build=lambda c, i: _notes_request(c, i, f"/notes/{note_id(c, i)}")),
+        Operation("GET /notes/export", "GET", f"{API}/notes/export",
+                  build=lambda c, i: _notes_request(c, i, "/notes/export")),
+        Operation("GET /dashboard", "GET", f"{API}/dashboard", mix_weight=10,
+                  build=lambda c, i: _notes_request(c, i, "/dashboard")),
+        Operation("GET /categories", "GET", f"{API}/categories", mix_weight=5,
+                  build=lambda c, i: _notes_request(c, i, "/categories")),
+        Operation("GET /categories/{category_id}", "GET", f"{API}/categories/{{category_id}}",
+                  build=lambda c, i: _notes_request(c, i, f"/categories/{_pick(c.user(i)[1].category_ids, i)}")),
+        Operation("GET /tags", "GET", f"{API}/tags", mix_weight=5,
+                  build=lambda c, i: _notes_request(c, i, "/tags")),
+        Operation("GET /sync", "GET", f"{API}/sync",
+                  build=lambda c, i: _notes_request(c, i, "/sync")),
+        Operation("GET /sync?since", "GET", f"{API}/sync", prepare=_prepare_sync_tokens,
+                  build=lambda c, i: _notes_request(c, i, "/sync", params={"since": c.sync_tokens[c.user(i)[0]]})),
+        Operation("GET /notes/import/{import_id}", "GET", f"{API}/notes/import/{{import_id}}", prepare=_prepare_imports,
+                  build=lambda c, i: _notes_request(c, i, f"/notes/import/{c.import_ids[c.user(i)[0]]}")),
+        # Writes
+        Operation("POST /notes", "POST", f"{API}/notes", expect=(201,), mix_weight=5,
+                  build=lambda c, i: _notes_request(c, i, "/notes", json=_new_note(c, c.user(i)[1], i))),
+        Operation("PUT /notes/{note_id}", "PUT", f"{API}/notes/{{note_id}}", mix_weight=5,
+                  build=lambda c, i: _notes_request(c, i, f"/notes/{note_id(c, i)}", json={"title": f"Updated {i}", "tag_ids": c.user(i)[1].tag_ids[:3]})),
+        Operation("POST /notes/{note_id}/favorite", "POST", f"{API}/notes/{{note_id}}/favorite", mix_weight=5,
+                  build=lambda c, i: _notes_request(c, i, f"/notes/{note_id(c, i)}/favorite")),
+        Operation("POST /notes/batch", "POST", f"{API}/notes/batch",
+                  build=lambda c, i: _notes_request(c, i, "/notes/batch", json={
+                      "note_ids": c.user(i)[1].note_ids[i % 10:i % 10 + 20], "operation": "set_favorite", "is_favorite": i % 2 == 0,
+                  })),
+        Operation("POST /notes/import", "POST", f"{API}/notes/import",
+                  build=lambda c, i: _notes_request(
+                      c, i, "/notes/import", content=_import_body(i),
+                      headers={"Content-Type": "application/x-ndjson"},
+                  )),
+        Operation("POST /categories", "POST", f"{API}/categories", expect=(201,),
+                  build=lambda c, i: _notes_request(c, i, "/categories", json=_new_category(c, c.user(i)[1], i))),
+        Operation("PUT /categories/{category_id}", "PUT", f"{API}/categories/{{category_id}}",
+                  build=lambda c, i: _notes_request(c, i, f"/categories/{_pick(c.user(i)[1].category_ids, i)}", json={"description": f"Updated {i}"})),
+        Operation("POST /tags", "POST", f"{API}/tags", expect=(201,),
+                  build=lambda c, i: _notes_request(c, i, "/tags", json=_new_tag(c, c.user(i)[1], i))),
+        # Deletes, of objects created for the purpose
+        Operation("DELETE /notes/{note_id}", "DELETE", f"{API}/notes/{{note_id}}", expect=(204,),
+                  prepare=_creating("notes", "/notes", _new_note), build=_deleting("notes", "/notes/{}")),
+        Operation("DELETE /categories/{category_id}", "DELETE", f"{API}/categories/{{category_id}}", expect=(204,),
+                  prepare=_creating("categories", "/categories", _new_category), build=_deleting("categories", "/categories/{}")),
+        Operation("DELETE /tags/{tag_id}", "DELETE", f"{API}/tags/{{tag_id}}", expect=(204,),
+                  prepare=_creating("tags", "/tags", _new_tag), build=_deleting("tags", "/tags/{}")),
+    ]
+
+# Auth service
+def png(width: int = 64, height: int = 64, shade: int = 0) -> bytes:
+    """A small RGB PNG, so image uploads don't need Pillow on the client"""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    rows = b"".join(
+        b"\x00" + b"".join(bytes((x * 4 % 256, y * 4 % 256, shade % 256)) for x in range(width))
+        for y in range(height)
+    )
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(rows)) + chunk(b"IEND", b"")
+
+@dataclass
+class AuthContext:
+    users: List[AuthUser]
+    run_id: str = field(default_factory=lambda: uuid.uuid4().hex[:8])
+    headers: List[dict] = field(default_factory=list)
+    refresh_tokens: List[str] = field(default_factory=list)
+    image_digest: str = ""
+
+    def __post_init__(self):
+        self.headers = [bearer(user.user_id) for user in self.users]
+
+    def user(self, i: int) -> Tuple[int, AuthUser]:
+        index = i % len(self.users)
+        return index, self.users[index]
+
+def _auth_request(context: AuthContext, i: int, path: str, **kwargs) -> dict:
+    index, _ = context.user(i)
+    return {"url": path, "headers": {**context.headers[index], **kwargs.pop("headers", {})}, **kwargs}
+
+async def _prepare_refresh_tokens(context, client, requests):
+    context.refresh_tokens = issue_refresh_tokens([user.user_id for user in context.users], requests)
+
+async def _prepare_image(context, client, requests):
+    response = await client.put(
+        "/profile/image", headers={**context.headers[0], "Content-Type": "image/png"}, content=png(shade=255)
+    )
+    response.raise_for_status()
+    context.image_digest = response.json()["profile_image"].rsplit("/", 1)[-1].split("?")[0]
+
+def auth_operations() -> List[Operation]:
+    return [
+        Operation("GET /dashboard", "GET", "/dashboard", mix_weight=70,
+                  build=lambda c, i: _auth_request(c, i, "/dashboard")),
+        Operation("GET /images/{digest}", "GET", "/images/{digest}", mix_weight=15, prepare=_prepare_image,
+                  build=lambda c, i: {"url": f"/images/{c.image_digest}"}),
+        Operation("POST /login", "POST", "/login", mix_weight=2,
+                  build=lambda c, i: {"url": "/login", "json": {"email": c.user(i)[1].email, "password": BENCH_PASSWORD}}),
+        Operation("POST /signup", "POST", "/signup",
+                  build=lambda c, i: {"url": "/signup", "json": {
+                      "first_name": "Bench", "last_name": "Signup", "phone": "555-0000000",
+                      "email": f"signup-{c.run_id}-{i}@{BENCH_EMAIL_DOMAIN}",
+                      "password": BENCH_PASSWORD, "confirm_password": BENCH_PASSWORD,
+                  }}),
+        Operation("POST /token/refresh", "POST", "/token/refresh", prepare=_prepare_refresh_tokens,
+                  build=lambda c, i: {"url": "/token/refresh", "json": {"refresh_token": c.refresh_tokens[i]}}),
+        Operation("POST /logout", "POST", "/logout", expect=(204,), prepare=_prepare_refresh_tokens,
+                  build=lambda c, i: {"url": "/logout", "json": {"refresh_token": c.refresh_tokens[i]}}),
+        Operation("PUT /profile", "PUT", "/profile", mix_weight=10,
+                  build=lambda c, i: _auth_request(c, i, "/profile", json={"phone": f"555-{i:07d}"})),
+        Operation("PUT /profile/image", "PUT", "/profile/image", mix_weight=3,
+                  build=lambda c, i: _auth_request(c, i, "/profile/image", content=png(shade=i), headers={"Content-Type": "image/png"})),
+        Operation("DELETE /profile/image", "DELETE", "/profile/image", expect=(204,),
+                  build=lambda c, i: _auth_request(c, i, "/profile/image")),
+        # Last: it revokes every session of the benchmark users
+        Operation("POST /logout/all", "POST", "/logout/all", expect=(204,),
+                  build=lambda c, i: _auth_request(c, i, "/logout/all")),
+    ]
@@ -0,0 +1,169 @@
+"""
+Synthetic data for the load tests.
+
+Seeding writes straight to the service's database with its own models, after
+bringing the schema to head with the service's migrations. Benchmark rows are
+recognisable (notes users from NOTES_USER_ID_BASE up, auth users with an
+@bench.example address) and are removed before each run, so re-seeding a
+shared development database gives the same data set every time.
+"""
+import asyncio
+import os
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import delete, insert, select
+
+NOTES_USER_ID_BASE = 1_000_000
+BENCH_EMAIL_DOMAIN = "bench.example"
+BENCH_PASSWORD = "benchmark-password"
+
+WORDS = (
+    "alpha bravo charlie delta echo foxtrot golf hotel india juliet kilo lima "
+    "mike november oscar papa quebec romeo sierra tango uniform victor whiskey"
+).split()
+
+@dataclass
+class Scale:
+    users: int = 20
+    categories_per_user: int = 5
+    tags_per_user: int = 20
+    notes_per_user: int = 200
+    tags_per_note: int = 3
+    content_bytes: int = 500
+
+@dataclass
+class NotesUser:
+    user_id: int
+    category_ids: List[int] = field(default_factory=list)
+    tag_ids: List[int] = field(default_factory=list)
+    note_ids: List[int] = field(default_factory=list)
+
+@dataclass
+class AuthUser:
+    user_id: int
+    email: str
+
+def migrate(service_dir: str) -> None:
+    """alembic upgrade head for the service whose app package is imported"""
+    command.upgrade(Config(os.path.join(service_dir, "alembic.ini")), "head")
+
+def _content(rng: random.Random, size: int) -> str:
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)[:size]
+
+def seed_notes(scale: Scale, seed: int = 42) -> Dict[int, NotesUser]:
+    """Replace the benchmark users' categories, tags and notes; returns them by user id"""
+    from app import crud, models, search
+    from app.database import SessionLocal
+
+    rng = random.Random(seed)
+    user_ids = [NOTES_USER_ID_BASE + i for i in range(scale.users)]
+    now = datetime.utcnow()
+    users = {user_id: NotesUser(user_id) for user_id in user_ids}
+
+    db = SessionLocal()
+    try:
+        owned = models.Note.user_id.in_(user_ids)
+        note_ids = select(models.Note.id).where(owned)
+        db.execute(delete(models.NoteTag).where(models.NoteTag.note_id.in_(note_ids)))
+        db.execute(delete(models.NoteSearchTerm).where(models.NoteSearchTerm.user_id.in_(user_ids)))
+        db.execute(delete(models.Note).where(owned))
+        for model in (models.Tag, models.Category, models.Tombstone, models.UserCollectionVersion, models.UserNoteStats):
+            db.execute(delete(model).where(model.user_id.in_(user_ids)))
+        db.commit()
+
+        for user in users.values():
+            user.category_ids = db.scalars(
+                insert(models.Category).returning(models.Category.id, sort_by_parameter_order=True),
+                [{"name": f"Category {i}", "user_id": user.user_id, "color": "#667eea"}
+                 for i in range(scale.categories_per_user)],
+            ).all()
+            user.tag_ids = db.scalars(
+                insert(models.Tag).returning(models.Tag.id, sort_by_parameter_order=True),
+                [{"name": f"tag-{i}", "user_id": user.user_id} for i in range(scale.tags_per_user)],
+            ).all()
+
+            notes = []
+            for i in range(scale.notes_per_user):
+                updated_at = now - timedelta(seconds=rng.randrange(90 * 24 * 3600))
+                notes.append({
+                    "title": f"{rng.choice(WORDS).title()} note {i}",
+                    "content": _content(rng, scale.content_bytes),
+                    "is_favorite": rng.random() < 0.2,
+                    "user_id": user.user_id,
+                    "category_id": rng.choice(user.category_ids) if user.category_ids and rng.random() < 0.7 else None,
+                    "created_at": updated_at - timedelta(days=rng.randrange(30)),
+                    "updated_at": updated_at,
+                })
+            user.note_ids = db.scalars(
+                insert(models.Note).returning(models.Note.id, sort_by_parameter_order=True), notes
+            ).all() if notes else []
+
+            links = [
+                {"note_id": note_id, "tag_id": tag_id}
+                for note_id in user.note_ids
+                for tag_id in rng.sample(user.tag_ids, min(scale.tags_per_note, len(user.tag_ids)))
+            ]
+            if links:
+                db.execute(insert(models.NoteTag), links)
+            db.commit()
+
+        for user_id in user_ids:
+            search.rebuild_index(db, user_id)
+            db.commit()
+            crud.refresh_user_stats(db, user_id)
+    finally:
+        db.close()
+    return users
+
+def seed_auth(scale: Scale) -> List[AuthUser]:
+    """Replace the benchmark users; every one has the password BENCH_PASSWORD"""
+    from app import hashing, models
+    from app.database import SessionLocal
+
+    # One bcrypt hash shared by every user keeps seeding fast at any scale
+    hashed = asyncio.run(hashing.hash_password(BENCH_PASSWORD))
+    emails = [f"user{i}@{BENCH_EMAIL_DOMAIN}" for i in range(scale.users)]
+
+    db = SessionLocal()
+    try:
+        bench_users = select(models.User.id).where(models.User.email.like(f"%@{BENCH_EMAIL_DOMAIN}"))
+        db.execute(delete(models.RefreshToken).where(models.RefreshToken.user_id.in_(bench_users)))
+        db.execute(delete(models.User).where(models.User.email.like(f"%@{BENCH_EMAIL_DOMAIN}")))
+        user_ids = db.scalars(
+            insert(models.User).returning(models.User.id, sort_by_parameter_order=True),
+            [{
+                "first_name": "Bench",
+                "last_name": f"User {i}",
+                "email": email,
+                "phone": f"555-{i:07d}",
+                "hashed_password": hashed,
+            } for i, email in enumerate(emails)],
+        ).all()
+        db.commit()
+    finally:
+        db.close()
+    return [AuthUser(user_id, email) for user_id, email in zip(user_ids, emails)]
+
+def issue_refresh_tokens(user_ids: List[int], count: int) -> List[str]:
+    """count refresh tokens, each starting its own session, spread over the users"""
+    from app import tokens
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        issued = [tokens.issue(db, user_ids[i % len(user_ids)]) for i in range(count)]
+        db.commit()
+    finally:
+        db.close()
+    return issued
@@ -0,0 +1,140 @@
+"""Baseline: the schema the service used to create on startup
+
+Databases created by the old ``create_all`` call already have some or all of
+these tables, and whichever indexes existed when each table was first
+created. Every table and index is therefore only created when missing, and
+the one-off fixups main.py ran on every startup (updated_at backfill,
+de-duplicating note_tags before its unique index) run here once.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.search import SEARCH_CONFIG
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def _create_table(name: str, *columns) -> None:
+    if not sa.inspect(op.get_bind()).has_table(name):
+        op.create_table(name, *columns)
+
+def _create_index(name: str, table: str, columns, unique: bool = False) -> None:
+    if name not in {index["name"] for index in sa.inspect(op.get_bind()).get_indexes(table)}:
+        op.create_index(name, table, columns, unique=unique)
+
+def upgrade() -> None:
+    _create_table(
+        "categories",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(100), nullable=False),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("color", sa.String(7), nullable=True),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    _create_index("ix_categories_id", "categories", ["id"])
+    _create_index("ix_categories_user_id", "categories", ["user_id"])
+
+    _create_table(
+        "notes",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("title", sa.String(255), nullable=False),
+        sa.Column("content", sa.Text(), nullable=True),
+        sa.Column("is_favorite", sa.Boolean(), nullable=True),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("category_id", sa.Integer(), sa.ForeignKey("categories.id"), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    # Notes created before updated_at had a server default sort and paginate by it too
+    op.execute("UPDATE notes SET updated_at = created_at WHERE updated_at IS NULL")
+    _create_index("ix_notes_id", "notes", ["id"])
+    _create_index("ix_notes_user_id", "notes", ["user_id"])
+    _create_index("ix_notes_user_updated_id", "notes", ["user_id", sa.text("updated_at DESC"), "id"])
+
+    _create_table(
+        "tags",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(50), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    _create_index("ix_tags_id", "tags", ["id"])
+    _create_index("ix_tags_user_id", "tags", ["user_id"])
+
+    _create_table(
+        "note_tags",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("note_id", sa.Integer(), sa.ForeignKey("notes.id"), nullable=False),
+        sa.Column("tag_id", sa.Integer(), sa.ForeignKey("tags.id"), nullable=False),
+    )
+    _create_index("ix_note_tags_id", "note_tags", ["id"])
+    if "uq_note_tags_note_tag" not in {index["name"] for index in sa.inspect(op.get_bind()).get_indexes("note_tags")}:
+        # Tables created before the unique index may hold duplicate links
+        op.execute(
+            "DELETE FROM note_tags WHERE id NOT IN "
+            "(SELECT MIN(id) FROM note_tags GROUP BY note_id, tag_id)"
+        )
+        op.create_index("uq_note_tags_note_tag", "note_tags", ["note_id", "tag_id"], unique=True)
+
+    _create_table(
+        "note_search_terms",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("note_id", sa.Integer(), sa.ForeignKey("notes.id"), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("term", sa.String(64), nullable=False),
+        sa.Column("positions", sa.Text(), nullable=False),
+        sa.Column("title_hits", sa.Integer(), nullable=False),
+    )
+    _create_index("ix_note_search_terms_id", "note_search_terms", ["id"])
+    _create_index("ix_note_search_terms_note_id", "note_search_terms", ["note_id"])
+    _create_index("ix_note_search_terms_user_term", "note_search_terms", ["user_id", "term"])
+
+    _create_table(
+        "tombstones",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("kind", sa.String(16), nullable=False),
+        sa.Column("object_id", sa.Integer(), nullable=False),
+        sa.Column("deleted_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+    )
+    _create_index("ix_tombstones_user_deleted", "tombstones", ["user_id", "deleted_at"])
+
+    _create_table(
+        "user_collection_versions",
+        sa.Column("user_id", sa.Integer(), primary_key=True),
+        sa.Column("version", sa.BigInteger(), nullable=False),
+    )
+
+    _create_table(
+        "user_note_stats",
+        sa.Column("user_id", sa.Integer(), primary_key=True),
+        sa.Column("total_notes", sa.Integer(), nullable=False),
+        sa.Column("favorite_notes", sa.Integer(), nullable=False),
+        sa.Column("categories_count", sa.Integer(), nullable=False),
+        sa.Column("tags_count", sa.Integer(), nullable=False),
+    )
+
+    if op.get_bind().dialect.name == "postgresql":
+        # Full-text search document, maintained by PostgreSQL itself
+        op.execute(
+            "ALTER TABLE notes ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+            f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+            f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(content, '')), 'B')"
+            ") STORED"
+        )
+        op.execute("CREATE INDEX IF NOT EXISTS ix_notes_search_vector ON notes USING gin (search_vector)")
+
+def downgrade() -> None:
+    for table in (
+        "user_note_stats", "user_collection_versions", "tombstones",
+        "note_search_terms", "note_tags", "tags", "notes", "categories",
+    ):
+        op.drop_table(table)
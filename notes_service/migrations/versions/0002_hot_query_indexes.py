@@ -0,0 +1,45 @@
+"""Indexes for the hot list, filter and lookup queries
+
+- notes (user_id, category_id, updated_at DESC, id): the category filter of
+  GET /notes in listing order, and the category detach on delete
+- note_tags (tag_id, note_id): the tag filter of GET /notes and tag deletion;
+  the unique (note_id, tag_id) index only serves lookups by note
+- tags / categories (user_id, name): tag de-duplication on create and the
+  importer's name resolution
+
+On PostgreSQL the indexes are built CONCURRENTLY so that writes to the live
+tables aren't blocked while a deploy migrates.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_notes_user_category_updated", "notes", ["user_id", "category_id", sa.text("updated_at DESC"), "id"]),
+    ("ix_note_tags_tag_note", "note_tags", ["tag_id", "note_id"]),
+    ("ix_tags_user_name", "tags", ["user_id", "name"]),
+    ("ix_categories_user_name", "categories", ["user_id", "name"]),
+]
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        # CREATE INDEX CONCURRENTLY can't run inside a transaction
+        with op.get_context().autocommit_block():
+            for name, table, columns in INDEXES:
+                op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+        return
+
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, if_not_exists=True)
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
@@ -0,0 +1,41 @@
+"""Give notes.updated_at a database default and make it NOT NULL
+
+Tables created by the old ``create_all`` call have ``notes.updated_at``
+without a default, so notes inserted after 0001's backfill still got NULL
+there: listing order, keyset cursors, sync and note ETags all depend on it.
+Backfill again, then add the default and the constraint. SQLite does that by
+rebuilding the table, whose reflected indexes lose their DESC ordering, so
+the listing indexes are recreated afterwards.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+# Indexes on notes with a sort order, as 0001 and 0002 create them
+LISTING_INDEXES = [
+    ("ix_notes_user_updated_id", ["user_id", sa.text("updated_at DESC"), "id"]),
+    ("ix_notes_user_category_updated", ["user_id", "category_id", sa.text("updated_at DESC"), "id"]),
+]
+
+def _alter_updated_at(**changes) -> None:
+    with op.batch_alter_table("notes") as batch:
+        batch.alter_column("updated_at", existing_type=sa.DateTime(timezone=True), **changes)
+    if op.get_bind().dialect.name != "postgresql":
+        for name, columns in LISTING_INDEXES:
+            op.drop_index(name, table_name="notes", if_exists=True)
+            op.create_index(name, "notes", columns)
+
+def upgrade() -> None:
+    op.execute("UPDATE notes SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP) WHERE updated_at IS NULL")
+    _alter_updated_at(server_default=sa.func.now(), nullable=False)
+
+def downgrade() -> None:
+    _alter_updated_at(server_default=None, nullable=True)
@@ -0,0 +1,39 @@
+"""Seed user_note_stats with exact counts for every user
+
+The write paths now create a user's counter row by upsert in their own
+transaction and apply deltas whether or not DASHBOARD_COUNTERS is on, so a
+row must start out exact for every user who already has data. Rows left by
+earlier versions may be stale (they were seeded lazily on reads and skipped
+deltas while the flag was off), so all of them are rebuilt.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.execute("DELETE FROM user_note_stats")
+    op.execute("""
+        INSERT INTO user_note_stats (user_id, total_notes, favorite_notes, categories_count, tags_count)
+        SELECT user_id, SUM(total_notes), SUM(favorite_notes), SUM(categories_count), SUM(tags_count)
+        FROM (
+            SELECT user_id, 1 AS total_notes, CASE WHEN is_favorite THEN 1 ELSE 0 END AS favorite_notes,
+                   0 AS categories_count, 0 AS tags_count
+            FROM notes
+            UNION ALL
+            SELECT user_id, 0, 0, 1, 0 FROM categories
+            UNION ALL
+            SELECT user_id, 0, 0, 0, 1 FROM tags
+        ) AS counts
+        GROUP BY user_id
+    """)
+
+def downgrade() -> None:
+    # The rows are only a cache of the source tables
+    pass
@@ -0,0 +1,23 @@
+"""Add a row version to notes for their ETags
+
+Single-note ETags were derived from updated_at, which SQLite stores in whole
+seconds, so two edits within a second shared an ETag. notes.version starts at
+1 and every UPDATE of the row increments it.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column("notes", sa.Column("version", sa.Integer(), nullable=False, server_default=sa.text("1")))
+
+def downgrade() -> None:
+    op.drop_column("notes", "version")
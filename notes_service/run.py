@@ -4,6 +4,8 @@ Startup script for the Notes Service
 """
 import uvicorn
 import os
+from alembic import command
+from alembic.config import Config
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -11,6 +13,9 @@ load_dotenv()
 if __name__ == "__main__":
     host = os.getenv("HOST", "127.0.0.1")
     port = int(os.getenv("PORT", 8003))
+
+    # Bring the schema up to date before serving
+    command.upgrade(Config(os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")), "head")
     
     uvicorn.run(
         "app.main:app",
@@ -0,0 +1,68 @@
+"""
+Materialized dashboard counters (user_note_stats) against the source tables.
+
+Runs on a temporary SQLite database brought to head with the migrations;
+each test writes data for its own user id.
+"""
+import os
+import tempfile
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mktemp(suffix='.db')}")
+
+import pytest
+from alembic import command
+from alembic.config import Config
+
+from app import crud, models, schemas
+from app.database import SessionLocal
+
+@pytest.fixture(scope="module")
+def db():
+    command.upgrade(Config(os.path.join(os.path.dirname(__file__), "alembic.ini")), "head")
+    session = SessionLocal()
+    yield session
+    session.close()
+
+def _stored(db, user_id):
+    db.expire_all()
+    row = db.get(models.UserNoteStats, user_id)
+    return None if row is None else {field: getattr(row, field) for field in (
+        "total_notes", "favorite_notes", "categories_count", "tags_count"
+    )}
+
+def _write(db, user_id):
+    category = crud.create_category(db, schemas.CategoryCreate(name="Work"), user_id)
+    crud.create_tag(db, schemas.TagCreate(name="todo"), user_id)
+    note = crud.create_note(db, schemas.NoteCreate(title="a", category_id=category.id), user_id)
+    crud.create_note(db, schemas.NoteCreate(title="b", is_favorite=True), user_id)
+    crud.toggle_favorite(db, note.id, user_id)
+    return note
+
+@pytest.mark.parametrize("enabled", [False, True])
+def test_writes_keep_the_row_exact_whatever_the_flag(db, monkeypatch, enabled):
+    user_id = 6001 + enabled
+    monkeypatch.setattr(crud, "DASHBOARD_COUNTERS", enabled)
+    note = _write(db, user_id)
+    crud.delete_note(db, note.id, user_id)
+    assert _stored(db, user_id) == crud._aggregate_dashboard_counts(db, user_id) == {
+        "total_notes": 1, "favorite_notes": 1, "categories_count": 1, "tags_count": 1,
+    }
+
+def test_reads_use_the_row_without_writing(db, monkeypatch):
+    monkeypatch.setattr(crud, "DASHBOARD_COUNTERS", True)
+    _write(db, 6003)
+    db.query(models.UserNoteStats).filter(models.UserNoteStats.user_id == 6003).update({"tags_count": 42})
+    db.commit()
+    assert crud.get_dashboard_stats(db, 6003)["tags_count"] == 42
+
+    # A user without data has no row, and reading does not create one
+    assert crud.get_dashboard_stats(db, 6004)["total_notes"] == 0
+    assert _stored(db, 6004) is None
+    assert not db.new and not db.dirty
+
+def test_refresh_repairs_the_row(db):
+    _write(db, 6005)
+    db.query(models.UserNoteStats).filter(models.UserNoteStats.user_id == 6005).update({"total_notes": 99})
+    db.commit()
+    assert crud.refresh_user_stats(db, 6005)["total_notes"] == 2
+    assert _stored(db, 6005)["total_notes"] == 2
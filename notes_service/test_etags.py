@@ -0,0 +1,97 @@
+"""
+Conditional GETs (ETags and If-None-Match) on note lists and single notes,
+and the list totals.
+
+Runs the API on a temporary SQLite database brought to head with the
+migrations, authenticated with tokens signed like the auth service's.
+"""
+import os
+import tempfile
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mktemp(suffix='.db')}")
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from fastapi.testclient import TestClient
+from jose import jwt
+
+from app import auth
+
+USER_ID = 8001
+
+@pytest.fixture(scope="module")
+def client():
+    command.upgrade(Config(os.path.join(os.path.dirname(__file__), "alembic.ini")), "head")
+    # Importing the app touches the schema, so it must exist first
+    from app.main import app
+    token = jwt.encode({"sub": str(USER_ID)}, auth.SECRET_KEY, algorithm=auth.ALGORITHM)
+    client = TestClient(app)
+    client.headers["Authorization"] = f"Bearer {token}"
+    return client
+
+@pytest.fixture
+def note_id(client):
+    response = client.post("/api/v1/notes", json={"title": "ETag", "content": "v1"})
+    assert response.status_code == 201
+    return response.json()["id"]
+
+def _get(client, path, etag=None):
+    return client.get(path, headers={"If-None-Match": etag} if etag else {})
+
+@pytest.mark.parametrize("path", ["/api/v1/notes", "/api/v1/categories", "/api/v1/tags"])
+def test_unchanged_list_answers_304(client, note_id, path):
+    etag = _get(client, path).headers["ETag"]
+    response = _get(client, path, etag)
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert not response.content
+
+def test_list_etag_changes_on_write_and_with_the_query(client, note_id):
+    etag = _get(client, "/api/v1/notes").headers["ETag"]
+    assert _get(client, "/api/v1/notes?is_favorite=true", etag).status_code == 200
+
+    client.put(f"/api/v1/notes/{note_id}", json={"content": "v2"})
+    response = _get(client, "/api/v1/notes", etag)
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+def test_unchanged_note_answers_304(client, note_id):
+    path = f"/api/v1/notes/{note_id}"
+    etag = _get(client, path).headers["ETag"]
+    assert _get(client, path, etag).status_code == 304
+    # Weak comparison, and any of several candidates
+    assert _get(client, path, f'"other", {etag.removeprefix("W/")}').status_code == 304
+    assert _get(client, path, "*").status_code == 304
+
+def test_edits_in_the_same_second_change_the_note_etag(client, note_id):
+    path = f"/api/v1/notes/{note_id}"
+    etags = []
+    for content in ("v2", "v3"):
+        client.put(path, json={"content": content})
+        response = _get(client, path)
+        etags.append(response.headers["ETag"])
+    assert etags[0] != etags[1]
+
+    response = _get(client, path, etags[0])
+    assert response.status_code == 200
+    assert response.json()["content"] == "v3"
+
+def test_writes_to_other_notes_keep_the_note_etag(client, note_id):
+    path = f"/api/v1/notes/{note_id}"
+    etag = _get(client, path).headers["ETag"]
+    client.post("/api/v1/notes", json={"title": "Other"})
+    assert _get(client, path, etag).status_code == 304
+
+def test_missing_note_is_404_whatever_the_etag(client, note_id):
+    etag = _get(client, f"/api/v1/notes/{note_id}").headers["ETag"]
+    client.delete(f"/api/v1/notes/{note_id}")
+    assert _get(client, f"/api/v1/notes/{note_id}", etag).status_code == 404
+    assert _get(client, "/api/v1/notes/999999", "*").status_code == 404
+
+def test_exact_totals_are_not_flagged_approximate(client, note_id):
+    # SQLite has no planner estimate, so the total is counted exactly
+    for _ in range(2):
+        body = client.get("/api/v1/notes?approximate_total=true").json()
+        assert body["total"] >= 1
+        assert body["total_is_approximate"] is False
@@ -0,0 +1,78 @@
+"""
+Upgrading a database created by the old startup ``create_all`` call.
+
+Runs against its own temporary SQLite file: the old tables are created as
+that call made them, then ``alembic upgrade head`` must leave a schema the
+service can write to and list from.
+"""
+import os
+import tempfile
+
+# The app's own engine is not used here, but needs a database to import
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mktemp(suffix='.db')}")
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app import crud, models, schemas
+
+USER_ID = 9001
+
+# notes and categories as create_all made them, before updated_at had a default
+OLD_TABLES = [
+    """CREATE TABLE categories (
+        id INTEGER NOT NULL PRIMARY KEY,
+        name VARCHAR(100) NOT NULL,
+        description TEXT,
+        color VARCHAR(7),
+        user_id INTEGER NOT NULL,
+        created_at DATETIME DEFAULT (CURRENT_TIMESTAMP),
+        updated_at DATETIME
+    )""",
+    """CREATE TABLE notes (
+        id INTEGER NOT NULL PRIMARY KEY,
+        title VARCHAR(255) NOT NULL,
+        content TEXT,
+        is_favorite BOOLEAN,
+        user_id INTEGER NOT NULL,
+        category_id INTEGER REFERENCES categories (id),
+        created_at DATETIME DEFAULT (CURRENT_TIMESTAMP),
+        updated_at DATETIME
+    )""",
+    "CREATE INDEX ix_notes_user_id ON notes (user_id)",
+    f"INSERT INTO notes (title, content, user_id) VALUES ('Old note', 'body', {USER_ID})",
+]
+
+def test_upgrade_from_create_all_schema():
+    url = f"sqlite:///{tempfile.mktemp(suffix='.db')}"
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        for statement in OLD_TABLES:
+            conn.exec_driver_sql(statement)
+    config = Config(os.path.join(os.path.dirname(__file__), "alembic.ini"))
+    config.attributes["database_url"] = url
+    command.upgrade(config, "head")
+
+    db = Session(engine)
+    try:
+        # 0004 seeds the dashboard counters from the existing rows
+        assert db.get(models.UserNoteStats, USER_ID).total_notes == 1
+
+        for i in range(3):
+            note = crud.create_note(db, schemas.NoteCreate(title=f"New note {i}", content="body"), USER_ID)
+            assert note.updated_at is not None
+
+        titles, cursor = [], None
+        while True:
+            notes, _, _, cursor = crud.get_notes(db, USER_ID, schemas.NoteFilter(limit=2, cursor=cursor, include_total=False))
+            titles.extend(note.title for note in notes)
+            if not cursor:
+                break
+        assert sorted(titles) == ["New note 0", "New note 1", "New note 2", "Old note"]
+        db.expire_all()
+        assert db.get(models.UserNoteStats, USER_ID).total_notes == 4
+    finally:
+        db.close()
+        engine.dispose()
@@ -0,0 +1,166 @@
+"""
+Query plan checks for the hot paths.
+
+Builds a database with ``alembic upgrade head``, records the SQL the hot crud
+calls issue, and EXPLAINs each statement: none may scan a whole table. Runs
+against a temporary SQLite file by default; set TEST_DATABASE_URL to a
+PostgreSQL database to check its plans instead (with sequential scans
+disabled, so any scan that remains has no usable index).
+"""
+import os
+import re
+import tempfile
+
+import pytest
+
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL") or f"sqlite:///{tempfile.mktemp(suffix='.db')}"
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import event
+
+from app import crud, models, schemas, sync
+from app.database import SessionLocal, engine
+from app.importer import NoteImport
+
+USERS = 5
+NOTES_PER_USER = 40
+TABLES = {
+    "notes", "note_tags", "tags", "categories", "tombstones",
+    "note_search_terms", "user_collection_versions", "user_note_stats",
+}
+
+@pytest.fixture(scope="module")
+def db():
+    command.upgrade(Config(os.path.join(os.path.dirname(__file__), "alembic.ini")), "head")
+    session = SessionLocal()
+    for user_id in range(1, USERS + 1):
+        category = crud.create_category(session, schemas.CategoryCreate(name="Work"), user_id)
+        tag = crud.create_tag(session, schemas.TagCreate(name="todo"), user_id)
+        for i in range(NOTES_PER_USER):
+            crud.create_note(session, schemas.NoteCreate(
+                title=f"Note {i}",
+                content="body",
+                is_favorite=i % 3 == 0,
+                category_id=category.id if i % 2 else None,
+                tag_ids=[tag.id] if i % 4 == 0 else [],
+            ), user_id)
+    yield session
+    session.close()
+
+@pytest.fixture
+def captured():
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(engine, "before_cursor_execute", record)
+
+def _full_scans(statement, parameters):
+    """Tables of interest that the plan for a statement reads in full"""
+    with engine.connect() as conn:
+        if conn.dialect.name == "postgresql":
+            conn.exec_driver_sql("SET enable_seqscan = off")
+            plan = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()
+            nodes, scans = [plan[0]["Plan"]], []
+            while nodes:
+                node = nodes.pop()
+                if node["Node Type"] == "Seq Scan" and node["Relation Name"] in TABLES:
+                    scans.append(node["Relation Name"])
+                nodes.extend(node.get("Plans", []))
+            return scans
+
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+        scans = []
+        for row in rows:
+            match = re.match(r"SCAN (\w+)", row[-1])
+            if match and match.group(1) in TABLES:
+                scans.append(row[-1])
+        return scans
+
+def _sorts(statement, parameters):
+    """Sort steps in the plan for a statement, where the order doesn't come from an index"""
+    with engine.connect() as conn:
+        if conn.dialect.name == "postgresql":
+            plan = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()
+            nodes, sorts = [plan[0]["Plan"]], []
+            while nodes:
+                node = nodes.pop()
+                if node["Node Type"] in ("Sort", "Incremental Sort"):
+                    sorts.append(node["Sort Key"])
+                nodes.extend(node.get("Plans", []))
+            return sorts
+
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+        return [row[-1] for row in rows if "TEMP B-TREE" in row[-1]]
+
+def _assert_indexed(statements):
+    assert statements
+    for statement, parameters in statements:
+        assert not _full_scans(statement, parameters), statement
+
+def _user_data(db, user_id):
+    category = db.query(models.Category).filter(models.Category.user_id == user_id).first()
+    tag = db.query(models.Tag).filter(models.Tag.user_id == user_id).first()
+    return category, tag
+
+@pytest.mark.parametrize("filters", [
+    {},
+    {"is_favorite": True},
+    {"category_id": "category"},
+    {"tag_ids": "tag"},
+    {"include_total": False, "limit": 5},
+])
+def test_note_listing(db, captured, filters):
+    category, tag = _user_data(db, 1)
+    values = {"category": category.id, "tag": [tag.id]}
+    filters = {key: values.get(value, value) if isinstance(value, str) else value for key, value in filters.items()}
+    _, _, _, cursor = crud.get_notes(db, 1, schemas.NoteFilter(**filters))
+    if cursor:
+        crud.get_notes(db, 1, schemas.NoteFilter(**filters, cursor=cursor))
+    _assert_indexed(captured)
+
+def test_note_lookup(db, captured):
+    note = db.query(models.Note).filter(models.Note.user_id == 2).first()
+    db.expunge_all()
+    crud.get_note(db, note.id, 2)
+    crud.get_note_version(db, note.id, 2)
+    crud.get_collection_version(db, 2)
+    _assert_indexed(captured)
+
+def test_lists_and_dashboard(db, captured):
+    crud.get_categories(db, 3)
+    crud.get_tags(db, 3)
+    crud.get_dashboard_stats(db, 3)
+    _assert_indexed(captured)
+
+def test_tag_dedupe_and_import_names(db, captured):
+    crud.create_tag(db, schemas.TagCreate(name="todo"), 4)
+    note_import = NoteImport(4, "plan-check")
+    note_import._resolve_names(db, models.Tag, {}, {"todo"})
+    note_import._resolve_names(db, models.Category, {}, {"Work"})
+    _assert_indexed(captured)
+
+def test_deletes(db, captured):
+    category, tag = _user_data(db, 5)
+    crud.delete_tag(db, tag.id, 5)
+    crud.delete_category(db, category.id, 5)
+    _assert_indexed(captured)
+
+def test_sync(db, captured):
+    # Notes written in the same second tie on updated_at; paging must see each once
+    seen, token = [], None
+    while True:
+        changes = sync.get_changes(db, 1, token, 10)
+        seen.extend(note["id"] for note in changes["notes"])
+        token = changes["next_token"]
+        if not changes["has_more"]:
+            break
+    assert len(seen) == len(set(seen)) == NOTES_PER_USER
+    _assert_indexed(captured)
+    for statement, parameters in captured:
+        assert not _sorts(statement, parameters), statement
@@ -0,0 +1,92 @@
+"""
+Search over the fallback index: query syntax, ranking and paging.
+
+Runs on a temporary SQLite database brought to head with the migrations;
+each test writes notes for its own user id.
+"""
+import os
+import tempfile
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mktemp(suffix='.db')}")
+
+import pytest
+from alembic import command
+from alembic.config import Config
+
+from app import crud, schemas, search
+from app.database import SessionLocal
+
+@pytest.fixture(scope="module")
+def db():
+    command.upgrade(Config(os.path.join(os.path.dirname(__file__), "alembic.ini")), "head")
+    session = SessionLocal()
+    yield session
+    session.close()
+
+def _notes(db, user_id, *notes):
+    """Create (title, content) notes and return their ids"""
+    return [
+        crud.create_note(db, schemas.NoteCreate(title=title, content=content), user_id).id
+        for title, content in notes
+    ]
+
+def _titles(db, user_id, value, **filters):
+    notes, _, _, _ = crud.get_notes(db, user_id, schemas.NoteFilter(search=value, **filters))
+    return [note.title for note in notes]
+
+def test_prefix_matches_the_start_of_words(db):
+    _notes(db, 7001, ("quick", ""), ("quietly", ""), ("aqua", ""), ("q", ""))
+    assert sorted(_titles(db, 7001, "qui*")) == ["quick", "quietly"]
+    assert _titles(db, 7001, "qui") == []
+
+def test_phrase_matches_consecutive_words(db):
+    _notes(db, 7002,
+           ("a", "the brown fox jumps"),
+           ("b", "fox brown"),
+           ("c", "brown lazy fox"),
+           ("d", "brown"),
+           ("e", "fox"))
+    assert _titles(db, 7002, '"brown fox"') == ["a"]
+    # A hyphenated word is a phrase too, and may end in a prefix
+    assert _titles(db, 7002, "brown-fo*") == ["a"]
+    # Unquoted terms only all have to occur
+    assert sorted(_titles(db, 7002, "brown fox")) == ["a", "b", "c"]
+
+def test_phrase_does_not_span_title_and_content(db):
+    _notes(db, 7003, ("notes on brown", "fox sightings"))
+    assert _titles(db, 7003, '"brown fox"') == []
+
+def test_title_matches_rank_above_content_matches(db):
+    # The content-only note is newer and mentions the term more often
+    _notes(db, 7004, ("Budget", "next year"), ("Plans", "budget budget"))
+    assert _titles(db, 7004, "budget") == ["Budget", "Plans"]
+
+def test_pages_cover_every_match_once(db):
+    ids = _notes(db, 7005, *[(f"report {i}", "report " * (i % 5)) for i in range(25)])
+    crud.toggle_favorite(db, ids[0], 7005)
+
+    ranked = _titles(db, 7005, "report", limit=100)
+    assert len(ranked) == 25
+    paged = []
+    for offset in range(0, 30, 10):
+        notes, total, _, cursor = crud.get_notes(
+            db, 7005, schemas.NoteFilter(search="report", offset=offset, limit=10)
+        )
+        assert total == 25 and cursor is None
+        paged.extend(note.title for note in notes)
+    assert paged == ranked
+
+    # Other filters narrow the ranked matches and the total alike
+    notes, total, _, _ = crud.get_notes(db, 7005, schemas.NoteFilter(search="report", is_favorite=True))
+    assert [note.id for note in notes] == [ids[0]] and total == 1
+
+def test_idf_counts_the_whole_corpus(db):
+    _notes(db, 7006, ("apple", ""), ("pear", ""), ("plum", ""))
+    rows, corpus_size = search.load_postings(db, 7006, search.parse_query("apple"))
+    assert len(rows) == 1
+    assert corpus_size == 3
+
+    # "aa" is in two of 1000 notes and "ab" in one: with idf over the corpus
+    # both are rare and term frequency decides, so note 1 ranks first
+    rows = [(1, "aa", "0,1", 0), (2, "ab", "0", 0), (3, "aa", "0", 0)]
+    assert search.rank_postings(rows, 1000, search.parse_query("a*")) == [1, 2, 3]